@@ -0,0 +1,206 @@
+from benchmarks.report import new_report, write_report
+from concurrent.futures import ProcessPoolExecutor
+from services.async_service import AsyncService, create_executor
+from services.dataset_prep_service import DatasetPrepService
+from typing import Any, Dict, List, Tuple
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Measures the dataset preparation stage end to end on a synthetic JSONL dataset:
+# how fast DatasetPrepService rewrites it into shards, and how fast a training job
+# then reads it, as one file in one reader versus the shards split across parallel
+# readers (as dataloader workers would). Objects live in a local directory, and each
+# block read sleeps --read-latency-ms to stand in for a round trip through the /gcs/
+# mount. Exits 1 when reading the shards in parallel is not at least --min-speedup
+# times faster than reading the single file.
+#
+#   python -m benchmarks.dataset_prep --rows 200000 --workers 4 --output dataset_prep.json
+
+# Bytes a reader asks the mount for at a time
+READ_BLOCK_SIZE = 1024 * 1024
+DEFAULT_READ_LATENCY_MS = 5.0
+DEFAULT_MIN_SPEEDUP = 1.5
+WORDS = ["the", "model", "returns", "a", "short", "answer", "about", "cars", "and", "roads"]
+
+
+class _LocalBucket:
+    """The GcsService calls the sharding stage makes, backed by a local directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, blob_name: str) -> str:
+        return os.path.join(self.root, blob_name)
+
+    def open_blob(self, blob_name: str, chunk_size: int = None):
+        return open(self._path(blob_name), "rb")
+
+    def upload_bytes(self, data: bytes, destination_blob_name: str, content_type: str = None) -> str:
+        path = self._path(destination_blob_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return destination_blob_name
+
+    def upload_string_as_file(self, content: str, destination_blob_name: str) -> str:
+        return self.upload_bytes(content.encode("utf-8"), destination_blob_name)
+
+    def list_files(self, prefix: str = None) -> List[Dict[str, str]]:
+        directory = self._path(prefix)
+        if not os.path.isdir(directory):
+            return []
+        return [
+            {"filepath": os.path.relpath(os.path.join(dirpath, name), self.root)}
+            for dirpath, _, names in os.walk(directory)
+            for name in names
+        ]
+
+    def delete_blobs(self, blob_names: List[str]):
+        for name in blob_names:
+            os.remove(self._path(name))
+
+
+def write_dataset(path: str, rows: int, seed: int = 0):
+    """Alpaca-style rows with instruction/output lengths spread over two orders of magnitude."""
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        for i in range(rows):
+            row = {
+                "instruction": f"{i} " + " ".join(rng.choices(WORDS, k=rng.randint(5, 60))),
+                "input": "",
+                "output": " ".join(rng.choices(WORDS, k=rng.randint(10, 400))),
+            }
+            f.write(json.dumps(row) + "\n")
+
+
+def read_file(path: str, latency_s: float) -> Tuple[int, int]:
+    """Reads and parses a JSONL file the way a dataloader would. Returns (rows, bytes)."""
+    rows = 0
+    size = 0
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            time.sleep(latency_s)
+            if not block:
+                break
+            size += len(block)
+            *lines, tail = (tail + block).split(b"\n")
+            for line in lines:
+                if line:
+                    json.loads(line)
+                    rows += 1
+    if tail.strip():
+        json.loads(tail)
+        rows += 1
+    return rows, size
+
+
+def read_files(paths: List[str], latency_s: float) -> Tuple[int, int]:
+    rows = size = 0
+    for path in paths:
+        file_rows, file_size = read_file(path, latency_s)
+        rows += file_rows
+        size += file_size
+    return rows, size
+
+
+def _throughput(mode: str, level: str, rows: int, size: int, seconds: float, **extra) -> Dict[str, Any]:
+    return {
+        "mode": mode,
+        "level": level,
+        "rows": rows,
+        "megabytes": round(size / 1e6, 1),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds),
+        "megabytes_per_second": round(size / 1e6 / seconds, 1),
+        **extra,
+    }
+
+
+def run(rows: int, shard_mb: int, workers: int, latency_ms: float, runs: int) -> List[Dict[str, Any]]:
+    root = tempfile.mkdtemp(prefix="dataset-prep-bench-")
+    executor = create_executor(1)
+    try:
+        source = "bench.jsonl"
+        write_dataset(os.path.join(root, "datasets", source), rows)
+        prep = DatasetPrepService(AsyncService(_LocalBucket(root), executor), manifest=None)
+
+        prep_seconds = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            index = prep._shard("bench", source, shard_mb * 1024 * 1024, 0.0, 0)
+            prep_seconds.append(time.perf_counter() - started)
+        shards = [os.path.join(root, shard["blob_name"]) for shard in index["splits"]["train"]["shards"]]
+        source_bytes = os.path.getsize(os.path.join(root, "datasets", source))
+        results = [_throughput("prepare", "shard", rows, source_bytes, min(prep_seconds), shards=len(shards))]
+
+        latency_s = latency_ms / 1000
+        single_seconds = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            read_rows, read_bytes = read_file(os.path.join(root, "datasets", source), latency_s)
+            single_seconds.append(time.perf_counter() - started)
+        results.append(_throughput("read", "single_file", read_rows, read_bytes, min(single_seconds), readers=1))
+
+        # Round-robin shards over the readers, as a sharded dataset is split across workers
+        assignments = [shards[i::workers] for i in range(workers)]
+        parallel_seconds = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Start the workers before timing; dataloader workers are up before the first batch
+            list(pool.map(time.sleep, [0] * workers))
+            for _ in range(runs):
+                started = time.perf_counter()
+                counts = list(pool.map(read_files, assignments, [latency_s] * workers))
+                parallel_seconds.append(time.perf_counter() - started)
+        read_rows = sum(count for count, _ in counts)
+        read_bytes = sum(size for _, size in counts)
+        results.append(_throughput(
+            "read", "parallel_shards", read_rows, read_bytes, min(parallel_seconds),
+            readers=workers, shards=len(shards),
+            speedup=round(min(single_seconds) / min(parallel_seconds), 2),
+        ))
+        return results
+    finally:
+        executor.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dataset sharding and sharded read throughput.")
+    parser.add_argument("--rows", type=int, default=200000, help="Rows in the synthetic dataset")
+    parser.add_argument("--shard-mb", type=int, default=8, help="Shard size passed to the sharding stage")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel readers of the shards")
+    parser.add_argument("--read-latency-ms", type=float, default=DEFAULT_READ_LATENCY_MS,
+                        help="Simulated latency of each 1 MiB read through the /gcs/ mount")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions; the fastest is reported")
+    parser.add_argument("--min-speedup", type=float, default=DEFAULT_MIN_SPEEDUP)
+    parser.add_argument("--output", help="Report path; printed to stdout when omitted")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.shard_mb, args.workers, args.read_latency_ms, args.runs)
+    speedup = results[-1]["speedup"]
+    report = new_report(
+        "dataset_prep", "local",
+        rows=args.rows,
+        shard_mb=args.shard_mb,
+        read_latency_ms=args.read_latency_ms,
+        cpus=os.cpu_count(),
+        min_speedup=args.min_speedup,
+    )
+    report["results"] = results
+    write_report(report, args.output)
+    if speedup < args.min_speedup:
+        print(f"under budget: parallel shard reads are {speedup}x the single file < {args.min_speedup}x", file=sys.stderr)
+    sys.exit(1 if speedup < args.min_speedup else 0)
+
+
+if __name__ == "__main__":
+    main()
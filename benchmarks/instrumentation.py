@@ -0,0 +1,132 @@
+from benchmarks.report import new_report, write_report
+from fastapi.routing import APIRoute
+from typing import Any, Callable, Dict, List
+from utils.metrics import MetricsMiddleware, instrument_service
+import argparse
+import asyncio
+import sys
+import time
+
+# Measures what the metrics add to the hot paths: a wrapped service call, and a request
+# through MetricsMiddleware around a minimal app that routes and answers straight away.
+# Routing happens with or without the middleware, so leaving it out isolates the
+# middleware's own cost from the run-to-run noise of a full FastAPI round trip. Exits 1
+# when an overhead goes over its budget, so it can gate changes to utils/metrics.py.
+#
+#   python -m benchmarks.instrumentation --output instrumentation.json
+
+# Allowed overhead; a real GCS call takes 10+ ms and a routed request a few hundred us
+DEFAULT_CALL_BUDGET_US = 5.0
+DEFAULT_REQUEST_BUDGET_US = 10.0
+
+
+class _Service:
+    def call(self, value: int) -> int:
+        return value
+
+    def chunks(self, count: int):
+        yield from range(count)
+
+
+@instrument_service("benchmark")
+class _InstrumentedService(_Service):
+    call = _Service.call
+    chunks = _Service.chunks
+
+
+def _per_call_us(func: Callable[[], Any], iterations: int) -> float:
+    best = float("inf")
+    # Best of five damps scheduler noise
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        best = min(best, time.perf_counter() - started)
+    return best / iterations * 1e6
+
+
+class _RoutedApp:
+    """Stands in for the app behind the middleware: records the matched route and answers."""
+
+    route = APIRoute("/training/sweeps/{sweep_id}", lambda sweep_id: None)
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        scope["route"] = self.route
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _request_us(apps: List[Callable], path: str, iterations: int) -> List[float]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    best = [float("inf")] * len(apps)
+    # Rounds alternate between the apps so drift in the machine hits both alike
+    for _ in range(7):
+        for index, app in enumerate(apps):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await app(dict(scope), receive, send)
+            best[index] = min(best[index], time.perf_counter() - started)
+    return [elapsed / iterations * 1e6 for elapsed in best]
+
+
+def run(iterations: int, request_iterations: int) -> List[Dict[str, Any]]:
+    plain, instrumented = _Service(), _InstrumentedService()
+    call_raw = _per_call_us(lambda: plain.call(1), iterations)
+    call_wrapped = _per_call_us(lambda: instrumented.call(1), iterations)
+    gen_raw = _per_call_us(lambda: sum(plain.chunks(4)), iterations)
+    gen_wrapped = _per_call_us(lambda: sum(instrumented.chunks(4)), iterations)
+
+    app = _RoutedApp()
+    request_raw, request_wrapped = asyncio.run(_request_us(
+        [app, MetricsMiddleware(app)], "/training/sweeps/42", request_iterations
+    ))
+    return [
+        {"mode": "service_call", "level": "function", "baseline_us": call_raw, "instrumented_us": call_wrapped},
+        {"mode": "service_call", "level": "generator", "baseline_us": gen_raw, "instrumented_us": gen_wrapped},
+        {"mode": "request", "level": "middleware", "baseline_us": request_raw, "instrumented_us": request_wrapped},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the overhead of the Prometheus instrumentation.")
+    parser.add_argument("--iterations", type=int, default=100000, help="Calls per micro-benchmark round")
+    parser.add_argument("--request-iterations", type=int, default=100000, help="ASGI requests per round")
+    parser.add_argument("--call-budget-us", type=float, default=DEFAULT_CALL_BUDGET_US)
+    parser.add_argument("--request-budget-us", type=float, default=DEFAULT_REQUEST_BUDGET_US)
+    parser.add_argument("--output", help="Report path; printed to stdout when omitted")
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.request_iterations)
+    over_budget = []
+    for result in results:
+        result["overhead_us"] = round(result["instrumented_us"] - result["baseline_us"], 3)
+        result["baseline_us"] = round(result["baseline_us"], 3)
+        result["instrumented_us"] = round(result["instrumented_us"], 3)
+        budget = args.request_budget_us if result["mode"] == "request" else args.call_budget_us
+        if result["overhead_us"] > budget:
+            over_budget.append(f"{result['mode']}/{result['level']}: {result['overhead_us']} us > {budget} us")
+
+    report = new_report(
+        "instrumentation", "in-process",
+        budgets_us={"call": args.call_budget_us, "request": args.request_budget_us},
+    )
+    report["results"] = results
+    write_report(report, args.output)
+    for line in over_budget:
+        print(f"over budget: {line}", file=sys.stderr)
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
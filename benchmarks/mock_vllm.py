@@ -0,0 +1,89 @@
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import random
+import uvicorn
+
+# A stand-in for the vLLM serving container, with its Vertex AI routes (/generate, /ping).
+# Latency follows a simple model of continuous batching: prefill cost per prompt token,
+# decode cost per output token that grows as more sequences share the GPU, and at most
+# max_num_seqs sequences running with the rest waiting. Good enough to catch regressions
+# in the benchmark harness and client code, not to predict real GPU numbers.
+
+CHARS_PER_TOKEN = 4
+WORDS = ["the", "model", "returns", "a", "short", "answer", "about", "cars", "and", "roads"]
+
+
+class MockVLLMConfig(BaseModel):
+    max_num_seqs: int = 256
+    prefill_ms_per_token: float = 0.05
+    decode_ms_per_token: float = 2.0
+    # Extra decode time per token at full occupancy, as a fraction of decode_ms_per_token
+    batch_slowdown: float = 0.5
+    # Decode slowdown without CUDA graphs
+    enforce_eager: bool = False
+    eager_slowdown: float = 1.3
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+def create_app(config: MockVLLMConfig) -> FastAPI:
+    app = FastAPI()
+    slots = asyncio.Semaphore(config.max_num_seqs)
+    rng = random.Random(config.seed)
+    state = {"running": 0, "requests": 0}
+
+    async def generate_one(instance: Dict[str, Any]) -> str:
+        prompt = str(instance.get("prompt", ""))
+        max_tokens = int(instance.get("max_tokens", 16))
+        async with slots:
+            state["running"] += 1
+            try:
+                occupancy = state["running"] / config.max_num_seqs
+                step_ms = config.decode_ms_per_token * (1 + config.batch_slowdown * occupancy)
+                if config.enforce_eager:
+                    step_ms *= config.eager_slowdown
+                prefill_ms = config.prefill_ms_per_token * len(prompt) / CHARS_PER_TOKEN
+                await asyncio.sleep((prefill_ms + step_ms * max_tokens) / 1000)
+            finally:
+                state["running"] -= 1
+        output = " ".join(rng.choice(WORDS) for _ in range(max_tokens))
+        if instance.get("raw_response"):
+            return output
+        return f"Prompt:\n{prompt}\nOutput:\n{output}"
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok", "running": state["running"], "requests": state["requests"]}
+
+    @app.post("/generate")
+    async def generate(body: Dict[str, Any]):
+        instances: List[Dict[str, Any]] = body.get("instances") or [body]
+        state["requests"] += 1
+        if config.error_rate and rng.random() < config.error_rate:
+            raise HTTPException(status_code=503, detail="Took too long to respond when processing")
+        predictions = await asyncio.gather(*(generate_one(instance) for instance in instances))
+        return {"predictions": predictions}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock vLLM /generate server for benchmarks and CI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    for name, field in MockVLLMConfig.model_fields.items():
+        flag = "--" + name.replace("_", "-")
+        if field.annotation is bool:
+            parser.add_argument(flag, action="store_true")
+        else:
+            parser.add_argument(flag, type=field.annotation, default=field.default)
+    args = parser.parse_args()
+    config = MockVLLMConfig(**{name: getattr(args, name) for name in MockVLLMConfig.model_fields})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from typing import Any, Dict, List, Optional
+import json
+import math
+import platform
+import time
+
+# Metrics where a higher value is better; everything else is treated as lower-is-better
+HIGHER_IS_BETTER = {"requests_per_second", "output_tokens_per_second"}
+# Metrics compared between two reports, per load level
+COMPARED_METRICS = (
+    "latency_p50_ms", "latency_p95_ms", "latency_p99_ms",
+    "requests_per_second", "output_tokens_per_second", "error_rate",
+)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies_ms: List[float], prefix: str = "latency") -> Dict[str, Optional[float]]:
+    summary = {
+        f"{prefix}_p50_ms": percentile(latencies_ms, 50),
+        f"{prefix}_p95_ms": percentile(latencies_ms, 95),
+        f"{prefix}_p99_ms": percentile(latencies_ms, 99),
+        f"{prefix}_mean_ms": sum(latencies_ms) / len(latencies_ms) if latencies_ms else None,
+        f"{prefix}_max_ms": max(latencies_ms) if latencies_ms else None,
+    }
+    return {key: round(value, 3) if value is not None else None for key, value in summary.items()}
+
+
+def new_report(benchmark: str, target: str, **metadata) -> Dict[str, Any]:
+    return {
+        "benchmark": benchmark,
+        "target": target,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": {"python": platform.python_version(), "machine": platform.machine()},
+        **metadata,
+        "results": [],
+    }
+
+
+def write_report(report: Dict[str, Any], path: Optional[str]):
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_reports(
+    baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float = 0.1, error_threshold: float = 0.01
+) -> Dict[str, Any]:
+    """Matches results by load level and flags metrics that got worse by more than ``threshold``.
+
+    Error rates are compared in absolute terms against ``error_threshold``; all other
+    metrics relative to the baseline.
+    """
+    baseline_results = {(r["mode"], r["level"]): r for r in baseline["results"]}
+    rows = []
+    regressions = []
+    for result in candidate["results"]:
+        key = (result["mode"], result["level"])
+        base = baseline_results.get(key)
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == "error_rate":
+                change = new - old
+            else:
+                change = (new - old) / old if old else 0.0
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            row = {
+                "mode": key[0], "level": key[1], "metric": metric,
+                "baseline": old, "candidate": new, "change": round(change, 4),
+                "regression": worse > (error_threshold if metric == "error_rate" else threshold),
+            }
+            rows.append(row)
+            if row["regression"]:
+                regressions.append(row)
+    return {"threshold": threshold, "error_threshold": error_threshold, "rows": rows, "regressions": regressions}
+
+
+def format_comparison(comparison: Dict[str, Any]) -> str:
+    lines = [f"{'mode':<12}{'level':>8}  {'metric':<26}{'baseline':>12}{'candidate':>12}{'change':>10}"]
+    for row in comparison["rows"]:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['mode']:<12}{row['level']:>8}  {row['metric']:<26}{row['baseline']:>12.3f}"
+            f"{row['candidate']:>12.3f}{row['change']:>+10.1%}{flag}"
+        )
+    lines.append(f"{len(comparison['regressions'])} regression(s) beyond {comparison['threshold']:.0%}")
+    return "\n".join(lines)
@@ -0,0 +1,181 @@
+from benchmarks.report import new_report, percentile, write_report
+from typing import Any, Dict, List, Tuple
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+# Measures how fast a fresh process gets ready: the time to import the app, which
+# modules that time goes to, and the time from process start to the first response
+# from uvicorn with and without client pre-warming. Exits 1 when a budget is exceeded
+# or an SDK that should load lazily is imported with the app.
+#
+#   python -m benchmarks.startup --output startup.json
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Budgets for the median of the runs; importing the Google Cloud SDKs eagerly costs 2+ s
+DEFAULT_IMPORT_BUDGET_S = 1.0
+DEFAULT_FIRST_REQUEST_BUDGET_S = 3.0
+# Imported on first use; any of them showing up in `import main` is a regression
+LAZY_MODULES = ("google.cloud.aiplatform", "google.cloud.storage")
+FIRST_REQUEST_TIMEOUT_S = 60.0
+
+
+def _env(prewarm: bool, queue_db: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("GCS_BUCKET_NAME", "benchmark-bucket")
+    env.setdefault("PROJECT_ID", "benchmark-project")
+    env["TRAINING_QUEUE_DB"] = queue_db
+    env["PREWARM_CLIENTS"] = "true" if prewarm else "false"
+    env["LOG_LEVEL"] = "WARNING"
+    return env
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for each line of ``-X importtime`` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def _group(module: str) -> str:
+    # Namespace packages say little on their own, so google.cloud.* is split further
+    parts = module.split(".")
+    if parts[:2] == ["google", "cloud"]:
+        return ".".join(parts[:3])
+    if parts[0] == "google":
+        return ".".join(parts[:2])
+    return parts[0]
+
+
+def profile_import(module: str, env: Dict[str, str]) -> Dict[str, Any]:
+    """Imports ``module`` in a fresh interpreter and attributes the time to packages."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = _parse_importtime(result.stderr)
+    total_us = next(cumulative for name, _, cumulative in modules if name == module)
+    groups: Dict[str, int] = {}
+    for name, self_us, _ in modules:
+        groups[_group(name)] = groups.get(_group(name), 0) + self_us
+    imported = {name for name, _, _ in modules}
+    return {
+        "seconds": total_us / 1e6,
+        "groups": groups,
+        "eager_lazy_modules": [name for name in LAZY_MODULES if name in imported],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_first_request(path: str, env: Dict[str, str]) -> float:
+    """Seconds from spawning uvicorn to the first successful response for ``path``."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < FIRST_REQUEST_TIMEOUT_S:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode} before serving {path}")
+            try:
+                with urllib.request.urlopen(url, timeout=FIRST_REQUEST_TIMEOUT_S) as response:
+                    response.read()
+                return time.perf_counter() - started
+            except urllib.error.HTTPError as e:
+                raise RuntimeError(f"{path} answered {e.code}; pick a route that succeeds without credentials")
+            except (ConnectionError, urllib.error.URLError):
+                time.sleep(0.01)
+        raise TimeoutError(f"No response from {url} within {FIRST_REQUEST_TIMEOUT_S} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _median(values: List[float]) -> float:
+    return round(percentile(values, 50), 3)
+
+
+def run(runs: int, path: str, top: int) -> Tuple[List[Dict[str, Any]], List[str]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        queue_db = os.path.join(tmp, "training_queue.db")
+        profiles = [profile_import("main", _env(False, queue_db)) for _ in range(runs)]
+        first_requests = {
+            prewarm: [time_first_request(path, _env(prewarm, queue_db)) for _ in range(runs)]
+            for prewarm in (False, True)
+        }
+
+    # Attribute time using the run whose total is the median
+    profile = sorted(profiles, key=lambda p: p["seconds"])[len(profiles) // 2]
+    total_us = sum(profile["groups"].values())
+    dominant = sorted(profile["groups"].items(), key=lambda item: item[1], reverse=True)[:top]
+    results = [{
+        "mode": "import",
+        "level": "main",
+        "seconds_p50": _median([p["seconds"] for p in profiles]),
+        "seconds_max": round(max(p["seconds"] for p in profiles), 3),
+        "dominant_modules": [
+            {"module": name, "seconds": round(self_us / 1e6, 3), "share": round(self_us / total_us, 3)}
+            for name, self_us in dominant
+        ],
+    }]
+    for prewarm, timings in first_requests.items():
+        results.append({
+            "mode": "first_request",
+            "level": "prewarm" if prewarm else "lazy",
+            "path": path,
+            "seconds_p50": _median(timings),
+            "seconds_max": round(max(timings), 3),
+        })
+    return results, profile["eager_lazy_modules"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first request.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--path", default="/health/clients", help="Route requested once the server is up")
+    parser.add_argument("--top", type=int, default=10, help="Number of dominant modules to report")
+    parser.add_argument("--import-budget-s", type=float, default=DEFAULT_IMPORT_BUDGET_S)
+    parser.add_argument("--first-request-budget-s", type=float, default=DEFAULT_FIRST_REQUEST_BUDGET_S)
+    parser.add_argument("--output", help="Report path; printed to stdout when omitted")
+    args = parser.parse_args()
+
+    results, eager = run(args.runs, args.path, args.top)
+    failures = [f"{name} is imported with the app instead of on first use" for name in eager]
+    for result in results:
+        budget = args.import_budget_s if result["mode"] == "import" else args.first_request_budget_s
+        if result["seconds_p50"] > budget:
+            failures.append(f"{result['mode']}/{result['level']}: {result['seconds_p50']} s > {budget} s")
+
+    report = new_report(
+        "startup", "subprocess",
+        runs=args.runs,
+        budgets_s={"import": args.import_budget_s, "first_request": args.first_request_budget_s},
+        eager_lazy_modules=eager,
+    )
+    report["results"] = results
+    write_report(report, args.output)
+    for line in failures:
+        print(f"over budget: {line}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
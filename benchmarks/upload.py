@@ -0,0 +1,157 @@
+from benchmarks.report import new_report, write_report
+from services.async_service import AsyncService, create_executor
+from services.gcs_service import GcsService
+from services.streaming_upload import encode_session_id, stream_parallel_composite, stream_resumable
+from tests.fake_storage import FakeBlob, FakeBucket, FakeRegistry, FakeStorageClient, FakeUploadSession
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Measures a dataset upload streamed into the bucket the two ways POST /datasets/upload
+# can: one resumable session sending 8 MiB chunks in turn, and a parallel composite
+# upload sending 32 MiB parts concurrently and composing them. The bucket is the
+# in-memory fake from tests/fake_storage; each request sleeps --request-latency-ms plus
+# its size over --stream-mbps, standing in for one connection's round trip and
+# bandwidth to GCS. Exits 1 when the composite upload is not at least --min-speedup
+# times faster than the resumable one.
+#
+#   python -m benchmarks.upload --size-mb 256 --output upload.json
+
+# Bytes the request body arrives in, as Starlette hands them to the route
+BODY_CHUNK_SIZE = 1024 * 1024
+DEFAULT_REQUEST_LATENCY_MS = 30.0
+DEFAULT_STREAM_MBPS = 100.0
+DEFAULT_MIN_SPEEDUP = 1.5
+SESSION_URL = "https://storage.googleapis.com/upload/bench"
+
+
+class _Link:
+    """One connection's cost for a request: a round trip plus the bytes over its bandwidth."""
+
+    def __init__(self, latency_ms: float, stream_mbps: float):
+        self.latency_s = latency_ms / 1000
+        self.bytes_per_second = stream_mbps * 1e6
+        self.requests = 0
+
+    def send(self, size: int):
+        self.requests += 1
+        time.sleep(self.latency_s + size / self.bytes_per_second)
+
+
+class _ThrottledBlob(FakeBlob):
+    def upload_from_string(self, data, content_type=None, if_generation_match=None, **kwargs):
+        self.bucket.link.send(len(data))
+        super().upload_from_string(data, content_type, if_generation_match, **kwargs)
+
+    def compose(self, sources: List[FakeBlob]):
+        # Composing happens inside GCS; only the request itself is paid for
+        self.bucket.link.send(0)
+        super().compose(sources)
+
+
+class _ThrottledBucket(FakeBucket):
+    def __init__(self, link: _Link):
+        super().__init__()
+        self.link = link
+
+    def blob(self, name: str) -> FakeBlob:
+        return _ThrottledBlob(self, name)
+
+
+class _ThrottledSession(FakeUploadSession):
+    def __init__(self, link: _Link, bucket: FakeBucket):
+        # Finalizing writes the object server-side, so it goes to an unthrottled view of the bucket
+        view = FakeBucket()
+        view.objects = bucket.objects
+        view.generations = bucket.generations
+        super().__init__(bucket=view)
+        self.link = link
+
+    def put(self, url, data=b"", headers=None):
+        self.link.send(len(data))
+        return super().put(url, data, headers)
+
+
+async def _body(data: bytes):
+    for start in range(0, len(data), BODY_CHUNK_SIZE):
+        yield data[start:start + BODY_CHUNK_SIZE]
+        # Let other tasks run between chunks, as they would between network reads
+        await asyncio.sleep(0)
+
+
+def _upload(mode: str, data: bytes, latency_ms: float, stream_mbps: float) -> Dict[str, Any]:
+    link = _Link(latency_ms, stream_mbps)
+    storage_client = FakeStorageClient()
+    storage_client.fake_bucket = _ThrottledBucket(link)
+    session = _ThrottledSession(link, storage_client.fake_bucket)
+    blob_name = f"datasets/bench-{mode}.jsonl"
+    session.targets[SESSION_URL] = blob_name
+    executor = create_executor(16)
+    gcs_service = AsyncService(
+        GcsService("bench", client_registry=FakeRegistry(storage=storage_client, upload_session=session)), executor
+    )
+
+    async def upload():
+        if mode == "parallel_composite":
+            return await stream_parallel_composite(gcs_service, _body(data), blob_name)
+        return await stream_resumable(gcs_service, _body(data), encode_session_id(SESSION_URL, blob_name))
+
+    try:
+        started = time.perf_counter()
+        size = asyncio.run(upload())
+        seconds = time.perf_counter() - started
+    finally:
+        executor.shutdown()
+    if storage_client.fake_bucket.objects.get(blob_name) != data:
+        raise RuntimeError(f"{mode} upload did not produce the uploaded bytes")
+    return {
+        "mode": mode,
+        "megabytes": round(size / 1e6, 1),
+        "seconds": round(seconds, 3),
+        "megabytes_per_second": round(size / 1e6 / seconds, 1),
+        "requests": link.requests,
+    }
+
+
+def run(size_mb: int, latency_ms: float, stream_mbps: float, runs: int) -> List[Dict[str, Any]]:
+    data = os.urandom(size_mb * 1024 * 1024)
+    results = []
+    for mode in ("resumable", "parallel_composite"):
+        results.append(min((_upload(mode, data, latency_ms, stream_mbps) for _ in range(runs)), key=lambda r: r["seconds"]))
+    results[-1]["speedup"] = round(results[0]["seconds"] / results[-1]["seconds"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare resumable and parallel composite upload throughput.")
+    parser.add_argument("--size-mb", type=int, default=256, help="Size of the uploaded object")
+    parser.add_argument("--request-latency-ms", type=float, default=DEFAULT_REQUEST_LATENCY_MS,
+                        help="Simulated round trip of each request to GCS")
+    parser.add_argument("--stream-mbps", type=float, default=DEFAULT_STREAM_MBPS,
+                        help="Simulated bandwidth of one connection, in MB per second")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions; the fastest is reported")
+    parser.add_argument("--min-speedup", type=float, default=DEFAULT_MIN_SPEEDUP)
+    parser.add_argument("--output", help="Report path; printed to stdout when omitted")
+    args = parser.parse_args()
+
+    results = run(args.size_mb, args.request_latency_ms, args.stream_mbps, args.runs)
+    speedup = results[-1]["speedup"]
+    report = new_report(
+        "upload", "fake_storage",
+        size_mb=args.size_mb,
+        request_latency_ms=args.request_latency_ms,
+        stream_mbps=args.stream_mbps,
+        min_speedup=args.min_speedup,
+    )
+    report["results"] = results
+    write_report(report, args.output)
+    if speedup < args.min_speedup:
+        print(f"under budget: parallel composite upload is {speedup}x the resumable one < {args.min_speedup}x", file=sys.stderr)
+    sys.exit(1 if speedup < args.min_speedup else 0)
+
+
+if __name__ == "__main__":
+    main()
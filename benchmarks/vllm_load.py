@@ -0,0 +1,310 @@
+from benchmarks.mock_vllm import MockVLLMConfig, create_app
+from benchmarks.report import compare_reports, format_comparison, load_report, new_report, summarize_latencies, write_report
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Replays a prompt corpus against a vLLM endpoint at fixed concurrency levels (closed loop)
+# or request rates (open loop) and writes a JSON report that can be compared between runs.
+#
+#   python -m benchmarks.vllm_load run --mock --concurrency 1 8 32 --output baseline.json
+#   python -m benchmarks.vllm_load run --url http://host:8080/generate --rate 5 20 --output new.json
+#   python -m benchmarks.vllm_load run --project p --endpoint 123 --concurrency 16 --output new.json
+#   python -m benchmarks.vllm_load compare baseline.json new.json --threshold 0.1
+
+CHARS_PER_TOKEN = 4
+DEFAULT_PROMPTS = [
+    "What is a car?",
+    "Explain the difference between supervised and unsupervised learning.",
+    "Write a haiku about the ocean.",
+    "Summarize the plot of Romeo and Juliet in two sentences.",
+    "List three uses of a paperclip.",
+    "Translate 'good morning' into French, Spanish and German.",
+    "What causes the seasons on Earth?",
+    "Give me a recipe for pancakes.",
+]
+
+
+def load_corpus(path: Optional[str], max_tokens: int) -> List[Dict[str, Any]]:
+    """Prompts as vLLM instances, from a .txt file (one per line), .jsonl or .json records."""
+    if path is None:
+        records: List[Any] = list(DEFAULT_PROMPTS)
+    elif path.endswith(".txt"):
+        with open(path) as f:
+            records = [line.rstrip("\n") for line in f if line.strip()]
+    elif path.endswith(".jsonl"):
+        with open(path) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path) as f:
+            records = json.load(f)
+    instances = []
+    for record in records:
+        if isinstance(record, str):
+            record = {"prompt": record}
+        # Alpaca-style dataset rows work as a corpus too
+        prompt = record.get("prompt") or "\n".join(filter(None, [record.get("instruction"), record.get("input")]))
+        if prompt:
+            instances.append({"prompt": prompt, "max_tokens": int(record.get("max_tokens", max_tokens))})
+    if not instances:
+        raise ValueError(f"No prompts found in {path}")
+    return instances
+
+
+def output_tokens(prediction: Any) -> int:
+    """Rough output token count; the container echoes the prompt before 'Output:' unless raw_response is set."""
+    text = prediction if isinstance(prediction, str) else json.dumps(prediction)
+    marker = text.rfind("\nOutput:\n")
+    if marker >= 0:
+        text = text[marker + len("\nOutput:\n"):]
+    return max(len(text) // CHARS_PER_TOKEN, 1) if text else 0
+
+
+class HttpTarget:
+    """POSTs single-instance requests to a vLLM container's /generate route."""
+
+    def __init__(self, url: str, timeout: float, max_in_flight: int):
+        self.url = url
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def _post(self, instance: Dict[str, Any]) -> Any:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"instances": [instance]}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["predictions"][0]
+
+    async def send(self, instance: Dict[str, Any]) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._post, instance)
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class VertexTarget:
+    """Sends each prompt as its own predict request to a Vertex AI endpoint, without retries."""
+
+    def __init__(self, endpoint_id: str, project_id: str, location: str, timeout: float, max_in_flight: int):
+        from services.prediction_client import PredictionClient
+
+        self.client = PredictionClient(
+            endpoint_id, project_id, location,
+            max_batch_size=1, max_batch_delay=0, max_in_flight=max_in_flight, max_retries=0, timeout=timeout,
+        )
+
+    async def send(self, instance: Dict[str, Any]) -> Any:
+        return await self.client.predict(instance)
+
+    async def close(self):
+        await self.client.close()
+
+
+async def _timed(target, instance: Dict[str, Any], started: float) -> Tuple[float, Optional[int], Optional[str]]:
+    """Latency in ms from ``started``, output tokens, and the error type if the request failed."""
+    try:
+        prediction = await target.send(instance)
+        return (time.perf_counter() - started) * 1000, output_tokens(prediction), None
+    except urllib.error.HTTPError as e:
+        return (time.perf_counter() - started) * 1000, None, f"HTTP {e.code}"
+    except Exception as e:
+        return (time.perf_counter() - started) * 1000, None, type(e).__name__
+
+
+async def run_concurrency(target, corpus: List[Dict[str, Any]], concurrency: int, requests: int) -> List[Tuple]:
+    """Closed loop: ``concurrency`` workers each send their next request as soon as the last one returns."""
+    samples = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for index in counter:
+            samples.append(await _timed(target, corpus[index % len(corpus)], time.perf_counter()))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def run_rate(target, corpus: List[Dict[str, Any]], rate: float, requests: int, seed: int) -> List[Tuple]:
+    """Open loop: Poisson arrivals at ``rate`` requests/s, independent of how fast responses come back.
+
+    Latency is measured from each request's scheduled arrival, so a backed-up endpoint
+    shows up as latency rather than as a silently lower request rate.
+    """
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    arrival = 0.0
+    tasks = []
+    for index in range(requests):
+        arrival += rng.expovariate(rate)
+        delay = start + arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(_timed(target, corpus[index % len(corpus)], start + arrival)))
+    return await asyncio.gather(*tasks)
+
+
+def summarize(mode: str, level: float, samples: List[Tuple], elapsed: float) -> Dict[str, Any]:
+    latencies = [latency for latency, _, error in samples if error is None]
+    tokens = sum(count for _, count, error in samples if error is None)
+    errors: Dict[str, int] = {}
+    for _, _, error in samples:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    return {
+        "mode": mode,
+        "level": level,
+        "requests": len(samples),
+        "succeeded": len(latencies),
+        "errors": errors,
+        "error_rate": round(1 - len(latencies) / len(samples), 4) if samples else 0.0,
+        "duration_s": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 3) if elapsed else None,
+        "output_tokens_per_second": round(tokens / elapsed, 3) if elapsed else None,
+        **summarize_latencies(latencies),
+    }
+
+
+async def run_benchmark(target, corpus: List[Dict[str, Any]], args) -> List[Dict[str, Any]]:
+    if args.warmup:
+        await run_concurrency(target, corpus, min(args.warmup, 8), args.warmup)
+    levels = [("concurrency", level) for level in args.concurrency or []]
+    levels += [("rate", level) for level in args.rate or []]
+    results = []
+    for mode, level in levels:
+        started = time.perf_counter()
+        if mode == "concurrency":
+            samples = await run_concurrency(target, corpus, int(level), args.requests)
+        else:
+            samples = await run_rate(target, corpus, level, args.requests, args.seed)
+        result = summarize(mode, level, samples, time.perf_counter() - started)
+        print(
+            f"{mode}={level}: p50={result['latency_p50_ms']}ms p99={result['latency_p99_ms']}ms "
+            f"{result['requests_per_second']} req/s {result['output_tokens_per_second']} tok/s "
+            f"errors={result['error_rate']:.1%}",
+            file=sys.stderr,
+        )
+        results.append(result)
+    return results
+
+
+def start_mock_server(config: MockVLLMConfig) -> str:
+    """Runs the mock vLLM server on a free local port in a background thread and returns its /generate URL."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("Mock vLLM server did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/generate"
+
+
+def _parse_labels(labels: List[str]) -> Dict[str, str]:
+    parsed = {}
+    for label in labels:
+        key, _, value = label.partition("=")
+        parsed[key] = value
+    return parsed
+
+
+async def run(args) -> Dict[str, Any]:
+    corpus = load_corpus(args.prompts, args.max_tokens)
+    if args.raw_response:
+        corpus = [{**instance, "raw_response": True} for instance in corpus]
+    deployment = None
+    if args.deployment:
+        with open(args.deployment) as f:
+            deployment = json.load(f)
+    max_in_flight = max([int(level) for level in args.concurrency or []] + [args.max_in_flight])
+
+    if args.endpoint:
+        target = VertexTarget(args.endpoint, args.project, args.region, args.timeout, max_in_flight)
+        target_name = f"projects/{args.project}/locations/{args.region}/endpoints/{args.endpoint}"
+    else:
+        url = args.url
+        if args.mock:
+            mock_config = MockVLLMConfig(**json.loads(args.mock_config or "{}"))
+            url = start_mock_server(mock_config)
+            deployment = deployment or {"mock": mock_config.model_dump()}
+        target = HttpTarget(url, args.timeout, max_in_flight)
+        target_name = "mock" if args.mock else url
+
+    report = new_report(
+        "vllm_load",
+        target_name,
+        deployment=deployment,
+        labels=_parse_labels(args.label),
+        corpus={"source": args.prompts or "builtin", "prompts": len(corpus), "max_tokens": args.max_tokens},
+        requests_per_level=args.requests,
+    )
+    try:
+        report["results"] = await run_benchmark(target, corpus, args)
+    finally:
+        await target.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a vLLM endpoint and compare reports.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Replay a prompt corpus and write a JSON report")
+    target = run_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="vLLM container /generate URL")
+    target.add_argument("--endpoint", help="Vertex AI endpoint ID")
+    target.add_argument("--mock", action="store_true", help="Start a local mock vLLM server and test against it")
+    run_parser.add_argument("--project")
+    run_parser.add_argument("--region", default="us-central1")
+    run_parser.add_argument("--mock-config", help="JSON overrides for the mock server, e.g. '{\"max_num_seqs\": 16}'")
+    run_parser.add_argument("--prompts", help="Corpus: .txt (one prompt per line), .jsonl or .json")
+    run_parser.add_argument("--max-tokens", type=int, default=64)
+    run_parser.add_argument("--raw-response", action="store_true")
+    run_parser.add_argument("--concurrency", type=int, nargs="+", help="Closed-loop concurrency levels")
+    run_parser.add_argument("--rate", type=float, nargs="+", help="Open-loop request rates (requests/s)")
+    run_parser.add_argument("--requests", type=int, default=200, help="Requests per level")
+    run_parser.add_argument("--warmup", type=int, default=8, help="Untimed requests before the first level")
+    run_parser.add_argument("--max-in-flight", type=int, default=256, help="Request cap for rate mode")
+    run_parser.add_argument("--timeout", type=float, default=300.0)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--deployment", help="JSON file with the deployment settings, e.g. the deploy_vllm body")
+    run_parser.add_argument("--label", action="append", default=[], help="key=value recorded in the report")
+    run_parser.add_argument("--output", help="Report path; printed to stdout when omitted")
+
+    compare_parser = commands.add_parser("compare", help="Compare two reports level by level")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative regression")
+    compare_parser.add_argument("--error-threshold", type=float, default=0.01, help="Allowed error rate increase")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        comparison = compare_reports(
+            load_report(args.baseline), load_report(args.candidate), args.threshold, args.error_threshold
+        )
+        print(format_comparison(comparison))
+        sys.exit(1 if comparison["regressions"] else 0)
+    if args.endpoint and not args.project:
+        parser.error("--endpoint requires --project")
+    if not args.concurrency and not args.rate:
+        parser.error("give at least one --concurrency or --rate level")
+    write_report(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
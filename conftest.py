@@ -0,0 +1 @@
+# Lets tests import the app's top-level packages (services, utils, routers) when run from the repo root
@@ -1,7 +1,22 @@
 import os
-from services.gcs_service import GcsService
+import json
+import logging
+from functools import lru_cache
+from services.client_registry import ClientRegistry
+from services.async_service import AsyncService, create_executor
+from services.manifest_service import DatasetManifest
+from services.status_cache import TrainingStatusCache
+from services.deployment_watcher import DeploymentWatcher
+from services.dataset_prep_service import DatasetPrepService
+from services.training_queue import TrainingQueue
+from services.sweep_service import SweepService
+from services.adapter_registry import AdapterRegistry
+from services.batch_inference import BatchInferenceService
+from concurrent.futures import ThreadPoolExecutor
+from services.gcs_service import TRANSFER_METHODS, GcsService
 from services.training_service import TrainingService
 from services.deployment_service import DeploymentService
+from utils.log import configure_logging, register_secrets
 
 # Initialize GCS bucket name, project id from environment variables
 GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME")
@@ -13,25 +28,135 @@ MODEL_IMAGE_URI = os.environ.get(
 )
 HF_TOKEN = os.environ.get("HF_TOKEN")
 SERVICE_ACCOUNT = os.environ.get("SERVICE_ACCOUNT")
+# Upper bound on blocking SDK calls running at once
+SERVICE_EXECUTOR_WORKERS = int(os.environ.get("SERVICE_EXECUTOR_WORKERS", "16"))
+# Upper bound on object uploads and downloads running at once, kept apart from the above
+TRANSFER_EXECUTOR_WORKERS = int(os.environ.get("TRANSFER_EXECUTOR_WORKERS", "16"))
+# Seconds a training job status is shared between pollers
+TRAINING_STATUS_CACHE_TTL = float(os.environ.get("TRAINING_STATUS_CACHE_TTL", "5"))
+# SQLite file holding the training job queue
+TRAINING_QUEUE_DB = os.environ.get("TRAINING_QUEUE_DB", "training_queue.db")
+# Concurrent training jobs per team, e.g. {"research": 4}; other teams get the default
+TRAINING_TEAM_LIMITS = json.loads(os.environ.get("TRAINING_TEAM_LIMITS", "{}"))
+TRAINING_DEFAULT_TEAM_LIMIT = int(os.environ.get("TRAINING_DEFAULT_TEAM_LIMIT", "2"))
+# GPUs the queue may hold at once per accelerator type, e.g. {"NVIDIA_TESLA_A100": 16}
+TRAINING_GPU_QUOTAS = json.loads(os.environ.get("TRAINING_GPU_QUOTAS", "{}"))
+TRAINING_QUEUE_POLL_INTERVAL = float(os.environ.get("TRAINING_QUEUE_POLL_INTERVAL", "15"))
+# Idle endpoints kept pre-created so deploys skip endpoint provisioning; 0 disables the pool
+ENDPOINT_POOL_SIZE = int(os.environ.get("ENDPOINT_POOL_SIZE", "0"))
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# Import the Google Cloud SDKs and build their clients in the background after startup;
+# when off, the first request that needs a client pays for it
+PREWARM_CLIENTS = os.environ.get("PREWARM_CLIENTS", "true").lower() in ("1", "true", "yes")
 
+configure_logging(LOG_LEVEL)
+# Masked wherever they would otherwise show up in a log line
+register_secrets([HF_TOKEN])
+logger = logging.getLogger(__name__)
+
+@lru_cache()
+def get_client_registry() -> ClientRegistry:
+    return ClientRegistry(
+        project_id=PROJECT_ID,
+        location=LOCATION,
+        staging_bucket=f"gs://{GCS_BUCKET_NAME}",
+    )
+
+@lru_cache()
 def get_gcs_service() -> GcsService:
-    return GcsService(bucket_name=GCS_BUCKET_NAME)
+    return GcsService(bucket_name=GCS_BUCKET_NAME, client_registry=get_client_registry())
 
+@lru_cache()
 def get_training_service() -> TrainingService:
     return TrainingService(
         project_id=PROJECT_ID,
         location=LOCATION,
         model_image_uri=MODEL_IMAGE_URI,
         hf_token=HF_TOKEN,
+        client_registry=get_client_registry(),
     )
 
+@lru_cache()
 def get_deployment_service() -> DeploymentService:
-    return DeploymentService(project_id=PROJECT_ID, location=LOCATION)
-
-# print all dependecies
-print(f"GCS_BUCKET_NAME: {GCS_BUCKET_NAME}")
-print(f"PROJECT_ID: {PROJECT_ID}")
-print(f"LOCATION: {LOCATION}")
-print(f"MODEL_IMAGE_URI: {MODEL_IMAGE_URI}")
-print(f"HF_TOKEN: {HF_TOKEN}")
-print(f"SERVICE_ACCOUNT: {SERVICE_ACCOUNT}")
+    return DeploymentService(
+        project_id=PROJECT_ID,
+        location=LOCATION,
+        client_registry=get_client_registry(),
+        gcs_service=get_gcs_service(),
+    )
+
+@lru_cache()
+def get_service_executor() -> ThreadPoolExecutor:
+    return create_executor(SERVICE_EXECUTOR_WORKERS)
+
+@lru_cache()
+def get_transfer_executor() -> ThreadPoolExecutor:
+    return create_executor(TRANSFER_EXECUTOR_WORKERS, thread_name_prefix="transfer-io")
+
+def get_async_gcs_service() -> AsyncService:
+    return AsyncService(
+        get_gcs_service(), get_service_executor(), get_transfer_executor(), transfer_methods=TRANSFER_METHODS
+    )
+
+def get_async_training_service() -> AsyncService:
+    return AsyncService(get_training_service(), get_service_executor())
+
+def get_async_deployment_service() -> AsyncService:
+    return AsyncService(get_deployment_service(), get_service_executor())
+
+@lru_cache()
+def get_dataset_manifest() -> DatasetManifest:
+    return DatasetManifest(get_async_gcs_service())
+
+@lru_cache()
+def get_training_status_cache() -> TrainingStatusCache:
+    return TrainingStatusCache(get_async_training_service(), ttl=TRAINING_STATUS_CACHE_TTL)
+
+@lru_cache()
+def get_deployment_watcher() -> DeploymentWatcher:
+    return DeploymentWatcher(get_async_deployment_service())
+
+@lru_cache()
+def get_dataset_prep_service() -> DatasetPrepService:
+    return DatasetPrepService(get_async_gcs_service(), get_dataset_manifest())
+
+@lru_cache()
+def get_training_queue() -> TrainingQueue:
+    return TrainingQueue(
+        get_async_training_service(),
+        get_training_status_cache(),
+        db_path=TRAINING_QUEUE_DB,
+        team_limits=TRAINING_TEAM_LIMITS,
+        default_team_limit=TRAINING_DEFAULT_TEAM_LIMIT,
+        gpu_quotas=TRAINING_GPU_QUOTAS,
+        poll_interval=TRAINING_QUEUE_POLL_INTERVAL,
+    )
+
+@lru_cache()
+def get_sweep_service() -> SweepService:
+    return SweepService(
+        get_async_gcs_service(), get_async_training_service(), get_training_queue(), get_training_status_cache()
+    )
+
+@lru_cache()
+def get_adapter_registry() -> AdapterRegistry:
+    return AdapterRegistry(get_async_gcs_service(), PROJECT_ID, LOCATION, watcher=get_deployment_watcher())
+
+@lru_cache()
+def get_batch_inference_service() -> BatchInferenceService:
+    return BatchInferenceService(get_async_gcs_service(), PROJECT_ID, LOCATION)
+
+logger.info(
+    "Configuration loaded",
+    extra={
+        "gcs_bucket_name": GCS_BUCKET_NAME,
+        "project_id": PROJECT_ID,
+        "location": LOCATION,
+        "model_image_uri": MODEL_IMAGE_URI,
+        "hf_token_set": bool(HF_TOKEN),
+        "service_account": SERVICE_ACCOUNT,
+        "service_executor_workers": SERVICE_EXECUTOR_WORKERS,
+        "transfer_executor_workers": TRANSFER_EXECUTOR_WORKERS,
+        "prewarm_clients": PREWARM_CLIENTS,
+    },
+)
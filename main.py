@@ -1,20 +1,84 @@
-from fastapi import FastAPI, Depends
-from routers import datasets, training, deployment
-from services.gcs_service import GcsService
-from services.training_service import TrainingService
-from services.deployment_service import DeploymentService
+from fastapi import FastAPI, Depends, Response
+from contextlib import asynccontextmanager
+from routers import datasets, training, deployment, adapters, inference, health
+from services.client_registry import begin_request_tracking
+from utils.metrics import MetricsMiddleware, render_metrics
+import asyncio
+import logging
 import os
+import time
 from dotenv import load_dotenv
-from dependencies import get_gcs_service, get_training_service, get_deployment_service 
+from dependencies import ENDPOINT_POOL_SIZE, PREWARM_CLIENTS, get_async_deployment_service, get_gcs_service, get_training_service, get_deployment_service, get_client_registry, get_service_executor, get_transfer_executor, get_deployment_watcher, get_training_queue, get_adapter_registry, get_batch_inference_service
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+def prewarm_clients(registry):
+    """Imports the SDKs and builds the pooled clients; runs on the service executor after startup."""
+    started = time.perf_counter()
+    try:
+        imports = registry.warm()
+    except Exception:
+        # Not fatal: each client is built again on first use
+        logger.warning("Pre-warming clients failed", exc_info=True)
+        return
+    logger.info(
+        "Pre-warmed clients",
+        extra={"seconds": round(time.perf_counter() - started, 3), "import_seconds": imports},
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the GCS and Vertex AI clients once and share them across requests. The SDKs
+    # take seconds to import, so that happens in the background and startup is not held up.
+    registry = get_client_registry()
+    if PREWARM_CLIENTS:
+        app.state.client_prewarm = asyncio.get_running_loop().run_in_executor(
+            get_service_executor(), prewarm_clients, registry
+        )
+    app.state.client_registry = registry
+    watcher = get_deployment_watcher()
+    watcher.start()
+    training_queue = get_training_queue()
+    training_queue.start()
+    if ENDPOINT_POOL_SIZE:
+        # Endpoint creation takes minutes; fill the pool without holding up startup
+        app.state.endpoint_pool_fill = asyncio.create_task(get_async_deployment_service().fill_endpoint_pool(ENDPOINT_POOL_SIZE))
+    yield
+    # Running batch jobs checkpoint on cancel and can be resumed after restart
+    await get_batch_inference_service().close()
+    await training_queue.stop()
+    training_queue.close()
+    await get_adapter_registry().close()
+    await watcher.stop()
+    # Drop the shut-down executors from the cache so a restarted app (e.g. a second
+    # TestClient) gets working ones
+    for get_executor in (get_service_executor, get_transfer_executor):
+        get_executor().shutdown(wait=False, cancel_futures=True)
+        get_executor.cache_clear()
+    registry.close()
+
 app = FastAPI(
     title="LLM Training and Deployment API",
     description="API for managing datasets, training LLMs, and deploying them on Vertex AI",
     version="v1",
+    lifespan=lifespan,
 )
 
+def report_client_reuse():
+    """Counts the client constructions the pooled registry saves this request, for the response header."""
+    reused = begin_request_tracking()
+    return lambda: ("X-Client-Constructions-Avoided", str(sum(reused.values())))
+
+app.add_middleware(MetricsMiddleware, header_hooks=[report_client_reuse])
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 # Inject dependencies into routers
 app.include_router(
     datasets.router, dependencies=[Depends(get_gcs_service)]
@@ -25,4 +89,7 @@ app.include_router(
 )
 app.include_router(
     deployment.router, dependencies=[Depends(get_deployment_service)]
-)
\ No newline at end of file
+)
+app.include_router(adapters.router)
+app.include_router(inference.router)
+app.include_router(health.router)
@@ -1,80 +1,69 @@
-import os
-from google.cloud import aiplatform
-PROJECT_ID ="<PROJECT_ID>"
-REGION = "us-central1"
-ENDPOINT_ID="ENDPOINT_ID"
+import argparse
+import asyncio
+import json
+import sys
+from services.prediction_cache import PredictionCache
+from services.prediction_client import PredictionClient
 
-print(f"PROJECT_ID: {PROJECT_ID}")
-print(f"REGION: {REGION}")
-print(f"ENDPOINT_ID: {ENDPOINT_ID}")
 
-import logging
-logging.basicConfig(level=logging.DEBUG)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Send prompts to a vLLM endpoint on Vertex AI.")
+    parser.add_argument("--project", required=True)
+    parser.add_argument("--region", default="us-central1")
+    parser.add_argument("--endpoint", required=True, help="Endpoint ID")
+    parser.add_argument("--api-endpoint", help="Override the API host, e.g. localhost:8500 for a local stub")
+    parser.add_argument("--insecure", action="store_true", help="Plaintext channel, for local stubs only")
+    parser.add_argument("--lora-weight", default="", help="LoRA weights, e.g. gs://bucket/path/saves/llama3-8b/lora/sft")
+    # If you encounter `ServiceUnavailable: 503 Took too long to respond when processing`, reduce --max-tokens.
+    parser.add_argument("--max-tokens", type=int, default=50)
+    parser.add_argument("--temperature", type=float, default=1.0)
+    parser.add_argument("--top-p", type=float, default=1.0)
+    parser.add_argument("--top-k", type=int, default=1)
+    parser.add_argument("--raw-response", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=16, help="Instances per predict request")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="Concurrent predict requests")
+    parser.add_argument("--cache", action="store_true", help="Reuse predictions for repeated greedy prompts")
+    parser.add_argument("--cache-path", help="SQLite file that keeps cached predictions across runs")
+    parser.add_argument("--cache-ttl", type=float, default=86400.0, help="Seconds a cached prediction stays valid")
+    parser.add_argument("prompts", nargs="*", help="Prompts; read one per line from stdin when omitted")
+    return parser.parse_args()
 
-aiplatform.init(project=PROJECT_ID, location=REGION)
 
-client = aiplatform.gapic.PredictionServiceClient(client_options={"api_endpoint": f"{REGION}-aiplatform.googleapis.com"})
-
-# Define endpoint dictionary (you'll need to adjust based on your deployed endpoints)
-endpoints = {
-    "vllm_gpu": client.endpoint_path(
-        project=PROJECT_ID, location=REGION, endpoint=ENDPOINT_ID
-    ) 
-}
-
-print(endpoints)
-def predict_vllm(
-    prompt: str,
-    max_tokens: int,
-    temperature: float,
-    top_p: float,
-    top_k: int,
-    raw_response: bool,
-    lora_weight: str =  "",
-):
-    # Parameters for inference.
-    logging.debug(f"Sending prediction request to endpoint: {endpoints['vllm_gpu']}")
-    lora_weight = "<Lora weight path like gs://bucket/path/meta-llama/saves/llama3-8b/lora/sft>"
-    # print lora weight path
-    print(f"------------- Using lora_weight: {lora_weight} ---------\n")
-
-    
-    instance = {
-        "prompt": prompt,
-        "max_tokens": max_tokens,
-        "temperature": temperature,
-        "top_p": top_p,
-        "top_k": top_k,
-        "raw_response": raw_response,
+async def main():
+    args = parse_args()
+    parameters = {
+        "max_tokens": args.max_tokens,
+        "temperature": args.temperature,
+        "top_p": args.top_p,
+        "top_k": args.top_k,
+        "raw_response": args.raw_response,
     }
-    if lora_weight:
-        instance["dynamic-lora"] = lora_weight
-    instances = [instance]
-    # Call the predict method on the correct client object 
-    logging.info(f"Sending prediction request: {instances}")
-    response = client.predict(
-        endpoint=endpoints["vllm_gpu"],  # Pass the endpoint path
-        instances=instances,
-    )
-    logging.debug(f"Received response: {response}")
-    for prediction in response.predictions:
-        print(prediction)
+    if args.lora_weight:
+        parameters["dynamic-lora"] = args.lora_weight
+    cache = None
+    if args.cache or args.cache_path:
+        cache = PredictionCache(ttl=args.cache_ttl, disk_path=args.cache_path)
+    prompts = args.prompts or (line.rstrip("\n") for line in sys.stdin if line.strip())
 
-prompt = input("Enter your prompt: ")
-  # @param {type: "string"}
-# @markdown If you encounter the issue like `ServiceUnavailable: 503 Took too long to respond when processing`, you can reduce the maximum number of output tokens, such as set `max_tokens` as 20.
-max_tokens = 50  # @param {type:"integer"}
-temperature = 1.0  # @param {type:"number"}
-top_p = 1.0  # @param {type:"number"}
-top_k = 1  # @param {type:"integer"}
-raw_response = False  # @param {type:"boolean"}
+    async with PredictionClient(
+        args.endpoint,
+        args.project,
+        args.region,
+        max_batch_size=args.batch_size,
+        max_in_flight=args.max_in_flight,
+        api_endpoint=args.api_endpoint,
+        insecure=args.insecure,
+        cache=cache,
+    ) as client:
+        async for index, prediction in client.stream(prompts, **parameters):
+            if isinstance(prediction, Exception):
+                print(json.dumps({"index": index, "error": str(prediction)}), flush=True)
+            else:
+                print(json.dumps({"index": index, "prediction": prediction}, default=str), flush=True)
+        print(json.dumps(client.stats()), file=sys.stderr)
+    if cache is not None:
+        cache.close()
 
 
-predict_vllm(
-    prompt=prompt,
-    max_tokens=max_tokens,
-    temperature=temperature,
-    top_p=top_p,
-    top_k=top_k,
-    raw_response=raw_response,
-)
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
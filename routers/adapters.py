@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException, Depends
+from services.adapter_registry import AdapterRegistry
+from schemas import AdapterEndpointSchema, AdapterPredictSchema, AdapterSchema
+from typing import List
+from dependencies import get_adapter_registry
+
+router = APIRouter(prefix="/adapters", tags=["Adapters"])
+
+@router.post("/endpoints", response_model=dict)
+async def add_adapter_endpoint(
+    endpoint_data: AdapterEndpointSchema, registry: AdapterRegistry = Depends(get_adapter_registry)
+):
+    """Adds a LoRA-enabled vLLM endpoint to the shared pool and assigns waiting adapters to it."""
+    try:
+        return await registry.add_endpoint(
+            endpoint_data.endpoint_id, endpoint_data.base_model, endpoint_data.max_loras, endpoint_data.max_cpu_loras
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/endpoints", response_model=List[dict])
+async def list_adapter_endpoints(registry: AdapterRegistry = Depends(get_adapter_registry)):
+    """Lists pooled endpoints with their assigned adapters and those resident on GPU and CPU."""
+    try:
+        return await registry.list_endpoints()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/endpoints/{endpoint_id}", response_model=dict)
+async def remove_adapter_endpoint(endpoint_id: str, registry: AdapterRegistry = Depends(get_adapter_registry)):
+    """Removes an endpoint from the pool and reassigns its adapters."""
+    try:
+        await registry.remove_endpoint(endpoint_id)
+        return {"message": f"Endpoint {endpoint_id} removed from the adapter pool"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Endpoint not in the adapter pool: {endpoint_id}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/rebalance", response_model=dict)
+async def rebalance_adapters(registry: AdapterRegistry = Depends(get_adapter_registry)):
+    """Re-packs every adapter across the pool by expected traffic."""
+    try:
+        return await registry.rebalance()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stats", response_model=dict)
+async def get_adapter_stats(registry: AdapterRegistry = Depends(get_adapter_registry)):
+    """Reports how many predictions found their adapter on GPU, in CPU memory, or cold."""
+    return registry.stats()
+
+@router.post("", response_model=dict)
+async def register_adapter(adapter_data: AdapterSchema, registry: AdapterRegistry = Depends(get_adapter_registry)):
+    """Registers a trained LoRA adapter and assigns it to a pooled endpoint of its base model."""
+    try:
+        return await registry.register_adapter(
+            adapter_data.name, adapter_data.path, adapter_data.base_model, adapter_data.weight
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("", response_model=List[dict])
+async def list_adapters(registry: AdapterRegistry = Depends(get_adapter_registry)):
+    """Lists registered adapters with their assigned endpoint and where they are warm."""
+    try:
+        return await registry.list_adapters()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{name}", response_model=dict)
+async def remove_adapter(name: str, registry: AdapterRegistry = Depends(get_adapter_registry)):
+    """Unregisters an adapter."""
+    try:
+        await registry.remove_adapter(name)
+        return {"message": f"Adapter {name} removed"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Adapter not found: {name}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{name}/predict", response_model=dict)
+async def predict_with_adapter(
+    name: str, predict_data: AdapterPredictSchema, registry: AdapterRegistry = Depends(get_adapter_registry)
+):
+    """Sends a prompt to an endpoint where the adapter is already loaded, if any."""
+    try:
+        return await registry.predict(name, predict_data.model_dump())
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Adapter not found: {name}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
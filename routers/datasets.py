@@ -1,100 +1,403 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from services.gcs_service import GcsService
-from schemas import DatasetItem
-from typing import List, Optional, Dict
-import os
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from services.async_service import AsyncService
+from services.streaming_upload import (
+    UploadInterrupted,
+    decode_session_id,
+    encode_session_id,
+    stream_parallel_composite,
+    stream_resumable,
+)
+from services.gcs_service import CAS_INCOMING_PREFIX
+from schemas import CasCheckSchema, DatasetPage, PrepareDatasetSchema
+from utils.http_range import RangeNotSatisfiable, etag_matches, make_etag, parse_range
+from utils.dataset_profiler import DatasetProfiler, detect_format
+from utils.content_hash import ContentHasher
+from utils.streams import TeeReader
+from services.manifest_service import DatasetManifest
+from services.dataset_prep_service import DatasetPrepService
+from dependencies import get_async_gcs_service, get_dataset_manifest, get_dataset_prep_service
+from typing import Any, AsyncIterator, List, Optional, Dict
 import json
+import os
+import uuid
 
 
 
 router = APIRouter(prefix="/datasets", tags=["Datasets"])
 
-DATASET_INFO_FILE = "dataset_info.json" 
+# Streamed uploads larger than this use a parallel composite upload by default
+PARALLEL_UPLOAD_THRESHOLD = int(os.environ.get("PARALLEL_UPLOAD_THRESHOLD", str(1024 * 1024 * 1024)))
 
 @router.post("/upload", response_model=dict)
 async def upload_dataset(
     file: UploadFile = File(...),
-    gcs_service: GcsService = Depends(GcsService),
+    gcs_service: AsyncService = Depends(get_async_gcs_service),
     formatting: Optional[str] = None,
     columns: Optional[Dict[str, str]] = None,
+    dedupe: bool = False,
+    manifest: DatasetManifest = Depends(get_dataset_manifest),
 ):
-    """Uploads a dataset to GCS and updates dataset_info.json."""
+    """Uploads a dataset to GCS and updates dataset_info.json.
+
+    With ``dedupe=true`` the file is stored once per content hash under ``datasets/cas/``
+    and the dataset name becomes an alias for it.
+    """
     try:
         # Upload the dataset file to GCS
-        destination_blob_name = f"datasets/{file.filename}"
-        gcs_url = gcs_service.upload_file(file.file, destination_blob_name)
+        destination_blob_name = _upload_blob_name(file.filename, dedupe)
+        profiler = _new_profiler(file.filename, columns)
+        hasher = ContentHasher() if dedupe else None
+        sinks = [sink for sink in (profiler, hasher) if sink]
+        source = TeeReader(file.file, sinks) if sinks else file.file
+        await gcs_service.upload_file(source, destination_blob_name)
+        profile = await gcs_service.run(profiler.finish) if profiler else None
 
         # Update dataset_info.json
-        dataset_name = os.path.splitext(file.filename)[0]
-        await update_dataset_info(
-            gcs_service, dataset_name, file.filename, formatting, columns
+        return await _finish_upload(
+            gcs_service, manifest, destination_blob_name, file.size, formatting, None, columns, profile, hasher
         )
-
-        return {"message": f"Dataset uploaded to {gcs_url}", "gcs_url": gcs_url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def update_dataset_info(
-    gcs_service: GcsService,
+    manifest: DatasetManifest,
     dataset_name: str,
     file_name: str,
     formatting: Optional[str] = None,
     columns: Optional[Dict[str, str]] = None,
+    profile: Optional[Dict[str, Any]] = None,
+    sha256: Optional[str] = None,
+    merge: bool = False,
 ):
-    """Creates or updates dataset_info.json with the new dataset information."""
-    local_info_file = "dataset_info.json"
-    remote_info_path = f"datasets/{DATASET_INFO_FILE}"
-    print(f"Attempting to download dataset_info from: {remote_info_path}")
-    # Download dataset_info.json if it exists
+    """Registers the dataset, and its upload-time profile if any, in dataset_info.json.
+
+    With ``merge`` fields not given here (e.g. ``formatting``) keep their registered values.
+    """
+    entry = {"file_name": file_name}
+    if sha256:
+        entry["sha256"] = sha256
+    if formatting:
+        entry["formatting"] = formatting
+    if columns:
+        entry["columns"] = columns
+    if profile:
+        entry["profile"] = profile
+    await manifest.register(dataset_name, entry, merge=merge)
+
+def _new_profiler(file_name: str, columns: Optional[Dict[str, str]]) -> Optional[DatasetProfiler]:
+    """Returns a profiler for CSV/JSON/JSONL files, None for formats it cannot read."""
+    return DatasetProfiler(file_name, columns) if detect_format(file_name) else None
+
+def _upload_blob_name(filename: str, dedupe: bool) -> str:
+    """Deduplicated uploads land in a unique staging object until their hash is known."""
+    if dedupe:
+        return f"{CAS_INCOMING_PREFIX}{uuid.uuid4().hex}/{filename}"
+    return f"datasets/{filename}"
+
+def _feed_all(sinks: List[Any], chunk: bytes):
+    for sink in sinks:
+        sink.feed(chunk)
+
+async def _teed(gcs_service: AsyncService, chunks: AsyncIterator[bytes], sinks: List[Any]) -> AsyncIterator[bytes]:
+    """Passes chunks through unchanged while profiling/hashing them off the event loop."""
+    async for chunk in chunks:
+        if sinks:
+            await gcs_service.run(_feed_all, sinks, chunk)
+        yield chunk
+
+@router.post("/upload/stream", response_model=dict)
+async def upload_dataset_stream(
+    request: Request,
+    filename: str,
+    formatting: Optional[str] = None,
+    columns: Optional[str] = Query(None, description="JSON object mapping dataset_info column roles to column names"),
+    parallel: Optional[bool] = None,
+    dedupe: bool = False,
+    gcs_service: AsyncService = Depends(get_async_gcs_service),
+    manifest: DatasetManifest = Depends(get_dataset_manifest),
+):
+    """Streams the raw request body to GCS as it arrives.
+
+    Uses a resumable session by default; very large bodies (or ``parallel=true``)
+    are split into parts uploaded concurrently and composed at the end.
+    """
+    filename = os.path.basename(filename)
+    destination_blob_name = _upload_blob_name(filename, dedupe)
+    if parallel is None:
+        parallel = int(request.headers.get("content-length", 0)) > PARALLEL_UPLOAD_THRESHOLD
     try:
-        dataset_info_content = gcs_service.download_file(
-           remote_info_path
+        column_map = json.loads(columns) if columns else None
+        profiler = _new_profiler(filename, column_map)
+        hasher = ContentHasher() if dedupe else None
+        chunks = _teed(gcs_service, request.stream(), [sink for sink in (profiler, hasher) if sink])
+        session_id = None
+        if parallel:
+            size = await stream_parallel_composite(gcs_service, chunks, destination_blob_name)
+        else:
+            session_url = await gcs_service.start_resumable_upload(destination_blob_name)
+            session_id = encode_session_id(session_url, destination_blob_name)
+            size = await stream_resumable(gcs_service, chunks, session_id)
+        profile = await gcs_service.run(profiler.finish) if profiler else None
+        return await _finish_upload(
+            gcs_service, manifest, destination_blob_name, size, formatting, session_id, column_map, profile, hasher
+        )
+    except UploadInterrupted as e:
+        raise HTTPException(
+            status_code=502,
+            detail={"message": f"Upload interrupted: {e}", "session_id": e.session_id, "offset": e.offset},
         )
-        print(f"Successfully downloaded dataset_info.json")
-        with open(local_info_file, "wb") as f:
-            f.write(dataset_info_content)
-        with open(local_info_file, "r") as f:
-            dataset_info = json.load(f)
-    except FileNotFoundError:
-        print(f"dataset_info.json not found, creating a new one.")
-        dataset_info = {}
     except Exception as e:
-        print(f"Error during downloading dataset_info: {e}")
-        dataset_info = {}
+        raise HTTPException(status_code=500, detail=str(e))
 
-    # Update the dataset information
-    dataset_info[dataset_name] = {"file_name": file_name}
-    if formatting:
-        dataset_info[dataset_name]["formatting"] = formatting
-    if columns:
-        dataset_info[dataset_name]["columns"] = columns
-
-    # Upload the updated dataset_info.json
-    with open(local_info_file, "w") as f:
-        json.dump(dataset_info, f)
-    with open(local_info_file, "rb") as f:
-        print(f"Attempting to upload updated dataset_info to: {remote_info_path}")
-        gcs_service.upload_file(f, remote_info_path)
-        print(f"Successfully uploaded dataset_info.json")
-
-@router.get("/", response_model=List[DatasetItem])
-async def list_datasets(gcs_service: GcsService = Depends(GcsService)):
-    """Lists all uploaded datasets."""
+@router.get("/upload/{session_id}", response_model=dict)
+async def get_upload_session(session_id: str, gcs_service: AsyncService = Depends(get_async_gcs_service)):
+    """Reports how many bytes of an interrupted upload GCS has committed."""
+    try:
+        session = decode_session_id(session_id)
+        offset, complete = await gcs_service.query_upload_offset(session["session_url"])
+        return {"session_id": session_id, "offset": offset, "complete": complete}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/upload/{session_id}", response_model=dict)
+async def resume_upload(
+    request: Request,
+    session_id: str,
+    offset: int,
+    formatting: Optional[str] = None,
+    columns: Optional[str] = Query(None, description="JSON object mapping dataset_info column roles to column names"),
+    gcs_service: AsyncService = Depends(get_async_gcs_service),
+    manifest: DatasetManifest = Depends(get_dataset_manifest),
+):
+    """Resumes an interrupted streaming upload with a body starting at ``offset``.
+
+    ``columns`` are merged into any the dataset is already registered with. Only part
+    of the data passes through this request, so the profile (and, for deduplicated
+    uploads, the hash) is computed by reading the finished object back.
+    """
+    try:
+        session = decode_session_id(session_id)
+        blob_name = session["blob_name"]
+        if not blob_name.startswith("datasets/"):
+            raise ValueError("Invalid upload session ID")
+        column_map = json.loads(columns) if columns else None
+        committed, complete = await gcs_service.query_upload_offset(session["session_url"])
+        if complete:
+            raise HTTPException(status_code=409, detail="Upload already complete")
+        if offset > committed:
+            raise HTTPException(
+                status_code=416, detail={"message": "Offset is past the committed size", "offset": committed}
+            )
+        size = await stream_resumable(
+            gcs_service, _skip_bytes(request.stream(), committed - offset), session_id, committed
+        )
+        filename = os.path.basename(blob_name)
+        existing = (await manifest.get_entries()).get(os.path.splitext(filename)[0], {})
+        column_map = {**existing.get("columns", {}), **(column_map or {})} or None
+        profiler = _new_profiler(filename, column_map)
+        hasher = ContentHasher() if blob_name.startswith(CAS_INCOMING_PREFIX) else None
+        sinks = [sink for sink in (profiler, hasher) if sink]
+        if sinks:
+            await gcs_service.feed_blob(blob_name, sinks)
+        profile = await gcs_service.run(profiler.finish) if profiler else None
+        return await _finish_upload(
+            gcs_service, manifest, blob_name, size, formatting, session_id, column_map, profile, hasher, merge=True
+        )
+    except HTTPException:
+        raise
+    except UploadInterrupted as e:
+        raise HTTPException(
+            status_code=502,
+            detail={"message": f"Upload interrupted: {e}", "session_id": e.session_id, "offset": e.offset},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _skip_bytes(chunks, count: int):
+    """Drops the first ``count`` bytes a client re-sent that GCS already has."""
+    async for chunk in chunks:
+        if count >= len(chunk):
+            count -= len(chunk)
+            continue
+        yield chunk[count:]
+        count = 0
+
+async def _finish_upload(
+    gcs_service: AsyncService,
+    manifest: DatasetManifest,
+    blob_name: str,
+    size: Optional[int],
+    formatting: Optional[str],
+    session_id: Optional[str],
+    columns: Optional[Dict[str, str]] = None,
+    profile: Optional[Dict[str, Any]] = None,
+    hasher: Optional[ContentHasher] = None,
+    merge: bool = False,
+) -> dict:
+    filename = os.path.basename(blob_name)
+    sha256, deduplicated = None, False
+    if blob_name.startswith(CAS_INCOMING_PREFIX):
+        if hasher is None:
+            # A resumed upload lost the streamed hash state; hash what GCS stored instead
+            hasher = await gcs_service.hash_blob(blob_name)
+        extension = os.path.splitext(filename)[1].lower()
+        blob_name, deduplicated = await gcs_service.promote_to_cas(blob_name, hasher, extension)
+        sha256, size = hasher.sha256, hasher.size
+    else:
+        gcs_service.service.invalidate_listing(blob_name)
+    gcs_url = f"gs://{gcs_service.bucket_name}/{blob_name}"
+    dataset_name = os.path.splitext(filename)[0]
+    await update_dataset_info(
+        manifest, dataset_name, blob_name[len("datasets/"):], formatting, columns, profile, sha256, merge
+    )
+    return {
+        "message": f"Dataset uploaded to {gcs_url}",
+        "gcs_url": gcs_url,
+        "size": size,
+        "session_id": session_id,
+        "profile": profile,
+        "sha256": sha256,
+        "deduplicated": deduplicated,
+    }
+
+@router.post("/cas/check", response_model=dict)
+async def check_dataset_content(
+    check: CasCheckSchema,
+    gcs_service: AsyncService = Depends(get_async_gcs_service),
+    manifest: DatasetManifest = Depends(get_dataset_manifest),
+):
+    """Pre-flight for deduplicated uploads.
+
+    If content with this hash and size is already stored, registers ``filename`` as an
+    alias for it and returns ``exists: true``; the client can then skip the upload.
+    """
     try:
-        files = gcs_service.list_files("datasets/")
-        return files
+        filename = os.path.basename(check.filename)
+        extension = os.path.splitext(filename)[1].lower()
+        blob_name = await gcs_service.find_cas_object(check.sha256, extension, check.size)
+        if blob_name is None:
+            return {"exists": False, "sha256": check.sha256}
+        dataset_name = os.path.splitext(filename)[0]
+        await update_dataset_info(
+            manifest, dataset_name, blob_name[len("datasets/"):], check.formatting, check.columns, sha256=check.sha256
+        )
+        return {
+            "exists": True,
+            "sha256": check.sha256,
+            "gcs_url": f"gs://{gcs_service.bucket_name}/{blob_name}",
+            "dataset": dataset_name,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{gcs_url:path}", response_model=bytes)
-async def get_dataset(gcs_url: str, gcs_service: GcsService = Depends(GcsService)):
-    """Retrieves a specific dataset."""
+@router.get("/aliases", response_model=dict)
+async def list_dataset_aliases(manifest: DatasetManifest = Depends(get_dataset_manifest)):
+    """Maps each content hash to the dataset names that point at it."""
     try:
-        file_content = gcs_service.download_file(gcs_url)
-        return file_content
+        aliases: Dict[str, List[str]] = {}
+        for name, entry in (await manifest.get_entries()).items():
+            if entry.get("sha256"):
+                aliases.setdefault(entry["sha256"], []).append(name)
+        return {"aliases": aliases}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/prepare", response_model=dict)
+async def prepare_dataset(
+    prepare_data: PrepareDatasetSchema,
+    prep_service: DatasetPrepService = Depends(get_dataset_prep_service),
+):
+    """Shards a registered dataset into evenly sized JSONL files in the background.
+
+    When done, the dataset's dataset_info.json entry points at the train shards and,
+    with ``val_ratio``, a ``{dataset}_val`` entry is added for ``eval_dataset``.
+    """
+    try:
+        return prep_service.start(
+            prepare_data.dataset,
+            shard_bytes=prepare_data.shard_size_mb * 1024 * 1024,
+            val_ratio=prepare_data.val_ratio,
+            seed=prepare_data.seed,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/prepare/{dataset}", response_model=dict)
+async def get_prepare_status(dataset: str, prep_service: DatasetPrepService = Depends(get_dataset_prep_service)):
+    """Reports progress of a dataset preparation job and its shard index once finished."""
+    job = prep_service.jobs.get(dataset)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No preparation job for {dataset}")
+    return job
+
+@router.get("/", response_model=DatasetPage)
+async def list_datasets(
+    page_size: int = Query(100, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    prefix: str = "",
+    glob: Optional[str] = None,
+    gcs_service: AsyncService = Depends(get_async_gcs_service),
+):
+    """Lists uploaded datasets a page at a time, optionally filtered by prefix or glob."""
+    try:
+        return await gcs_service.list_files_page(
+            f"datasets/{prefix}", page_size, page_token, f"datasets/{glob}" if glob else None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{gcs_url:path}", response_class=StreamingResponse)
+async def get_dataset(gcs_url: str, request: Request, gcs_service: AsyncService = Depends(get_async_gcs_service)):
+    """Streams a dataset, honouring Range and If-None-Match headers."""
+    try:
+        blob = await gcs_service.get_blob_metadata(gcs_url)
+        size = blob.size
+        etag = make_etag(blob.generation, blob.crc32c)
+        headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        status_code = 200
+        start, end = 0, size - 1
+        byte_range = parse_range(request.headers.get("range"), size)
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        return StreamingResponse(
+            _stream_chunks(gcs_service, gcs_service.service.iter_blob_range(blob, start, end)),
+            status_code=status_code,
+            media_type=blob.content_type or "application/octet-stream",
+            headers=headers,
+        )
+    except RangeNotSatisfiable:
+        raise HTTPException(
+            status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"}
+        )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Dataset not found")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid GCS URL")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream_chunks(gcs_service: AsyncService, chunks):
+    """Pulls each chunk on the transfer executor so downloads never block the event loop."""
+    while True:
+        chunk = await gcs_service.run_transfer(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -1,35 +1,139 @@
-from fastapi import APIRouter, HTTPException, Depends
-from services.deployment_service import DeploymentService
-from schemas import DeployModelSchema, DeploymentJobStatus, VLLMDeployModelSchema
-from typing import Tuple
-from dependencies import get_deployment_service
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from services.async_service import AsyncService
+from services.deployment_watcher import DeploymentWatcher
+from services.adapter_registry import AdapterRegistry
+from schemas import AutoscalingSchema, DeployModelSchema, DeploymentJobStatus, VLLMDeployModelSchema, VLLMTuneSchema
+from utils.vllm_tuner import tune_vllm
+from typing import List, Optional, Tuple
+from dependencies import get_adapter_registry, get_async_deployment_service, get_deployment_watcher
+import json
 
 router = APIRouter(prefix="/deployment", tags=["Deployment"])
 
+def _deploy_kwargs(
+    deployment_data: DeployModelSchema, machine_type: str, min_replica_count: int, max_replica_count: int
+) -> dict:
+    autoscaling = deployment_data.autoscaling or AutoscalingSchema(
+        min_replica_count=min_replica_count, max_replica_count=max_replica_count
+    )
+    return dict(
+        model_id=deployment_data.model_id,
+        machine_type=machine_type,
+        endpoint_id=deployment_data.endpoint_id,
+        traffic_percentage=deployment_data.traffic_percentage,
+        undeploy_previous=deployment_data.undeploy_previous,
+        use_endpoint_pool=deployment_data.use_endpoint_pool,
+        **autoscaling.model_dump(),
+    )
+
+def _vllm_deploy_kwargs(deployment_data: VLLMDeployModelSchema) -> Tuple[dict, Optional[dict]]:
+    """deploy_model_vllm arguments for a request, after auto-tuning when it asks for it."""
+    tuning = None
+    if deployment_data.auto_tune:
+        tuning = tune_vllm(
+            deployment_data.base_model or deployment_data.model_id,
+            deployment_data.machine_type,
+            deployment_data.accelerator_type,
+            deployment_data.accelerator_count,
+            target_context_len=deployment_data.target_context_len,
+            dtype=deployment_data.dtype,
+            enable_lora=deployment_data.enable_lora,
+            max_loras=deployment_data.max_loras,
+        )
+        deployment_data = deployment_data.model_copy(update={
+            key: tuning[key] for key in ("gpu_memory_utilization", "max_model_len", "max_num_seqs", "swap_space")
+        })
+    kwargs = dict(
+        model_name=deployment_data.model_name,
+        model_id=deployment_data.model_id,
+        service_account=deployment_data.service_account,
+        machine_type=deployment_data.machine_type,
+        accelerator_type=deployment_data.accelerator_type,
+        accelerator_count=deployment_data.accelerator_count,
+        gpu_memory_utilization=deployment_data.gpu_memory_utilization,
+        max_model_len=deployment_data.max_model_len,
+        dtype=deployment_data.dtype,
+        enable_trust_remote_code=deployment_data.enable_trust_remote_code,
+        enforce_eager=deployment_data.enforce_eager,
+        enable_lora=deployment_data.enable_lora,
+        max_loras=deployment_data.max_loras,
+        max_cpu_loras=deployment_data.max_cpu_loras,
+        use_dedicated_endpoint=deployment_data.use_dedicated_endpoint,
+        max_num_seqs=deployment_data.max_num_seqs,
+        model_type=deployment_data.model_type,
+        swap_space=deployment_data.swap_space,
+        tensor_parallel_size=tuning["tensor_parallel_size"] if tuning else None,
+        endpoint_id=deployment_data.endpoint_id,
+        traffic_percentage=deployment_data.traffic_percentage,
+        undeploy_previous=deployment_data.undeploy_previous,
+        reuse_model=deployment_data.reuse_model,
+        use_endpoint_pool=deployment_data.use_endpoint_pool,
+        **deployment_data.autoscaling.model_dump(),
+    )
+    return kwargs, tuning
+
 @router.post("/deploy", response_model=dict)
 async def deploy_model(
     deployment_data: DeployModelSchema,
-    deployment_service: DeploymentService = Depends(DeploymentService),
+    deployment_service: AsyncService = Depends(get_async_deployment_service),
     machine_type: str = "n1-standard-2",
     min_replica_count: int = 1,
-    max_replica_count: int = 1
+    max_replica_count: int = 1,
+    watcher: DeploymentWatcher = Depends(get_deployment_watcher),
 ):
-    """Deploys a trained model as a Vertex AI Endpoint."""
+    """Deploys a trained model as a Vertex AI Endpoint.
+
+    With ``endpoint_id`` the model is added to that endpoint with a traffic split
+    instead of provisioning a new endpoint. ``autoscaling`` in the body takes
+    precedence over the replica count query parameters.
+    """
     try:
-        endpoint_id = deployment_service.deploy_model(deployment_data.model_id, machine_type, min_replica_count, max_replica_count)
+        deployment = await deployment_service.deploy_model(
+            **_deploy_kwargs(deployment_data, machine_type, min_replica_count, max_replica_count)
+        )
+        endpoint = deployment["endpoint"]
+        watcher.track(endpoint.name, wait=deployment["wait"], previous_model_ids=deployment["previous_model_ids"])
         return {
             "message": "Vertex AI Endpoint deployment job submitted",
-            "endpoint_id": endpoint_id,
+            "endpoint_id": endpoint.name,
+            "endpoint_source": deployment["endpoint_source"],
+            "deploy_spec": deployment["deploy_spec"],
+            "warnings": deployment["warnings"],
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/preview", response_model=dict)
+async def preview_deployment(
+    deployment_data: DeployModelSchema,
+    deployment_service: AsyncService = Depends(get_async_deployment_service),
+    machine_type: str = "n1-standard-2",
+    min_replica_count: int = 1,
+    max_replica_count: int = 1,
+):
+    """Shows the Model.deploy spec, autoscaling included, that /deploy would use, without deploying."""
+    try:
+        return await deployment_service.deploy_model(
+            **_deploy_kwargs(deployment_data, machine_type, min_replica_count, max_replica_count), dry_run=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/status/{endpoint_id}", response_model=DeploymentJobStatus)
 async def get_deployment_status(endpoint_id: str, 
-                                deployment_service: DeploymentService = Depends(get_deployment_service)):
+                                deployment_service: AsyncService = Depends(get_async_deployment_service),
+                                watcher: DeploymentWatcher = Depends(get_deployment_watcher)):
     """Checks the status of a model deployment job."""
     try:
-        status = deployment_service.get_deployment_status(endpoint_id)
+        # Deployments made through this API are answered from the watcher's cache
+        status = watcher.get(endpoint_id)
+        if status is None:
+            status = await deployment_service.get_deployment_status(endpoint_id)
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -37,32 +141,112 @@ async def get_deployment_status(endpoint_id: str,
 @router.post("/deploy_vllm", response_model=dict)
 async def deploy_vllm_model(
     deployment_data: VLLMDeployModelSchema,
-    deployment_service: DeploymentService = Depends(get_deployment_service) 
+    deployment_service: AsyncService = Depends(get_async_deployment_service),
+    watcher: DeploymentWatcher = Depends(get_deployment_watcher),
+    adapter_registry: AdapterRegistry = Depends(get_adapter_registry),
 ) -> dict:
-    """Deploys a trained model with vLLM into Vertex AI."""
+    """Deploys a trained model with vLLM into Vertex AI.
+
+    With ``auto_tune`` the vLLM memory and batching flags are derived from the model
+    geometry and GPU memory instead of taken from the request. LoRA-enabled endpoints
+    join the adapter pool for their base model once they are serving.
+    """
     try:
-        _, endpoint = deployment_service.deploy_model_vllm(
-            model_name=deployment_data.model_name,
-            model_id=deployment_data.model_id,
-            service_account=deployment_data.service_account,
-            machine_type=deployment_data.machine_type,
-            accelerator_type=deployment_data.accelerator_type,
-            accelerator_count=deployment_data.accelerator_count,
-            gpu_memory_utilization=deployment_data.gpu_memory_utilization,
-            max_model_len=deployment_data.max_model_len,
-            dtype=deployment_data.dtype,
-            enable_trust_remote_code=deployment_data.enable_trust_remote_code,
-            enforce_eager=deployment_data.enforce_eager,
-            enable_lora=deployment_data.enable_lora,
-            max_loras=deployment_data.max_loras,
-            max_cpu_loras=deployment_data.max_cpu_loras,
-            use_dedicated_endpoint=deployment_data.use_dedicated_endpoint,
-            max_num_seqs=deployment_data.max_num_seqs,
-            model_type=deployment_data.model_type,
-        )
+        kwargs, tuning = _vllm_deploy_kwargs(deployment_data)
+        deployment = await deployment_service.deploy_model_vllm(**kwargs)
+        endpoint = deployment["endpoint"]
+        watcher.track(endpoint.name, wait=deployment["wait"], previous_model_ids=deployment["previous_model_ids"])
+        if deployment_data.enable_lora:
+            await adapter_registry.add_endpoint(
+                endpoint.name, deployment_data.base_model or deployment_data.model_id,
+                deployment_data.max_loras, deployment_data.max_cpu_loras,
+            )
         return {
             "message": "Vertex AI Endpoint deployment job submitted for vLLM model",
             "endpoint_id": endpoint.name,
+            "endpoint_source": deployment["endpoint_source"],
+            "model_reused": deployment["model_reused"],
+            "deploy_spec": deployment["deploy_spec"],
+            "warnings": deployment["warnings"],
+            "tuning": tuning,
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/vllm/preview", response_model=dict)
+async def preview_vllm_deployment(
+    deployment_data: VLLMDeployModelSchema,
+    deployment_service: AsyncService = Depends(get_async_deployment_service),
+):
+    """Shows the Model.upload and Model.deploy specs /deploy_vllm would use, without deploying."""
+    try:
+        kwargs, tuning = _vllm_deploy_kwargs(deployment_data)
+        preview = await deployment_service.deploy_model_vllm(**kwargs, dry_run=True)
+        return {**preview, "tuning": tuning}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/pool", response_model=dict)
+async def get_endpoint_pool(deployment_service: AsyncService = Depends(get_async_deployment_service)):
+    """Lists the idle pre-created endpoints that deploys take before creating new ones."""
+    try:
+        idle = await deployment_service.list_endpoint_pool()
+        return {
+            "idle": idle,
+            "endpoints_from_pool": deployment_service.endpoints_from_pool,
+            "models_reused": deployment_service.models_reused,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/pool", response_model=dict)
+async def fill_endpoint_pool(size: int, deployment_service: AsyncService = Depends(get_async_deployment_service)):
+    """Creates idle endpoints until the pool holds ``size`` of them."""
+    try:
+        return await deployment_service.fill_endpoint_pool(size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/vllm/tune", response_model=dict)
+async def preview_vllm_tuning(tune_data: VLLMTuneSchema):
+    """Previews the vLLM flags auto-tuning would use, with the KV-cache budget behind them."""
+    try:
+        return tune_vllm(
+            tune_data.base_model or tune_data.model_id,
+            tune_data.machine_type,
+            tune_data.accelerator_type,
+            tune_data.accelerator_count,
+            target_context_len=tune_data.target_context_len,
+            dtype=tune_data.dtype,
+            enable_lora=tune_data.enable_lora,
+            max_loras=tune_data.max_loras,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/watched", response_model=List[DeploymentJobStatus])
+async def list_watched_deployments(watcher: DeploymentWatcher = Depends(get_deployment_watcher)):
+    """Lists every deployment the watcher tracks with its latest state and time to ready."""
+    return watcher.list()
+
+@router.get("/watch/{endpoint_id}")
+async def watch_deployment(
+    endpoint_id: str,
+    request: Request,
+    watcher: DeploymentWatcher = Depends(get_deployment_watcher),
+):
+    """Streams Server-Sent Events for each deployment state transition until it is ready or failed."""
+
+    async def events():
+        async for status in watcher.subscribe(endpoint_id):
+            if await request.is_disconnected():
+                return
+            yield f"event: state\ndata: {json.dumps(status)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Depends
+from services.client_registry import ClientRegistry
+from services.gcs_service import GcsService
+from services.status_cache import TrainingStatusCache
+from dependencies import get_client_registry, get_gcs_service, get_training_status_cache
+from utils.lazy_import import import_status
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+@router.get("/clients", response_model=dict)
+def get_client_health(check: bool = False, registry: ClientRegistry = Depends(get_client_registry)):
+    """Reports pooled client reuse and SDK imports and, optionally, checks and reconnects channels."""
+    try:
+        status = registry.stats()
+        status["imports"] = import_status()
+        if check:
+            status["health"] = registry.check_health()
+        return status
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/caches", response_model=dict)
+def get_cache_stats(
+    gcs_service: GcsService = Depends(get_gcs_service),
+    status_cache: TrainingStatusCache = Depends(get_training_status_cache),
+):
+    """Reports hit/miss counters for the in-memory caches."""
+    return {
+        "listing": gcs_service.listing_cache.stats(),
+        "training_status": status_cache.stats(),
+    }
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException, Depends
+from services.batch_inference import BatchInferenceService
+from schemas import BatchInferenceSchema
+from typing import List
+from dependencies import get_batch_inference_service
+
+router = APIRouter(prefix="/inference", tags=["Inference"])
+
+@router.post("/jobs", response_model=dict)
+async def create_batch_inference_job(
+    job_data: BatchInferenceSchema, batch_service: BatchInferenceService = Depends(get_batch_inference_service)
+):
+    """Starts running an endpoint over a JSONL prompt file, writing sharded JSONL results to the bucket."""
+    try:
+        return await batch_service.create(job_data)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs", response_model=List[dict])
+async def list_batch_inference_jobs(batch_service: BatchInferenceService = Depends(get_batch_inference_service)):
+    """Lists the jobs known to this server with their progress."""
+    return batch_service.list_jobs()
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_batch_inference_job(job_id: str, batch_service: BatchInferenceService = Depends(get_batch_inference_service)):
+    """Reports a job's state, checkpoint, throughput and ETA."""
+    try:
+        return batch_service.describe(await batch_service.get(job_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Batch inference job not found: {job_id}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/jobs/{job_id}/resume", response_model=dict)
+async def resume_batch_inference_job(job_id: str, batch_service: BatchInferenceService = Depends(get_batch_inference_service)):
+    """Continues a cancelled, failed or interrupted job from its last checkpoint."""
+    try:
+        return await batch_service.resume(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Batch inference job not found: {job_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/jobs/{job_id}", response_model=dict)
+async def cancel_batch_inference_job(job_id: str, batch_service: BatchInferenceService = Depends(get_batch_inference_service)):
+    """Stops a job after checkpointing it; finished shards stay in the bucket."""
+    try:
+        return await batch_service.cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Batch inference job not found: {job_id}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,26 +1,50 @@
-from fastapi import APIRouter, HTTPException, Depends
-from services.gcs_service import GcsService
-from services.training_service import TrainingService
-from schemas import GenerateConfigSchema, StartTrainingSchema, TrainingConfigItem, TrainingJobStatus
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from services.async_service import AsyncService
+from services.status_cache import TrainingStatusCache
+from services.training_service import TERMINAL_JOB_STATES
+from services.manifest_service import DatasetManifest
+from services.training_queue import TrainingQueue
+from services.sweep_service import SweepService
+from schemas import (
+    BulkTrainingStatusSchema,
+    GenerateConfigSchema,
+    PlanTrainingSchema,
+    StartTrainingSchema,
+    SweepSchema,
+    TrainingConfigPage,
+    TrainingJobStatus,
+)
 from utils.config_generator import generate_training_config
-from dependencies import get_training_service, get_gcs_service 
-from typing import List
+from utils.resource_planner import dataset_stats, plan_training
+from dependencies import (
+    get_async_gcs_service,
+    get_dataset_manifest,
+    get_sweep_service,
+    get_training_queue,
+    get_training_status_cache,
+)
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
 import os
+import yaml
 
 router = APIRouter(prefix="/training", tags=["Training"])
 
 @router.post("/generate_config", response_model=dict)
 async def generate_config_route(
     config_data: GenerateConfigSchema,
-    gcs_service: GcsService = Depends(GcsService)
+    gcs_service: AsyncService = Depends(get_async_gcs_service)
 ):
     """Generates LLM training YAML configuration."""
     try:
         yaml_content = generate_training_config(
-            config_data.dataset_dir, config_data.model_name_or_path, config_data.output_dir, config_data.dataset, config_data.training_config
+            config_data.dataset_dir, config_data.model_name_or_path, config_data.output_dir, config_data.dataset, config_data.training_config,
+            eval_dataset=config_data.eval_dataset,
         )
         destination_blob_name = f"training_configs/training_config_{os.urandom(4).hex()}.yaml"
-        gcs_url = gcs_service.upload_string_as_file(yaml_content, destination_blob_name)
+        gcs_url = await gcs_service.upload_string_as_file(yaml_content, destination_blob_name)
         return {
             "message": f"Training YAML uploaded to {gcs_url}",
             "gcs_url": gcs_url,
@@ -28,38 +52,227 @@ async def generate_config_route(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/configs", response_model=List[TrainingConfigItem])
-async def list_training_configs(gcs_service: GcsService = Depends(GcsService)):
-    """Lists all training YAML configurations."""
+@router.get("/configs", response_model=TrainingConfigPage)
+async def list_training_configs(
+    page_size: int = Query(100, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    prefix: str = "",
+    glob: Optional[str] = None,
+    gcs_service: AsyncService = Depends(get_async_gcs_service),
+):
+    """Lists training YAML configurations a page at a time, optionally filtered by prefix or glob."""
     try:
-        files = gcs_service.list_files("training_configs/")
-        return files
+        return await gcs_service.list_files_page(
+            f"training_configs/{prefix}", page_size, page_token, f"training_configs/{glob}" if glob else None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _plan_for_config(
+    gcs_service: AsyncService,
+    manifest: DatasetManifest,
+    config_gcs_url: str,
+    max_hours: Optional[float] = None,
+    node_count: int = 1,
+    dataset_rows: Optional[int] = None,
+    avg_tokens_per_row: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Sizes a stored training config using the profiles of the datasets it trains on."""
+    config = yaml.safe_load(await gcs_service.download_file(config_gcs_url))
+    stats = dataset_stats(await manifest.get_entries(), config.get("dataset", ""))
+    return plan_training(
+        config,
+        dataset_rows=dataset_rows or stats["dataset_rows"],
+        avg_tokens_per_row=avg_tokens_per_row or stats["avg_tokens_per_row"],
+        max_tokens_per_row=stats["max_tokens_per_row"],
+        max_hours=max_hours,
+        node_count=node_count,
+    )
+
+@router.post("/plan", response_model=dict)
+async def plan_training_job(
+    plan_data: PlanTrainingSchema,
+    gcs_service: AsyncService = Depends(get_async_gcs_service),
+    manifest: DatasetManifest = Depends(get_dataset_manifest),
+):
+    """Dry run: estimates memory, time and cost for a training config and picks a machine."""
+    try:
+        return await _plan_for_config(
+            gcs_service, manifest, plan_data.config_gcs_url, plan_data.max_hours, plan_data.node_count,
+            plan_data.dataset_rows, plan_data.avg_tokens_per_row,
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/start", response_model=dict)
 async def start_training(
     training_data: StartTrainingSchema,
-    gcs_service: GcsService = Depends(GcsService),
-    # training_service: TrainingService = Depends(TrainingService)
-    training_service: TrainingService = Depends(get_training_service)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    gcs_service: AsyncService = Depends(get_async_gcs_service),
+    manifest: DatasetManifest = Depends(get_dataset_manifest),
+    training_queue: TrainingQueue = Depends(get_training_queue),
 ):
-    """Starts a Vertex AI Custom Training job."""
+    """Queues a Vertex AI Custom Training job and waits briefly for it to be submitted.
+
+    With ``sizing="auto"`` the machine is chosen by the resource planner instead of
+    the default 8x A100. ``node_count`` > 1 runs the job across that many machines.
+    Retrying with the same ``Idempotency-Key`` header returns the original job.
+    """
     try:
-        if not gcs_service.file_exists(training_data.config_gcs_url):
+        if not await gcs_service.file_exists(training_data.config_gcs_url):
             raise HTTPException(status_code=400, detail=f"Training config not found: {training_data.config_gcs_url}")
-        job_id = training_service.start_training_job(training_data.config_gcs_url)
-        return {"message": "Vertex AI Custom Training job submitted", "job_id": job_id}
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid GCS URL")
+        plan = None
+        if training_data.sizing == "auto":
+            plan = await _plan_for_config(
+                gcs_service, manifest, training_data.config_gcs_url, training_data.max_hours, training_data.node_count
+            )
+        entry = await training_queue.enqueue(
+            training_data.config_gcs_url,
+            team=training_data.team,
+            priority=training_data.priority,
+            machine_spec=plan["machine_spec"] if plan else None,
+            node_count=training_data.node_count,
+            plan=plan,
+            idempotency_key=idempotency_key,
+        )
+        duplicate = entry["duplicate"]
+        entry = await training_queue.wait_for_submission(entry["queue_id"], training_data.wait_seconds)
+        if entry["state"] == "REJECTED":
+            raise HTTPException(status_code=502, detail=f"Training job submission failed: {entry['last_error']}")
+        message = "Vertex AI Custom Training job submitted" if entry["job_id"] else "Training job queued"
+        return {"message": message, **entry, "duplicate": duplicate}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/queue", response_model=List[dict])
+async def list_training_queue(
+    include_finished: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    training_queue: TrainingQueue = Depends(get_training_queue),
+):
+    """Lists queued and running training jobs in admission order."""
+    try:
+        return await training_queue.list(include_finished, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/queue/stats", response_model=dict)
+async def get_training_queue_stats(training_queue: TrainingQueue = Depends(get_training_queue)):
+    """Reports queue depth, wait times, GPUs in flight and quota backoff."""
+    try:
+        return await training_queue.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/queue/{queue_id}", response_model=dict)
+async def get_training_queue_entry(queue_id: str, training_queue: TrainingQueue = Depends(get_training_queue)):
+    """Gets one queue entry, including its job ID once submitted."""
+    entry = await training_queue.get(queue_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Queue entry not found: {queue_id}")
+    return entry
+
+@router.delete("/queue/{queue_id}", response_model=dict)
+async def cancel_training_queue_entry(queue_id: str, training_queue: TrainingQueue = Depends(get_training_queue)):
+    """Removes a job from the queue before it is submitted."""
+    if await training_queue.get(queue_id) is None:
+        raise HTTPException(status_code=404, detail=f"Queue entry not found: {queue_id}")
+    if not await training_queue.cancel(queue_id):
+        raise HTTPException(status_code=409, detail="Job already left the queue")
+    return {"message": "Training job removed from the queue", "queue_id": queue_id}
+
+@router.post("/sweeps", response_model=dict)
+async def create_sweep(sweep_data: SweepSchema, sweep_service: SweepService = Depends(get_sweep_service)):
+    """Starts a hyperparameter sweep over grid and/or random ranges of TrainingConfig fields.
+
+    Trial configs are uploaded together, at most ``max_parallel`` trials run at once,
+    and with ``early_stopping`` trials that fall behind the median eval_loss are cancelled.
+    """
+    try:
+        return await sweep_service.create(sweep_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sweeps", response_model=List[dict])
+async def list_sweeps(sweep_service: SweepService = Depends(get_sweep_service)):
+    """Lists the sweeps started by this server, without their trials."""
+    return [
+        {key: value for key, value in sweep.items() if key != "trials"} for sweep in sweep_service.sweeps.values()
+    ]
+
+@router.get("/sweeps/{sweep_id}", response_model=dict)
+async def get_sweep(sweep_id: str, sweep_service: SweepService = Depends(get_sweep_service)):
+    """Reports every trial's parameters, state and best eval_loss, plus the best trial so far."""
+    sweep = sweep_service.sweeps.get(sweep_id)
+    if sweep is None:
+        raise HTTPException(status_code=404, detail=f"Sweep not found: {sweep_id}")
+    return sweep
+
+@router.delete("/sweeps/{sweep_id}", response_model=dict)
+async def cancel_sweep(sweep_id: str, sweep_service: SweepService = Depends(get_sweep_service)):
+    """Cancels every queued and running trial of a sweep."""
+    if sweep_id not in sweep_service.sweeps:
+        raise HTTPException(status_code=404, detail=f"Sweep not found: {sweep_id}")
+    try:
+        return await sweep_service.cancel(sweep_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/status/{job_id}", response_model=TrainingJobStatus)
-async def get_training_status(job_id: str,  training_service: TrainingService = Depends(get_training_service)):
+async def get_training_status(job_id: str, status_cache: TrainingStatusCache = Depends(get_training_status_cache)):
     """Checks the status of a training job."""
     try:
-        status = training_service.get_training_job_status(job_id)
+        status = await status_cache.get(job_id)
         return status
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/status", response_model=List[TrainingJobStatus])
+async def get_training_statuses(
+    request_data: BulkTrainingStatusSchema,
+    status_cache: TrainingStatusCache = Depends(get_training_status_cache),
+):
+    """Checks the status of many training jobs in one call."""
+    try:
+        return await status_cache.get_many(request_data.job_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/watch/{job_id}")
+async def watch_training_status(
+    job_id: str,
+    request: Request,
+    poll_interval: float = Query(5.0, ge=1.0),
+    status_cache: TrainingStatusCache = Depends(get_training_status_cache),
+):
+    """Streams Server-Sent Events whenever the job changes state, until it finishes."""
+
+    async def events():
+        last_state = None
+        while not await request.is_disconnected():
+            try:
+                status = await status_cache.get(job_id)
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'job_id': job_id, 'error': str(e)})}\n\n"
+                return
+            if status["state"] != last_state:
+                last_state = status["state"]
+                yield f"event: state\ndata: {json.dumps(status)}\n\n"
+            else:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+            if last_state in TERMINAL_JOB_STATES:
+                return
+            await asyncio.sleep(poll_interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
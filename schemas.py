@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Dict, Any, List, Literal
 
 class TrainingConfig(BaseModel):
     learning_rate: float = Field(..., example=0.001)   
@@ -19,6 +19,19 @@ class TrainingConfig(BaseModel):
     per_device_eval_batch_size: int = Field(..., example=1)
     eval_strategy: str = Field(..., example="steps")
     eval_steps: int = Field(..., example=500)
+    preprocessing_num_workers: Optional[int] = Field(None, example=16)
+    dataloader_num_workers: Optional[int] = Field(None, example=4)
+    deepspeed: Optional[str] = Field(None, example="examples/deepspeed/ds_z3_config.json")
+    fsdp: Optional[str] = Field(None, example="full_shard auto_wrap")
+    fsdp_config: Optional[Dict[str, Any]] = Field(None, example={"transformer_layer_cls_to_wrap": ["LlamaDecoderLayer"]})
+
+    @model_validator(mode="after")
+    def check_sharding(self):
+        if self.deepspeed and self.fsdp:
+            raise ValueError("deepspeed and fsdp cannot be combined")
+        if self.fsdp_config and not self.fsdp:
+            raise ValueError("fsdp_config requires fsdp")
+        return self
 
 
 
@@ -27,13 +40,79 @@ class GenerateConfigSchema(BaseModel):
     model_name_or_path: str = Field(..., example="meta-llama/Meta-Llama-3-8B-Instruct")
     output_dir: str = Field(..., example="meta-llama/saves/llama3-8b/lora/sft")
     dataset: str = Field(..., example="my_dataset")
+    eval_dataset: Optional[str] = Field(None, example="my_dataset_val")
     training_config: TrainingConfig
 
+class SweepRange(BaseModel):
+    min: Optional[float] = Field(None, example=1e-5)
+    max: Optional[float] = Field(None, example=1e-3)
+    log: bool = Field(False, description="Sample uniformly in log space")
+    values: Optional[List[Any]] = Field(None, description="Sample uniformly from these values instead")
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.values is None and (self.min is None or self.max is None or self.min > self.max):
+            raise ValueError("A random range needs either values or min <= max")
+        if self.log and self.values is None and self.min <= 0:
+            raise ValueError("Log-scale ranges need min > 0")
+        return self
+
+class SweepSchema(BaseModel):
+    base: GenerateConfigSchema
+    grid: Dict[str, List[Any]] = Field({}, example={"lora_target": ["all", "q_proj,v_proj"]})
+    random: Dict[str, SweepRange] = Field({}, example={"learning_rate": {"min": 1e-5, "max": 1e-3, "log": True}})
+    num_trials: int = Field(1, ge=1, le=256, description="Random samples drawn per grid point")
+    seed: int = Field(0, example=0)
+    max_parallel: int = Field(4, ge=1, le=64, example=4)
+    team: str = Field("default", example="research")
+    priority: Literal["high", "normal", "low"] = Field("low", example="low")
+    early_stopping: bool = Field(True, description="Cancel trials whose eval_loss is worse than the median of their peers")
+    min_evals: int = Field(2, ge=1, description="Evaluations a trial gets before it can be stopped")
+    min_peers: int = Field(2, ge=1, description="Other trials with evaluations needed to compare against")
+
+class PrepareDatasetSchema(BaseModel):
+    dataset: str = Field(..., example="alpaca_en_demo")
+    shard_size_mb: int = Field(64, ge=1, example=64)
+    val_ratio: float = Field(0.0, ge=0.0, lt=1.0, example=0.1)
+    seed: int = Field(0, example=0)
+
+class CasCheckSchema(BaseModel):
+    filename: str = Field(..., example="my_dataset.jsonl")
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$", example="9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08")
+    size: int = Field(..., ge=0, example=1048576)
+    formatting: Optional[str] = Field(None, example="alpaca")
+    columns: Optional[Dict[str, str]] = None
+
 class StartTrainingSchema(BaseModel):
     config_gcs_url: str = Field(..., example="gs://your-gcs-bucket/training_configs/training_config_123.yaml")
+    sizing: Literal["fixed", "auto"] = Field("fixed", example="auto")
+    max_hours: Optional[float] = Field(None, gt=0, example=6.0)
+    node_count: int = Field(1, ge=1, le=64, example=1)
+    team: str = Field("default", example="research")
+    priority: Literal["high", "normal", "low"] = Field("normal", example="normal")
+    wait_seconds: float = Field(10.0, ge=0, le=60, description="How long to wait for the job to leave the queue")
+
+class PlanTrainingSchema(BaseModel):
+    config_gcs_url: str = Field(..., example="gs://your-gcs-bucket/training_configs/training_config_123.yaml")
+    max_hours: Optional[float] = Field(None, gt=0, example=6.0)
+    node_count: int = Field(1, ge=1, le=64, example=1)
+    dataset_rows: Optional[int] = Field(None, ge=1, description="Overrides the row count from the dataset profile")
+    avg_tokens_per_row: Optional[float] = Field(None, gt=0, description="Overrides the row length from the dataset profile")
+
+class AutoscalingSchema(BaseModel):
+    min_replica_count: int = Field(1, ge=1, description="Vertex AI v1 deployments keep at least one replica")
+    max_replica_count: Optional[int] = Field(None, ge=1, example=4, description="Defaults to min_replica_count, i.e. no autoscaling")
+    target_accelerator_duty_cycle: Optional[int] = Field(None, ge=1, le=100, example=60, description="GPU duty cycle % to scale on")
+    target_cpu_utilization: Optional[int] = Field(None, ge=1, le=100, example=60, description="CPU utilization % to scale on")
+    target_request_count_per_minute: Optional[int] = Field(None, ge=1, description="Requests per minute per replica to scale on")
 
 class DeployModelSchema(BaseModel):
     model_id: str = Field(..., description="ID of the trained model in Vertex AI Model Registry")
+    endpoint_id: Optional[str] = Field(None, description="Deploy onto this existing endpoint instead of a new one")
+    traffic_percentage: int = Field(100, ge=0, le=100, description="Share of the existing endpoint's traffic the new model gets")
+    undeploy_previous: bool = Field(False, description="Undeploy the endpoint's other models once the new one serves")
+    use_endpoint_pool: bool = Field(True, description="Take an idle pre-created endpoint when there is one")
+    autoscaling: Optional[AutoscalingSchema] = Field(None, description="Overrides the min/max_replica_count query parameters")
 
 class DatasetItem(BaseModel):
     filepath: str = Field(..., example="datasets/my_dataset.csv")
@@ -43,15 +122,28 @@ class TrainingConfigItem(BaseModel):
     filepath: str = Field(..., example="training_configs/training_config_123.yaml")
     gcs_url: str = Field(..., example="gs://your-gcs-bucket/training_configs/training_config_123.yaml")
 
+class DatasetPage(BaseModel):
+    items: List[DatasetItem]
+    next_page_token: Optional[str] = None
+
+class TrainingConfigPage(BaseModel):
+    items: List[TrainingConfigItem]
+    next_page_token: Optional[str] = None
+
 class TrainingJobStatus(BaseModel):
     job_id: str
     state: str
     error: Optional[str] = None
 
+class BulkTrainingStatusSchema(BaseModel):
+    job_ids: List[str] = Field(..., example=["3604209251972546560", "1178797123456789012"])
+
 class DeploymentJobStatus(BaseModel):
     endpoint_id: str
     state: str
     error: Optional[str] = None
+    deployed_model_ids: List[str] = []
+    time_to_ready_seconds: Optional[float] = None
 
 
 class VLLMDeployModelSchema(BaseModel):
@@ -71,4 +163,59 @@ class VLLMDeployModelSchema(BaseModel):
     max_cpu_loras: int = Field(8, example=8)
     use_dedicated_endpoint: bool = Field(False, example=False)
     max_num_seqs: int = Field(256, example=256)
-    model_type: str = Field(None, example=None)
\ No newline at end of file
+    model_type: str = Field(None, example=None)
+    swap_space: int = Field(16, ge=0, example=16)
+    auto_tune: bool = Field(False, description="Derive max_model_len, max_num_seqs, gpu_memory_utilization, swap_space and tensor parallelism from the model and GPU")
+    target_context_len: Optional[int] = Field(None, ge=512, example=8192)
+    base_model: Optional[str] = Field(None, example="meta-llama/Meta-Llama-3-8B-Instruct", description="Architecture to tune for when model_id is a path to a fine-tuned checkpoint")
+    endpoint_id: Optional[str] = Field(None, description="Deploy onto this existing endpoint instead of a new one")
+    traffic_percentage: int = Field(100, ge=0, le=100, description="Share of the existing endpoint's traffic the new model gets")
+    undeploy_previous: bool = Field(False, description="Undeploy the endpoint's other models once the new one serves")
+    reuse_model: bool = Field(True, description="Reuse an uploaded model with the same serving container spec")
+    use_endpoint_pool: bool = Field(True, description="Take an idle pre-created endpoint when there is one")
+    autoscaling: AutoscalingSchema = AutoscalingSchema()
+
+class VLLMTuneSchema(BaseModel):
+    model_id: str = Field(..., example="meta-llama/Meta-Llama-3-8B-Instruct")
+    base_model: Optional[str] = Field(None, example="meta-llama/Meta-Llama-3-8B-Instruct")
+    machine_type: str = Field("g2-standard-8", example="g2-standard-8")
+    accelerator_type: str = Field("NVIDIA_L4", example="NVIDIA_L4")
+    accelerator_count: int = Field(1, ge=1, example=1)
+    target_context_len: Optional[int] = Field(None, ge=512, example=8192)
+    dtype: str = Field("auto", example="auto")
+    enable_lora: bool = Field(False, example=False)
+    max_loras: int = Field(1, example=1)
+
+class AdapterSchema(BaseModel):
+    name: str = Field(..., example="support-bot-v3")
+    path: str = Field(..., example="gs://your-bucket/saves/llama3-8b/lora/sft", description="LoRA adapter directory, e.g. a training output_dir")
+    base_model: str = Field(..., example="meta-llama/Meta-Llama-3-8B-Instruct")
+    weight: float = Field(1.0, gt=0, description="Expected share of traffic, used to spread adapters across endpoints")
+
+class AdapterEndpointSchema(BaseModel):
+    endpoint_id: str = Field(..., example="5712755654179946496")
+    base_model: str = Field(..., example="meta-llama/Meta-Llama-3-8B-Instruct")
+    max_loras: int = Field(1, ge=1, example=4)
+    max_cpu_loras: int = Field(8, ge=1, example=16)
+
+class AdapterPredictSchema(BaseModel):
+    prompt: str = Field(..., example="What is a car?")
+    max_tokens: int = Field(50, ge=1)
+    temperature: float = Field(1.0, ge=0)
+    top_p: float = Field(1.0, gt=0, le=1)
+    top_k: int = Field(1, example=1)
+    raw_response: bool = False
+
+class BatchInferenceSchema(BaseModel):
+    endpoint_id: str = Field(..., example="5712755654179946496")
+    input_gcs_url: str = Field(..., example="gs://your-bucket/eval/prompts.jsonl", description="JSONL file with one prompt string or object per line")
+    prompt_field: str = Field("prompt", description="Key holding the prompt in object lines")
+    parameters: Dict[str, Any] = Field(
+        default_factory=dict,
+        example={"max_tokens": 256, "temperature": 0, "dynamic-lora": "gs://your-bucket/saves/llama3-8b/lora/sft"},
+        description="Sampling parameters added to every instance",
+    )
+    shard_size: int = Field(10000, ge=1, description="Input lines per output shard; also the unit of checkpointing")
+    max_batch_size: int = Field(16, ge=1, description="Instances per predict request")
+    max_in_flight: int = Field(32, ge=1, description="Concurrent predict requests")
+    max_failures: Optional[int] = Field(None, ge=0, description="Stop the job once more lines than this have failed")
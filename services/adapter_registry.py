@@ -0,0 +1,267 @@
+from collections import OrderedDict
+from services.async_service import AsyncService
+from services.deployment_watcher import DeploymentWatcher
+from services.prediction_cache import LORA_FIELD
+from services.prediction_client import PredictionClient
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import time
+
+ADAPTER_REGISTRY_BLOB = "adapters/registry.json"
+# Residency of an adapter on an endpoint, best first
+RESIDENCY_ORDER = ("gpu", "cpu", "cold")
+
+
+def to_gcs_uri(path: str) -> str:
+    """Training writes adapters under /gcs/{bucket}/...; vLLM loads them from gs://{bucket}/..."""
+    if path.startswith("/gcs/"):
+        return "gs://" + path[len("/gcs/"):]
+    return path
+
+
+class AdapterRegistry:
+    """Tracks LoRA adapters and the shared vLLM endpoints that serve them.
+
+    Each adapter is assigned to an endpoint of its base model. An endpoint takes at
+    most ``max_cpu_loras`` adapters, the size of vLLM's CPU adapter cache, and
+    adapters are spread by expected traffic (``weight``). Nothing in vLLM's API
+    reports which adapters are loaded, so residency is modelled from the requests
+    routed here. It follows vLLM's LRU caches: the ``max_loras`` most recently used
+    adapters are on the GPU, and the next ``max_cpu_loras`` are in host memory.
+    Predictions go to an endpoint where the adapter is already warm, when there is one.
+    """
+
+    def __init__(
+        self,
+        gcs_service: AsyncService,
+        project_id: str,
+        location: str,
+        watcher: Optional[DeploymentWatcher] = None,
+        blob_name: str = ADAPTER_REGISTRY_BLOB,
+    ):
+        self.gcs_service = gcs_service
+        self.project_id = project_id
+        self.location = location
+        self.watcher = watcher
+        self.blob_name = blob_name
+        self.adapters: Dict[str, Dict[str, Any]] = {}
+        self.endpoints: Dict[str, Dict[str, Any]] = {}
+        # endpoint id -> adapter names, most recently used last
+        self._resident: Dict[str, "OrderedDict[str, float]"] = {}
+        self._clients: Dict[str, PredictionClient] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self.routed = {residency: 0 for residency in RESIDENCY_ORDER}
+
+    async def _load(self):
+        if self._loaded:
+            return
+        data, _ = await self.gcs_service.read_json(self.blob_name)
+        self.adapters = data.get("adapters", {})
+        self.endpoints = data.get("endpoints", {})
+        self._resident = {endpoint_id: OrderedDict() for endpoint_id in self.endpoints}
+        self._loaded = True
+
+    async def _save(self):
+        # One API process owns the registry, so last-writer-wins is enough
+        await self.gcs_service.upload_string_as_file(
+            json.dumps({"adapters": self.adapters, "endpoints": self.endpoints}, indent=2), self.blob_name
+        )
+
+    def _load_by_endpoint(self) -> Dict[str, float]:
+        load = {endpoint_id: 0.0 for endpoint_id in self.endpoints}
+        for adapter in self.adapters.values():
+            if adapter["endpoint_id"] in load:
+                load[adapter["endpoint_id"]] += adapter["weight"]
+        return load
+
+    def _place(self, adapter: Dict[str, Any], load: Dict[str, float]):
+        """Assigns the adapter to the least-loaded endpoint of its base model that has a free slot."""
+        counts = {endpoint_id: 0 for endpoint_id in self.endpoints}
+        for other in self.adapters.values():
+            if other is not adapter and other["endpoint_id"] in counts:
+                counts[other["endpoint_id"]] += 1
+        candidates = [
+            endpoint for endpoint_id, endpoint in self.endpoints.items()
+            if endpoint["base_model"] == adapter["base_model"] and counts[endpoint_id] < endpoint["max_cpu_loras"]
+        ]
+        if not candidates:
+            adapter["endpoint_id"] = None
+            return
+        endpoint = min(candidates, key=lambda e: (load[e["endpoint_id"]], counts[e["endpoint_id"]]))
+        adapter["endpoint_id"] = endpoint["endpoint_id"]
+        load[endpoint["endpoint_id"]] += adapter["weight"]
+
+    def _pack(self, adapters: List[Dict[str, Any]]):
+        """Heaviest first onto the least-loaded endpoint (LPT), which keeps endpoint loads even."""
+        load = self._load_by_endpoint()
+        for adapter in adapters:
+            if adapter["endpoint_id"] in load:
+                load[adapter["endpoint_id"]] -= adapter["weight"]
+            adapter["endpoint_id"] = None
+        for adapter in sorted(adapters, key=lambda a: -a["weight"]):
+            self._place(adapter, load)
+
+    async def register_adapter(self, name: str, path: str, base_model: str, weight: float = 1.0) -> Dict[str, Any]:
+        """Adds or updates an adapter and assigns it an endpoint; ``endpoint_id`` is None when all are full."""
+        async with self._lock:
+            await self._load()
+            adapter = self.adapters.get(name) or {"name": name, "endpoint_id": None, "registered_at": time.time()}
+            adapter.update(path=to_gcs_uri(path), base_model=base_model, weight=weight)
+            self.adapters[name] = adapter
+            self._pack([adapter])
+            await self._save()
+            return self._describe_adapter(adapter)
+
+    async def remove_adapter(self, name: str):
+        async with self._lock:
+            await self._load()
+            del self.adapters[name]
+            for resident in self._resident.values():
+                resident.pop(name, None)
+            await self._save()
+
+    async def add_endpoint(self, endpoint_id: str, base_model: str, max_loras: int, max_cpu_loras: int) -> Dict[str, Any]:
+        """Adds a LoRA-enabled vLLM endpoint to the pool and moves unassigned adapters onto it."""
+        async with self._lock:
+            await self._load()
+            self.endpoints[endpoint_id] = {
+                "endpoint_id": endpoint_id,
+                "base_model": base_model,
+                "max_loras": max_loras,
+                # vLLM requires the CPU cache to hold at least the GPU slots
+                "max_cpu_loras": max(max_cpu_loras, max_loras),
+            }
+            self._resident.setdefault(endpoint_id, OrderedDict())
+            self._pack([a for a in self.adapters.values() if a["endpoint_id"] is None and a["base_model"] == base_model])
+            await self._save()
+            return self._describe_endpoint(endpoint_id)
+
+    async def remove_endpoint(self, endpoint_id: str):
+        """Drops an endpoint from the pool and reassigns its adapters to the remaining ones."""
+        async with self._lock:
+            await self._load()
+            del self.endpoints[endpoint_id]
+            self._resident.pop(endpoint_id, None)
+            client = self._clients.pop(endpoint_id, None)
+            if client is not None:
+                await client.close()
+            self._pack([a for a in self.adapters.values() if a["endpoint_id"] == endpoint_id])
+            await self._save()
+
+    async def rebalance(self) -> Dict[str, Any]:
+        """Re-packs every adapter from scratch, e.g. after weights change or endpoints are added."""
+        async with self._lock:
+            await self._load()
+            self._pack(list(self.adapters.values()))
+            await self._save()
+            return self._snapshot()
+
+    def _residency(self, endpoint_id: str, name: str) -> str:
+        resident = self._resident.get(endpoint_id)
+        if not resident or name not in resident:
+            return "cold"
+        endpoint = self.endpoints[endpoint_id]
+        # Position from the most recently used end of the LRU
+        rank = len(resident) - 1 - list(resident).index(name)
+        if rank < endpoint["max_loras"]:
+            return "gpu"
+        if rank < endpoint["max_cpu_loras"]:
+            return "cpu"
+        return "cold"
+
+    def _ready(self, endpoint_id: str) -> bool:
+        status = self.watcher.get(endpoint_id) if self.watcher else None
+        # Endpoints the watcher never saw were added by hand and are assumed to be serving
+        return status is None or status["state"] == "DEPLOYED"
+
+    def route(self, name: str) -> Dict[str, Any]:
+        """Picks the endpoint for a prediction on ``name`` and records the adapter as used there.
+
+        Endpoints where the adapter is on the GPU come first, then those holding it in
+        host memory, then its assigned endpoint, then the least-loaded endpoint of its
+        base model.
+        """
+        adapter = self.adapters[name]
+        candidates = [
+            endpoint_id for endpoint_id, endpoint in self.endpoints.items()
+            if endpoint["base_model"] == adapter["base_model"] and self._ready(endpoint_id)
+        ]
+        if not candidates:
+            raise ValueError(f"No serving endpoint for base model {adapter['base_model']}")
+        load = self._load_by_endpoint()
+        endpoint_id = min(
+            candidates,
+            key=lambda e: (
+                RESIDENCY_ORDER.index(self._residency(e, name)),
+                e != adapter["endpoint_id"],
+                load[e],
+            ),
+        )
+        residency = self._residency(endpoint_id, name)
+        self.routed[residency] += 1
+        resident = self._resident[endpoint_id]
+        resident[name] = time.time()
+        resident.move_to_end(name)
+        # Adapters beyond the CPU cache have been evicted by vLLM too
+        while len(resident) > self.endpoints[endpoint_id]["max_cpu_loras"]:
+            resident.popitem(last=False)
+        return {"endpoint_id": endpoint_id, "adapter": name, "path": adapter["path"], "residency": residency}
+
+    def _client(self, endpoint_id: str) -> PredictionClient:
+        client = self._clients.get(endpoint_id)
+        if client is None:
+            client = PredictionClient(endpoint_id, self.project_id, self.location)
+            self._clients[endpoint_id] = client
+        return client
+
+    async def predict(self, name: str, instance: Dict[str, Any]) -> Dict[str, Any]:
+        """Routes one instance to a warm endpoint for the adapter and returns the prediction with the route."""
+        await self._load()
+        route = self.route(name)
+        prediction = await self._client(route["endpoint_id"]).predict({**instance, LORA_FIELD: route["path"]})
+        return {**route, "prediction": prediction}
+
+    def _describe_adapter(self, adapter: Dict[str, Any]) -> Dict[str, Any]:
+        residency = {endpoint_id: self._residency(endpoint_id, adapter["name"]) for endpoint_id in self.endpoints}
+        return {**adapter, "residency": {e: state for e, state in residency.items() if state != "cold"}}
+
+    def _describe_endpoint(self, endpoint_id: str) -> Dict[str, Any]:
+        resident = self._resident.get(endpoint_id, {})
+        return {
+            **self.endpoints[endpoint_id],
+            "ready": self._ready(endpoint_id),
+            "assigned": sorted(a["name"] for a in self.adapters.values() if a["endpoint_id"] == endpoint_id),
+            "gpu": [name for name in reversed(resident) if self._residency(endpoint_id, name) == "gpu"],
+            "cpu": [name for name in reversed(resident) if self._residency(endpoint_id, name) == "cpu"],
+        }
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "adapters": [self._describe_adapter(adapter) for adapter in self.adapters.values()],
+            "endpoints": [self._describe_endpoint(endpoint_id) for endpoint_id in self.endpoints],
+        }
+
+    async def list_adapters(self) -> List[Dict[str, Any]]:
+        await self._load()
+        return [self._describe_adapter(adapter) for adapter in self.adapters.values()]
+
+    async def list_endpoints(self) -> List[Dict[str, Any]]:
+        await self._load()
+        return [self._describe_endpoint(endpoint_id) for endpoint_id in self.endpoints]
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.routed.values())
+        return {
+            "adapters": len(self.adapters),
+            "unassigned": sum(adapter["endpoint_id"] is None for adapter in self.adapters.values()),
+            "endpoints": len(self.endpoints),
+            "routed": dict(self.routed),
+            "warm_rate": round((self.routed["gpu"] + self.routed["cpu"]) / total, 4) if total else 0.0,
+        }
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
@@ -0,0 +1,64 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Iterable, Optional
+import asyncio
+import contextvars
+import functools
+
+
+def create_executor(max_workers: int, thread_name_prefix: str = "service-io") -> ThreadPoolExecutor:
+    """Creates the bounded pool that blocking GCS and Vertex SDK calls run on."""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+
+class AsyncService:
+    """Awaitable facade over a blocking service.
+
+    Every public method of the wrapped service becomes a coroutine that runs the
+    original call on the shared executor, so slow SDK calls never stall the event loop.
+    Methods named in ``transfer_methods`` run on ``transfer_executor`` instead, so bulk
+    uploads and downloads cannot take every thread from quick calls like status checks.
+    """
+
+    def __init__(
+        self,
+        service: Any,
+        executor: Executor,
+        transfer_executor: Optional[Executor] = None,
+        transfer_methods: Iterable[str] = (),
+    ):
+        self._service = service
+        self._executor = executor
+        self._transfer_executor = transfer_executor or executor
+        self._transfer_methods = frozenset(transfer_methods)
+
+    @property
+    def service(self) -> Any:
+        return self._service
+
+    async def run(self, func, *args, **kwargs) -> Any:
+        """Runs any blocking callable on the service executor, in a copy of the caller's context."""
+        return await self._run_on(self._executor, func, *args, **kwargs)
+
+    async def run_transfer(self, func, *args, **kwargs) -> Any:
+        """Like ``run``, on the transfer executor; for reads and writes of whole objects."""
+        return await self._run_on(self._transfer_executor, func, *args, **kwargs)
+
+    async def _run_on(self, executor: Executor, func, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        # run_in_executor does not carry contextvars over, so per-request state such as
+        # the client registry's usage tracking would otherwise be lost in the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._service, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        run = self.run_transfer if name in self._transfer_methods else self.run
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await run(attr, *args, **kwargs)
+
+        return call
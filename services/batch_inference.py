@@ -0,0 +1,310 @@
+from services.async_service import AsyncService
+from services.prediction_client import PredictionClient
+from schemas import BatchInferenceSchema
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import itertools
+import json
+import os
+import time
+
+# Every job keeps its record and output shards under BATCH_INFERENCE_PREFIX/{job_id}/
+BATCH_INFERENCE_PREFIX = "batch_inference"
+READ_CHUNK_SIZE = 8 * 1024 * 1024
+FINISHED_JOB_STATES = {"SUCCEEDED"}
+
+
+def _prompt_of(record: Any, prompt_field: str) -> Optional[str]:
+    if isinstance(record, str):
+        return record
+    if isinstance(record, dict) and isinstance(record.get(prompt_field), str):
+        return record[prompt_field]
+    return None
+
+
+class BatchInferenceService:
+    """Runs a vLLM endpoint over a JSONL prompt file in the bucket.
+
+    Input lines are numbered and grouped into shards of ``shard_size`` lines; each
+    shard's results are written, in input order, to ``outputs/part-{shard}.jsonl``
+    once every line in it is answered. The job record in ``job.json`` is the
+    checkpoint: it holds the finished shards and the byte offset where the first
+    unfinished shard starts, so a resumed job seeks straight there and redoes at
+    most the shards that were in flight.
+    """
+
+    def __init__(
+        self,
+        gcs_service: AsyncService,
+        project_id: str,
+        location: str,
+        client_factory: Optional[Callable[..., PredictionClient]] = None,
+    ):
+        self.gcs_service = gcs_service
+        self.project_id = project_id
+        self.location = location
+        # Builds the client for an endpoint; swapped for one pointing at a stub server in tests
+        self.client_factory = client_factory or self._default_client
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _default_client(self, endpoint_id: str, **options) -> PredictionClient:
+        return PredictionClient(endpoint_id, self.project_id, self.location, **options)
+
+    def _job_blob(self, job_id: str) -> str:
+        return f"{BATCH_INFERENCE_PREFIX}/{job_id}/job.json"
+
+    async def create(self, job: BatchInferenceSchema) -> Dict[str, Any]:
+        """Validates the input file and starts the job in the background."""
+        blob = await self.gcs_service.get_blob_metadata(job.input_gcs_url)
+        job_id = f"batch-{os.urandom(4).hex()}"
+        record = {
+            "job_id": job_id,
+            "state": "RUNNING",
+            "error": None,
+            **job.model_dump(),
+            "input_blob": blob.name,
+            "input_bytes": blob.size,
+            "output_prefix": f"gs://{self.gcs_service.bucket_name}/{BATCH_INFERENCE_PREFIX}/{job_id}/outputs",
+            "created_at": time.time(),
+            "finished_at": None,
+            "attempts": 0,
+            "checkpoint": {"resume_shard": 0, "resume_offset": 0, "completed_shards": [], "rows": 0, "errors": 0},
+            "progress": None,
+        }
+        self.jobs[job_id] = record
+        self._start(record)
+        return self.describe(record)
+
+    async def get(self, job_id: str) -> Dict[str, Any]:
+        """Returns a job from memory, or from its checkpoint for jobs started before a restart.
+
+        Raises KeyError when there is no such job.
+        """
+        record = self.jobs.get(job_id)
+        if record is None:
+            record, _ = await self.gcs_service.read_json(self._job_blob(job_id))
+            if not record:
+                raise KeyError(job_id)
+            if record["state"] == "RUNNING":
+                # Saved as running but nothing here runs it: the previous process died
+                record["state"] = "INTERRUPTED"
+            self.jobs[job_id] = record
+        return record
+
+    async def resume(self, job_id: str) -> Dict[str, Any]:
+        """Restarts a cancelled, failed or interrupted job from its last checkpoint."""
+        record = await self.get(job_id)
+        if job_id in self._tasks:
+            raise ValueError(f"Job {job_id} is already running")
+        if record["state"] in FINISHED_JOB_STATES:
+            raise ValueError(f"Job {job_id} has already finished")
+        record.update(state="RUNNING", error=None, finished_at=None)
+        self._start(record)
+        return self.describe(record)
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Stops a running job; finished shards are kept and it can be resumed later."""
+        record = await self.get(job_id)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return self.describe(record)
+
+    def _start(self, record: Dict[str, Any]):
+        task = asyncio.create_task(self._run(record))
+        self._tasks[record["job_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(record["job_id"], None))
+
+    async def _save(self, record: Dict[str, Any]):
+        await self.gcs_service.upload_string_as_file(json.dumps(record, indent=2), self._job_blob(record["job_id"]))
+
+    async def _run(self, record: Dict[str, Any]):
+        record["attempts"] += 1
+        checkpoint = record["checkpoint"]
+        record["progress"] = {
+            "started_at": time.time(),
+            "rows_done": checkpoint["rows"],
+            "rows_done_this_run": 0,
+            "lines_read": checkpoint["resume_shard"] * record["shard_size"],
+            "bytes_read": checkpoint["resume_offset"],
+            "errors": checkpoint["errors"],
+            "client": None,
+        }
+        try:
+            await self._save(record)
+            await self._process(record)
+            record["state"] = "SUCCEEDED"
+        except asyncio.CancelledError:
+            record["state"] = "CANCELLED"
+            record["finished_at"] = time.time()
+            await self._save(record)
+            raise
+        except Exception as e:
+            record["state"] = "FAILED"
+            record["error"] = str(e)
+        record["finished_at"] = time.time()
+        await self._save(record)
+
+    async def _read_lines(self, record: Dict[str, Any]) -> AsyncIterator[Tuple[int, int, bytes]]:
+        """Yields (line index, byte offset, line) for non-empty lines from the checkpoint on."""
+        checkpoint = record["checkpoint"]
+        reader = await self.gcs_service.open_blob(record["input_blob"], chunk_size=READ_CHUNK_SIZE)
+        try:
+            offset = checkpoint["resume_offset"]
+            index = checkpoint["resume_shard"] * record["shard_size"]
+            await self.gcs_service.run(reader.seek, offset)
+            tail = b""
+            while True:
+                chunk = await self.gcs_service.run_transfer(reader.read, READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                *lines, tail = (tail + chunk).split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield index, offset, line
+                        index += 1
+                    offset += len(line) + 1
+            if tail.strip():
+                yield index, offset, tail
+        finally:
+            reader.close()
+
+    async def _process(self, record: Dict[str, Any]):
+        checkpoint = record["checkpoint"]
+        progress = record["progress"]
+        shard_size = record["shard_size"]
+        completed = set(checkpoint["completed_shards"])
+        # shard -> {"rows", "errors", "expected": line count once the reader is past its end}
+        shards: Dict[int, Dict[str, Any]] = {}
+        shard_offsets: Dict[int, int] = {}
+        # stream position -> (line index, input record)
+        inputs: Dict[int, Tuple[int, Any]] = {}
+        positions = itertools.count()
+
+        def add_row(row: Dict[str, Any]):
+            state = shards[row["index"] // shard_size]
+            state["rows"].append(row)
+            progress["rows_done"] += 1
+            progress["rows_done_this_run"] += 1
+            if "error" in row:
+                state["errors"] += 1
+                progress["errors"] += 1
+                if record["max_failures"] is not None and progress["errors"] > record["max_failures"]:
+                    raise RuntimeError(f"More than {record['max_failures']} lines failed; last error: {row['error']}")
+
+        async def instances():
+            lines_read = None
+            async for index, offset, line in self._read_lines(record):
+                shard = index // shard_size
+                if index % shard_size == 0:
+                    shard_offsets[shard] = offset
+                    if shard - 1 in shards:
+                        shards[shard - 1]["expected"] = shard_size
+                lines_read = index + 1
+                progress["lines_read"] = lines_read
+                progress["bytes_read"] = offset + len(line) + 1
+                if shard in completed:
+                    continue
+                shards.setdefault(shard, {"rows": [], "errors": 0, "expected": None})
+                try:
+                    parsed = json.loads(line)
+                except ValueError:
+                    add_row({"index": index, "error": "Line is not valid JSON"})
+                    continue
+                prompt = _prompt_of(parsed, record["prompt_field"])
+                if prompt is None:
+                    add_row({"index": index, "input": parsed, "error": f"No {record['prompt_field']!r} string in line"})
+                    continue
+                inputs[next(positions)] = (index, parsed)
+                yield {**record["parameters"], "prompt": prompt}
+            if lines_read is not None and (lines_read - 1) // shard_size in shards:
+                last = (lines_read - 1) // shard_size
+                shards[last]["expected"] = lines_read - last * shard_size
+
+        options = {"max_batch_size": record["max_batch_size"], "max_in_flight": record["max_in_flight"]}
+        async with self.client_factory(record["endpoint_id"], **options) as client:
+            async for position, prediction in client.stream(instances()):
+                index, parsed = inputs.pop(position)
+                if isinstance(prediction, Exception):
+                    add_row({"index": index, "input": parsed, "error": str(prediction)})
+                else:
+                    add_row({"index": index, "input": parsed, "prediction": prediction})
+                progress["client"] = client.stats()
+                await self._write_finished_shards(record, shards, shard_offsets, completed)
+            progress["client"] = client.stats()
+        await self._write_finished_shards(record, shards, shard_offsets, completed)
+        if shards:
+            raise RuntimeError(f"Shards {sorted(shards)} did not receive every result")
+
+    async def _write_finished_shards(
+        self,
+        record: Dict[str, Any],
+        shards: Dict[int, Dict[str, Any]],
+        shard_offsets: Dict[int, int],
+        completed: set,
+    ):
+        """Uploads every shard whose lines are all answered and advances the checkpoint."""
+        finished = [shard for shard, state in shards.items() if len(state["rows"]) == state["expected"]]
+        if not finished:
+            return
+        checkpoint = record["checkpoint"]
+        prefix = f"{BATCH_INFERENCE_PREFIX}/{record['job_id']}/outputs"
+        for shard in sorted(finished):
+            state = shards.pop(shard)
+            rows = sorted(state["rows"], key=lambda row: row["index"])
+            content = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+            await self.gcs_service.upload_bytes(
+                content.encode("utf-8"), f"{prefix}/part-{shard:05d}.jsonl", content_type="application/jsonl"
+            )
+            completed.add(shard)
+            checkpoint["rows"] += len(rows)
+            checkpoint["errors"] += state["errors"]
+        checkpoint["completed_shards"] = sorted(completed)
+        # Resume from the first shard the reader has reached that is not written yet
+        pending = [shard for shard in shard_offsets if shard not in completed]
+        if pending:
+            checkpoint["resume_shard"] = min(pending)
+            checkpoint["resume_offset"] = shard_offsets[min(pending)]
+            for shard in [shard for shard in shard_offsets if shard < checkpoint["resume_shard"]]:
+                del shard_offsets[shard]
+        await self._save(record)
+
+    def describe(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """The job record with throughput and an ETA while it runs."""
+        description = dict(record)
+        progress = record.get("progress")
+        if record["state"] != "RUNNING" or not progress:
+            return description
+        elapsed = time.time() - progress["started_at"]
+        rate = progress["rows_done_this_run"] / elapsed if elapsed > 0 else 0.0
+        # Total lines are unknown until the end; extrapolate from bytes read per line so far
+        estimated_lines = None
+        if progress["lines_read"] and progress["bytes_read"]:
+            estimated_lines = max(
+                progress["lines_read"], round(record["input_bytes"] * progress["lines_read"] / progress["bytes_read"])
+            )
+        eta = None
+        if rate > 0 and estimated_lines is not None:
+            eta = round(max(estimated_lines - progress["rows_done"], 0) / rate, 1)
+        description["progress"] = {
+            **progress,
+            "estimated_lines": estimated_lines,
+            "lines_per_second": round(rate, 2),
+            "eta_seconds": eta,
+        }
+        return description
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [
+            {key: value for key, value in self.describe(record).items() if key != "checkpoint"}
+            for record in self.jobs.values()
+        ]
+
+    async def close(self):
+        """Cancels running jobs; each saves its checkpoint so it can be resumed."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,148 @@
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+from utils.lazy_import import lazy_import, prewarm
+import threading
+
+aiplatform = lazy_import("google.cloud.aiplatform")
+storage = lazy_import("google.cloud.storage")
+grpc = lazy_import("grpc")
+google_auth = lazy_import("google.auth")
+auth_requests = lazy_import("google.auth.transport.requests")
+
+# Scope of the session that sends resumable upload requests
+STORAGE_SCOPE = "https://www.googleapis.com/auth/devstorage.read_write"
+
+# Pooled clients the current request got without constructing them, by name.
+_request_reuse: ContextVar[Optional[Counter]] = ContextVar("request_reuse", default=None)
+
+
+def authorized_session() -> "auth_requests.AuthorizedSession":
+    """An HTTP session with the default credentials, for GCS calls the storage client has no public method for."""
+    credentials, _ = google_auth.default(scopes=[STORAGE_SCOPE])
+    return auth_requests.AuthorizedSession(credentials)
+
+
+def begin_request_tracking() -> Counter:
+    """Starts counting the client constructions the current request avoided."""
+    reused: Counter = Counter()
+    _request_reuse.set(reused)
+    return reused
+
+
+class ClientRegistry:
+    """Process-wide pool of GCS and Vertex AI clients shared across requests."""
+
+    def __init__(self, project_id: str, location: str = "us-central1", staging_bucket: str = None):
+        self.project_id = project_id
+        self.location = location
+        self.staging_bucket = staging_bucket
+        self.client_options = {"api_endpoint": f"{location}-aiplatform.googleapis.com"}
+        self._factories: Dict[str, Callable[[], Any]] = {
+            "storage": lambda: storage.Client(project=self.project_id),
+            "job": lambda: aiplatform.gapic.JobServiceClient(client_options=self.client_options),
+            "endpoint": lambda: aiplatform.gapic.EndpointServiceClient(client_options=self.client_options),
+            "upload_session": authorized_session,
+        }
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._aiplatform_initialized = False
+        self.constructed = 0
+        self.reused = 0
+        self.reconnects = 0
+
+    def _record_reuse(self, name: str):
+        reused = _request_reuse.get()
+        if reused is not None:
+            reused[name] += 1
+
+    def get(self, name: str) -> Any:
+        """Returns the pooled client, constructing it on first use."""
+        client = self._clients.get(name)
+        with self._lock:
+            if client is None:
+                client = self._clients.get(name)
+            if client is None:
+                client = self._factories[name]()
+                self._clients[name] = client
+                self.constructed += 1
+                return client
+            self.reused += 1
+        self._record_reuse(name)
+        return client
+
+    def init_aiplatform(self):
+        """Calls aiplatform.init once per process instead of once per request."""
+        with self._lock:
+            if not self._aiplatform_initialized:
+                aiplatform.init(
+                    project=self.project_id,
+                    location=self.location,
+                    staging_bucket=self.staging_bucket,
+                )
+                self._aiplatform_initialized = True
+                self.constructed += 1
+                return
+            self.reused += 1
+        self._record_reuse("aiplatform")
+
+    def warm(self) -> Dict[str, float]:
+        """Imports the SDKs and constructs every client up front so the first request does not pay for it.
+
+        Returns the seconds spent importing each lazily loaded module.
+        """
+        timings = prewarm()
+        self.init_aiplatform()
+        for name in self._factories:
+            self.get(name)
+        return timings
+
+    def reset(self, name: str):
+        """Drops a client so the next lookup builds a fresh one."""
+        with self._lock:
+            client = self._clients.pop(name, None)
+            if client is not None:
+                self.reconnects += 1
+        if client is not None:
+            _close_client(client)
+
+    def check_health(self, timeout: float = 5.0) -> Dict[str, str]:
+        """Checks gRPC channels of the pooled Vertex clients, reconnecting dead ones."""
+        health = {}
+        for name, client in list(self._clients.items()):
+            channel = getattr(getattr(client, "transport", None), "grpc_channel", None)
+            if channel is None:
+                health[name] = "ok"
+                continue
+            try:
+                grpc.channel_ready_future(channel).result(timeout=timeout)
+                health[name] = "ok"
+            except grpc.FutureTimeoutError:
+                self.reset(name)
+                self.get(name)
+                health[name] = "reconnected"
+        return health
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": sorted(self._clients),
+            "constructed": self.constructed,
+            "reused": self.reused,
+            "reconnects": self.reconnects,
+        }
+
+    def close(self):
+        """Closes all pooled clients. Called on application shutdown."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            _close_client(client)
+
+
+def _close_client(client: Any):
+    transport = getattr(client, "transport", None)
+    if transport is not None:
+        transport.close()
+    elif hasattr(client, "close"):
+        client.close()
@@ -0,0 +1,158 @@
+from services.async_service import AsyncService
+from services.manifest_service import DatasetManifest
+from utils.dataset_profiler import RecordStream
+from typing import Any, Dict, List
+import asyncio
+import hashlib
+import json
+import time
+
+# Uncompressed bytes per shard; keeps shards evenly sized regardless of row length
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
+READ_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class _ShardWriter:
+    """Buffers JSONL rows for one split and uploads a shard each time it fills up."""
+
+    def __init__(self, gcs_service, prefix: str, shard_bytes: int):
+        self.gcs_service = gcs_service
+        self.prefix = prefix
+        self.shard_bytes = shard_bytes
+        self.buffer = bytearray()
+        self.rows_in_buffer = 0
+        self.shards: List[Dict[str, Any]] = []
+        self.rows = 0
+
+    def write(self, line: bytes):
+        self.buffer.extend(line)
+        self.rows_in_buffer += 1
+        self.rows += 1
+        if len(self.buffer) >= self.shard_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self.rows_in_buffer:
+            return
+        name = f"{self.prefix}/part-{len(self.shards):05d}.jsonl"
+        self.gcs_service.upload_bytes(bytes(self.buffer), name, content_type="application/jsonl")
+        self.shards.append({"blob_name": name, "rows": self.rows_in_buffer, "bytes": len(self.buffer)})
+        self.buffer = bytearray()
+        self.rows_in_buffer = 0
+
+
+def _in_validation(raw: str, seed: int, val_ratio: float) -> bool:
+    """Deterministic split: the same row always lands in the same split for a given seed."""
+    digest = hashlib.blake2b(f"{seed}:{raw}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < val_ratio
+
+
+class DatasetPrepService:
+    """Rewrites an uploaded dataset as evenly sized JSONL shards for parallel loading.
+
+    Shards are written under ``datasets/{name}/shards/{split}/`` with an
+    ``index.json`` next to them, and the dataset's dataset_info.json entry is
+    pointed at the shard directory so llamafactory loads every shard.
+    """
+
+    def __init__(self, gcs_service: AsyncService, manifest: DatasetManifest):
+        self.gcs_service = gcs_service
+        self.manifest = manifest
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    def start(self, dataset_name: str, **options) -> Dict[str, Any]:
+        """Starts preparing a dataset in the background and returns its job record."""
+        job = self.jobs.get(dataset_name)
+        if job and job["state"] == "RUNNING":
+            raise ValueError(f"Dataset {dataset_name} is already being prepared")
+        job = {"dataset": dataset_name, "state": "RUNNING", "error": None, "index": None, "started_at": time.time()}
+        self.jobs[dataset_name] = job
+        asyncio.create_task(self._run(job, dataset_name, **options))
+        return job
+
+    async def _run(self, job: Dict[str, Any], dataset_name: str, **options):
+        try:
+            job["index"] = await self.prepare(dataset_name, **options)
+            job["state"] = "SUCCEEDED"
+        except Exception as e:
+            job["state"] = "FAILED"
+            job["error"] = str(e)
+
+    async def prepare(
+        self,
+        dataset_name: str,
+        shard_bytes: int = DEFAULT_SHARD_BYTES,
+        val_ratio: float = 0.0,
+        seed: int = 0,
+    ) -> Dict[str, Any]:
+        entries = await self.manifest.get_entries()
+        entry = entries.get(dataset_name)
+        if entry is None:
+            raise FileNotFoundError(f"Dataset {dataset_name} is not registered in dataset_info.json")
+        source = entry.get("source_file_name", entry["file_name"])
+        index = await self.gcs_service.run_transfer(self._shard, dataset_name, source, shard_bytes, val_ratio, seed)
+
+        # Point the dataset at its train shards; configs that name it pick them up as-is
+        shared = {key: entry[key] for key in ("formatting", "columns", "tags") if key in entry}
+        await self.manifest.register(
+            dataset_name,
+            {"file_name": index["splits"]["train"]["directory"], "source_file_name": source, "sharded": True},
+            merge=True,
+        )
+        if val_ratio > 0:
+            await self.manifest.register(
+                f"{dataset_name}_val",
+                {**shared, "file_name": index["splits"]["val"]["directory"], "source_file_name": source, "sharded": True},
+            )
+        return index
+
+    def _shard(self, dataset_name: str, source: str, shard_bytes: int, val_ratio: float, seed: int) -> Dict[str, Any]:
+        gcs = self.gcs_service.service
+        base = f"datasets/{dataset_name}/shards"
+        writers = {"train": _ShardWriter(gcs, f"{base}/train", shard_bytes)}
+        if val_ratio > 0:
+            writers["val"] = _ShardWriter(gcs, f"{base}/val", shard_bytes)
+        # Drop shards from an earlier run so stale parts are not loaded alongside new ones
+        gcs.delete_blobs([item["filepath"] for item in gcs.list_files(f"{base}/")])
+        stream = RecordStream(source)
+        malformed = 0
+        started = time.monotonic()
+
+        def route(records):
+            nonlocal malformed
+            for raw, record in records:
+                if record is None:
+                    malformed += 1
+                    continue
+                split = "val" if val_ratio > 0 and _in_validation(raw, seed, val_ratio) else "train"
+                writers[split].write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+        with gcs.open_blob(f"datasets/{source}", chunk_size=READ_CHUNK_SIZE) as reader:
+            while True:
+                chunk = reader.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                route(stream.feed(chunk))
+        route(stream.close())
+        for writer in writers.values():
+            writer.flush()
+
+        index = {
+            "dataset": dataset_name,
+            "source_file_name": source,
+            "val_ratio": val_ratio,
+            "seed": seed,
+            "malformed_rows": malformed,
+            "seconds": round(time.monotonic() - started, 2),
+            "splits": {
+                split: {
+                    # Relative to dataset_dir, which is the datasets/ prefix
+                    "directory": f"{dataset_name}/shards/{split}",
+                    "rows": writer.rows,
+                    "shards": writer.shards,
+                }
+                for split, writer in writers.items()
+            },
+        }
+        gcs.upload_string_as_file(json.dumps(index, indent=2), f"{base}/index.json")
+        return index
@@ -1,75 +1,313 @@
-from google.cloud import aiplatform
+import hashlib
+import json
+import logging
 import os
-from typing import Tuple
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from google.api_core.exceptions import PreconditionFailed
+from services.client_registry import ClientRegistry
+from services.gcs_service import GcsService
+from utils.autoscaling import autoscaling_spec
+from utils.lazy_import import lazy_import
+from utils.log import digest_secrets, redact
+from utils.metrics import instrument_service, record_retry
 
+aiplatform = lazy_import("google.cloud.aiplatform")
+logger = logging.getLogger(__name__)
+
+# Model label holding the hash of its serving container spec, so identical uploads are reused
+SERVING_SPEC_LABEL = "serving_spec"
+# Endpoint label marking pre-created endpoints: "idle" until a deploy takes one, then "in_use"
+ENDPOINT_POOL_LABEL = "endpoint_pool"
+POOL_ENDPOINT_DISPLAY_NAME = "pooled-endpoint"
+# Claims on pool endpoints, shared by every API process through a generation-match write
+POOL_CLAIMS_BLOB = "deployment/endpoint_pool.json"
+# A claim whose endpoint is still labelled idle after this long was abandoned by a crashed process
+POOL_CLAIM_TTL = 600.0
+POOL_CLAIM_RETRIES = 10
+
+
+def serving_spec_hash(spec: Dict[str, Any]) -> str:
+    """Stable hash of a Model.upload container spec, short enough for a label value.
+
+    Secrets such as HF_TOKEN enter the hash only as their sha256 digest: the hash ends
+    up in a label and in dry-run responses, yet a rotated token must still produce a
+    new model rather than reuse one serving with the old token.
+    """
+    return hashlib.sha256(json.dumps(digest_secrets(spec), sort_keys=True).encode()).hexdigest()[:32]
+
+
+@instrument_service("vertex_deployment", exclude=("deploy_spec", "vllm_serving_spec"))
 class DeploymentService:
-    def __init__(self, project_id: str, location: str = "us-central1"):
+    def __init__(
+        self,
+        project_id: str,
+        location: str = "us-central1",
+        client_registry: ClientRegistry = None,
+        gcs_service: GcsService = None,
+    ):
         self.project_id = project_id
         self.location = location
         self.staging_bucket = f"gs://{os.environ.get('GCS_BUCKET_NAME')}"
-        aiplatform.init(project=project_id, location=location, staging_bucket=self.staging_bucket)
+        self.client_registry = client_registry
+        self._gcs_service = gcs_service
+        self._aiplatform_initialized = False
         self.VLLM_DOCKER_URI = "us-docker.pkg.dev/vertex-ai/vertex-vision-model-garden-dockers/pytorch-vllm-serve:20241212_0916_RC00"
+        # serving spec hash -> model resource name
+        self._models_by_spec: Dict[str, str] = {}
+        self._pool_lock = threading.Lock()
+        self.models_reused = 0
+        self.endpoints_from_pool = 0
+
+    def _init_aiplatform(self):
+        """Runs aiplatform.init before the first high-level SDK call."""
+        # Not done in __init__: the deployment watcher builds this service at startup,
+        # and that would import the SDK before the first request
+        if self._aiplatform_initialized:
+            return
+        if self.client_registry:
+            self.client_registry.init_aiplatform()
+        else:
+            aiplatform.init(project=self.project_id, location=self.location, staging_bucket=self.staging_bucket)
+        self._aiplatform_initialized = True
+
+    @property
+    def gcs_service(self) -> GcsService:
+        if self._gcs_service is None:
+            self._gcs_service = GcsService(client_registry=self.client_registry)
+        return self._gcs_service
+
+    def _endpoint_client(self) -> "aiplatform.gapic.EndpointServiceClient":
+        if self.client_registry:
+            return self.client_registry.get("endpoint")
+        api_endpoint = f"{self.location}-aiplatform.googleapis.com"
+        return aiplatform.gapic.EndpointServiceClient(client_options={"api_endpoint": api_endpoint})
 
-    def deploy_model(self, model_id: str, machine_type: str = "n1-standard-2", min_replica_count: int = 1, max_replica_count: int = 1) -> str:
-        """Deploys a model to a Vertex AI Endpoint."""
-        endpoint = aiplatform.Endpoint.create(
-            display_name="llm-endpoint",
+    def _create_endpoint(self, display_name: str, labels: Dict[str, str] = None) -> "aiplatform.Endpoint":
+        return aiplatform.Endpoint.create(
+            display_name=display_name,
+            labels=labels,
             project=self.project_id,
             location=self.location,
             create_request_timeout=180,
         )
 
+    def _idle_pool_endpoints(self) -> List["aiplatform.Endpoint"]:
+        endpoints = aiplatform.Endpoint.list(
+            filter=f'labels.{ENDPOINT_POOL_LABEL}="idle"', project=self.project_id, location=self.location
+        )
+        return [endpoint for endpoint in endpoints if not endpoint.gca_resource.deployed_models]
+
+    def fill_endpoint_pool(self, size: int) -> Dict[str, Any]:
+        """Creates idle endpoints until the pool holds ``size`` of them."""
+        self._init_aiplatform()
+        idle = len(self._idle_pool_endpoints())
+        created = [
+            self._create_endpoint(POOL_ENDPOINT_DISPLAY_NAME, labels={ENDPOINT_POOL_LABEL: "idle"}).name
+            for _ in range(max(size - idle, 0))
+        ]
+        return {"idle": idle + len(created), "created": created}
+
+    def list_endpoint_pool(self) -> List[Dict[str, Any]]:
+        self._init_aiplatform()
+        return [
+            {"endpoint_id": endpoint.name, "create_time": str(endpoint.create_time)}
+            for endpoint in self._idle_pool_endpoints()
+        ]
+
+    def _claim_pool_endpoint(self, display_name: str) -> Optional["aiplatform.Endpoint"]:
+        """Takes an idle pool endpoint, or returns None when there is none left.
+
+        Labels are not a compare-and-swap, so two API processes could both see the same
+        endpoint as idle. Each claim is first recorded in POOL_CLAIMS_BLOB with a
+        generation-match write; the loser of a race re-reads the claims and picks another
+        endpoint. The winner then relabels its endpoint "in_use".
+        """
+        for attempt in range(POOL_CLAIM_RETRIES):
+            idle = self._idle_pool_endpoints()
+            if not idle:
+                return None
+            record, generation = self.gcs_service.read_json(POOL_CLAIMS_BLOB)
+            now = time.time()
+            idle_names = {endpoint.name for endpoint in idle}
+            # Claims on relabelled endpoints are done; expired ones were never completed
+            claims = {
+                name: claim
+                for name, claim in record.get("claims", {}).items()
+                if name in idle_names and now - claim["claimed_at"] < POOL_CLAIM_TTL
+            }
+            free = [endpoint for endpoint in idle if endpoint.name not in claims]
+            if not free:
+                return None
+            endpoint = free[0]
+            claims[endpoint.name] = {"claimed_at": now, "display_name": display_name}
+            try:
+                self.gcs_service.write_json(POOL_CLAIMS_BLOB, {"claims": claims}, if_generation_match=generation)
+            except PreconditionFailed:
+                # Another process claimed an endpoint since we read the record
+                record_retry("gcs", "write_json")
+                continue
+            return endpoint.update(display_name=display_name, labels={ENDPOINT_POOL_LABEL: "in_use"})
+        raise RuntimeError(f"Could not claim a pool endpoint after {POOL_CLAIM_RETRIES} attempts")
+
+    def _resolve_endpoint(self, endpoint_id: Optional[str], display_name: str, use_pool: bool):
+        """The endpoint to deploy onto and where it came from: "existing", "pool" or "created"."""
+        if endpoint_id:
+            return aiplatform.Endpoint(endpoint_id, project=self.project_id, location=self.location), "existing"
+        if use_pool:
+            # The lock only saves claim conflicts between threads of this process
+            with self._pool_lock:
+                endpoint = self._claim_pool_endpoint(display_name)
+            if endpoint is not None:
+                self.endpoints_from_pool += 1
+                return endpoint, "pool"
+        return self._create_endpoint(display_name), "created"
+
+    def _upload_or_reuse_model(self, display_name: str, spec: Dict[str, Any], reuse: bool = True):
+        """Returns (model, reused); a model with the same serving spec hash is reused instead of uploaded."""
+        spec_hash = serving_spec_hash(spec)
+        if reuse:
+            name = self._models_by_spec.get(spec_hash)
+            if name is None:
+                models = aiplatform.Model.list(
+                    filter=f'labels.{SERVING_SPEC_LABEL}="{spec_hash}"',
+                    order_by="create_time desc",
+                    project=self.project_id,
+                    location=self.location,
+                )
+                name = models[0].resource_name if models else None
+            if name is not None:
+                self._models_by_spec[spec_hash] = name
+                self.models_reused += 1
+                return aiplatform.Model(model_name=name), True
+        model = aiplatform.Model.upload(display_name=display_name, labels={SERVING_SPEC_LABEL: spec_hash}, **spec)
+        self._models_by_spec[spec_hash] = model.resource_name
+        return model, False
+
+    def _deploy_waiter(self, endpoint: "aiplatform.Endpoint", previous_model_ids: List[str], undeploy_previous: bool) -> Callable[[], None]:
+        """Blocks until the deploy finishes, then optionally undeploys the models it replaced."""
+
+        def wait():
+            endpoint.wait()
+            if undeploy_previous:
+                for deployed_model_id in previous_model_ids:
+                    endpoint.undeploy(deployed_model_id=deployed_model_id)
+
+        return wait
+
+    def _deployed_model_ids(self, endpoint: "aiplatform.Endpoint", source: str) -> List[str]:
+        if source != "existing":
+            return []
+        return [deployed_model.id for deployed_model in endpoint.gca_resource.deployed_models]
+
+    def deploy_spec(
+        self,
+        machine_type: str,
+        accelerator_type: Optional[str] = None,
+        accelerator_count: Optional[int] = None,
+        service_account: Optional[str] = None,
+        min_replica_count: int = 1,
+        max_replica_count: Optional[int] = None,
+        target_accelerator_duty_cycle: Optional[int] = None,
+        target_cpu_utilization: Optional[int] = None,
+        target_request_count_per_minute: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """The ``Model.deploy`` arguments for a machine shape and autoscaling settings, plus warnings."""
+        scaling, warnings = autoscaling_spec(
+            min_replica_count,
+            max_replica_count,
+            target_accelerator_duty_cycle=target_accelerator_duty_cycle,
+            target_cpu_utilization=target_cpu_utilization,
+            target_request_count_per_minute=target_request_count_per_minute,
+            has_accelerator=bool(accelerator_type and accelerator_count),
+        )
+        spec = {"machine_type": machine_type, **scaling}
+        if accelerator_type and accelerator_count:
+            spec.update(accelerator_type=accelerator_type, accelerator_count=accelerator_count)
+        if service_account:
+            spec["service_account"] = service_account
+        return {"deploy": spec, "warnings": warnings}
+
+    def deploy_model(
+        self,
+        model_id: str,
+        machine_type: str = "n1-standard-2",
+        min_replica_count: int = 1,
+        max_replica_count: int = 1,
+        endpoint_id: Optional[str] = None,
+        traffic_percentage: int = 100,
+        undeploy_previous: bool = False,
+        use_endpoint_pool: bool = True,
+        target_accelerator_duty_cycle: Optional[int] = None,
+        target_cpu_utilization: Optional[int] = None,
+        target_request_count_per_minute: Optional[int] = None,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        """Deploys a model to a Vertex AI Endpoint.
+
+        With ``endpoint_id`` the model joins that endpoint and takes
+        ``traffic_percentage`` of its traffic; otherwise an idle pooled endpoint is
+        used when there is one. Replicas autoscale between the min and max counts to
+        hold the utilization targets. The deployment runs in the background; the
+        returned ``wait`` blocks until it finishes and raises if it failed. With
+        ``dry_run`` nothing is created and only the deploy spec is returned.
+        """
+        spec = self.deploy_spec(
+            machine_type,
+            min_replica_count=min_replica_count,
+            max_replica_count=max_replica_count,
+            target_accelerator_duty_cycle=target_accelerator_duty_cycle,
+            target_cpu_utilization=target_cpu_utilization,
+            target_request_count_per_minute=target_request_count_per_minute,
+        )
+        if dry_run:
+            return {"deploy_spec": spec["deploy"], "warnings": spec["warnings"]}
+        self._init_aiplatform()
+        endpoint, source = self._resolve_endpoint(endpoint_id, "llm-endpoint", use_endpoint_pool)
+        previous_model_ids = self._deployed_model_ids(endpoint, source)
+
         model = aiplatform.Model(model_name=model_id)
 
         deployed_model = model.deploy(
             endpoint=endpoint,
             deployed_model_display_name="deployed-llm",
-            traffic_percentage=100,
-            machine_type=machine_type,
-            min_replica_count=min_replica_count,
-            max_replica_count=max_replica_count,
-            sync=False
+            traffic_percentage=traffic_percentage if previous_model_ids else 100,
+            sync=False,
+            **spec["deploy"],
         )
 
-        return endpoint.name
+        return {
+            "deploy_spec": spec["deploy"],
+            "warnings": spec["warnings"],
+            "endpoint": endpoint,
+            "endpoint_source": source,
+            "previous_model_ids": previous_model_ids,
+            "wait": self._deploy_waiter(endpoint, previous_model_ids, undeploy_previous),
+        }
 
     def get_deployment_status(self, endpoint_id: str):
         """Gets the status of a model deployment."""
-        api_endpoint = f"{self.location}-aiplatform.googleapis.com"
-        client_options = {"api_endpoint": api_endpoint}
-        client = aiplatform.gapic.EndpointServiceClient(client_options=client_options)
-        
+        client = self._endpoint_client()
         endpoint_name = client.endpoint_path(
             project=self.project_id, location=self.location, endpoint=endpoint_id
         )
         
         response = client.get_endpoint(name=endpoint_name)
 
-        state = "UNKNOWN"
-        error_message = None
-        for deployed_model in response.deployed_models:
-            if deployed_model.display_name == "deployed-llm":
-                if deployed_model.private_endpoints:
-                    # For models using PrivateEndpoints
-                    state = "DEPLOYED" if deployed_model.private_endpoints.predict_http_uri else "UNKNOWN"
-                else:
-                    # For models using PublicEndpoints
-                    state = "DEPLOYED" if deployed_model.service_account else "UNKNOWN"
-                break
-
+        # A deployed model only shows up on the endpoint once its deploy
+        # operation has finished and it is serving traffic.
+        deployed_model_ids = [deployed_model.id for deployed_model in response.deployed_models]
         return {
             "endpoint_id": endpoint_id,
-            "state": state,
-            "error": error_message,
+            "state": "DEPLOYED" if deployed_model_ids else "NOT_DEPLOYED",
+            "error": None,
+            "deployed_model_ids": deployed_model_ids,
         }
 
-    def deploy_model_vllm(
+    def vllm_serving_spec(
         self,
-        model_name: str,
         model_id: str,
-        service_account: str,
-        machine_type: str = "g2-standard-8",
-        accelerator_type: str = "NVIDIA_L4",
         accelerator_count: int = 1,
         gpu_memory_utilization: float = 0.9,
         max_model_len: int = 4096,
@@ -79,19 +317,12 @@ class DeploymentService:
         enable_lora: bool = True,
         max_loras: int = 1,
         max_cpu_loras: int = 8,
-        use_dedicated_endpoint: bool = False,
         max_num_seqs: int = 256,
         model_type: str = None,
-    ) -> Tuple[aiplatform.Model, aiplatform.Endpoint]:
-        """Deploys trained models with vLLM into Vertex AI."""
-        endpoint = aiplatform.Endpoint.create(
-            display_name=f"{model_name}-endpoint",
-            project=self.project_id,
-            location=self.location,
-        )
-        # deploying vLLM model 
-        print("deploying vLLM model in project", self.project_id, "location", self.location)
-
+        swap_space: int = 16,
+        tensor_parallel_size: int = None,
+    ) -> Dict[str, Any]:
+        """The serving container arguments for ``Model.upload``; equal specs share one uploaded model."""
         vllm_args = [
             "python",
             "-m",
@@ -99,8 +330,8 @@ class DeploymentService:
             "--host=0.0.0.0",
             "--port=8080",
             f"--model={model_id}",
-            f"--tensor-parallel-size={accelerator_count}",
-            "--swap-space=16",
+            f"--tensor-parallel-size={tensor_parallel_size or accelerator_count}",
+            f"--swap-space={swap_space}",
             f"--gpu-memory-utilization={gpu_memory_utilization}",
             f"--max-model-len={max_model_len}",
             f"--dtype={dtype}",
@@ -117,7 +348,6 @@ class DeploymentService:
             vllm_args.append("--enforce-eager")
         
         if enable_lora:
-            print("enabling lora")
             vllm_args.append("--enable-lora")
         
         if model_type:
@@ -132,32 +362,126 @@ class DeploymentService:
             "DEPLOY_SOURCE": "notebook",
             "HF_TOKEN": hf_token
         }
-        print(env_vars)
-        model = aiplatform.Model.upload(
-            display_name=model_name,
-            serving_container_image_uri=self.VLLM_DOCKER_URI,
-            serving_container_args=vllm_args,
-            serving_container_ports=[8080],
-            serving_container_predict_route="/generate",
-            serving_container_health_route="/ping",
-            serving_container_environment_variables=env_vars,
-            serving_container_shared_memory_size_mb=(16 * 1024),
-            serving_container_deployment_timeout=7200,
+        logger.debug("vLLM serving environment", extra={"model_id": model_id, "env": redact(env_vars)})
+        return {
+            "serving_container_image_uri": self.VLLM_DOCKER_URI,
+            "serving_container_args": vllm_args,
+            "serving_container_ports": [8080],
+            "serving_container_predict_route": "/generate",
+            "serving_container_health_route": "/ping",
+            "serving_container_environment_variables": env_vars,
+            "serving_container_shared_memory_size_mb": 16 * 1024,
+            "serving_container_deployment_timeout": 7200,
+        }
+
+    def deploy_model_vllm(
+        self,
+        model_name: str,
+        model_id: str,
+        service_account: str,
+        machine_type: str = "g2-standard-8",
+        accelerator_type: str = "NVIDIA_L4",
+        accelerator_count: int = 1,
+        gpu_memory_utilization: float = 0.9,
+        max_model_len: int = 4096,
+        dtype: str = "auto",
+        enable_trust_remote_code: bool = False,
+        enforce_eager: bool = False,
+        enable_lora: bool = True,
+        max_loras: int = 1,
+        max_cpu_loras: int = 8,
+        use_dedicated_endpoint: bool = False,
+        max_num_seqs: int = 256,
+        model_type: str = None,
+        swap_space: int = 16,
+        tensor_parallel_size: int = None,
+        endpoint_id: Optional[str] = None,
+        traffic_percentage: int = 100,
+        undeploy_previous: bool = False,
+        reuse_model: bool = True,
+        use_endpoint_pool: bool = True,
+        min_replica_count: int = 1,
+        max_replica_count: Optional[int] = None,
+        target_accelerator_duty_cycle: Optional[int] = None,
+        target_cpu_utilization: Optional[int] = None,
+        target_request_count_per_minute: Optional[int] = None,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        """Deploys trained models with vLLM into Vertex AI.
+
+        An uploaded model with the same serving spec is reused, and the model goes
+        onto ``endpoint_id`` (taking ``traffic_percentage`` of its traffic), an idle
+        pooled endpoint, or a new one, in that order of preference. Replicas
+        autoscale between the min and max counts to hold the utilization targets.
+        With ``dry_run`` nothing is created; the upload and deploy specs are returned.
+        """
+        deploy_spec = self.deploy_spec(
+            machine_type,
+            accelerator_type=accelerator_type,
+            accelerator_count=accelerator_count,
+            service_account=service_account,
+            min_replica_count=min_replica_count,
+            max_replica_count=max_replica_count,
+            target_accelerator_duty_cycle=target_accelerator_duty_cycle,
+            target_cpu_utilization=target_cpu_utilization,
+            target_request_count_per_minute=target_request_count_per_minute,
         )
+        spec = self.vllm_serving_spec(
+            model_id,
+            accelerator_count=accelerator_count,
+            gpu_memory_utilization=gpu_memory_utilization,
+            max_model_len=max_model_len,
+            dtype=dtype,
+            enable_trust_remote_code=enable_trust_remote_code,
+            enforce_eager=enforce_eager,
+            enable_lora=enable_lora,
+            max_loras=max_loras,
+            max_cpu_loras=max_cpu_loras,
+            max_num_seqs=max_num_seqs,
+            model_type=model_type,
+            swap_space=swap_space,
+            tensor_parallel_size=tensor_parallel_size,
+        )
+        if dry_run:
+            return {
+                "model_upload": redact(spec),
+                "serving_spec_hash": serving_spec_hash(spec),
+                "deploy_spec": deploy_spec["deploy"],
+                "warnings": deploy_spec["warnings"],
+            }
 
-        print(
-            f"Deploying {model_name} on {machine_type} with {accelerator_count} {accelerator_type} GPU(s)."
+        self._init_aiplatform()
+        endpoint, source = self._resolve_endpoint(
+            endpoint_id, f"{model_name}-endpoint", use_endpoint_pool and not use_dedicated_endpoint
+        )
+        previous_model_ids = self._deployed_model_ids(endpoint, source)
+        model, model_reused = self._upload_or_reuse_model(model_name, spec, reuse=reuse_model)
+        logger.info(
+            "Deploying vLLM model",
+            extra={
+                "model_name": model_name,
+                "model_reused": model_reused,
+                "endpoint_id": endpoint.name,
+                "endpoint_source": source,
+                **deploy_spec["deploy"],
+            },
         )
 
         model.deploy(
             endpoint=endpoint,
-            machine_type=machine_type,
-            accelerator_type=accelerator_type,
-            accelerator_count=accelerator_count,
+            traffic_percentage=traffic_percentage if previous_model_ids else 100,
             deploy_request_timeout=1800,
-            service_account=service_account,
-            sync=False
+            sync=False,
+            **deploy_spec["deploy"],
         )
-        print("endpoint_name:", endpoint.name)
 
-        return model, endpoint
\ No newline at end of file
+        return {
+            "deploy_spec": deploy_spec["deploy"],
+            "warnings": deploy_spec["warnings"],
+            "model": model,
+            "model_reused": model_reused,
+            "endpoint": endpoint,
+            "endpoint_source": source,
+            "previous_model_ids": previous_model_ids,
+            "wait": self._deploy_waiter(endpoint, previous_model_ids, undeploy_previous),
+        }
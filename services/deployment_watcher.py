@@ -0,0 +1,207 @@
+from concurrent.futures import ThreadPoolExecutor
+from google.api_core.exceptions import NotFound
+from services.async_service import AsyncService
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# States after which a deployment is no longer polled
+TERMINAL_DEPLOYMENT_STATES = {"DEPLOYED", "FAILED"}
+# How long a finished deployment stays cached after reaching a terminal state
+TERMINAL_DEPLOYMENT_TTL = 3600.0
+# Threads blocked in Endpoint.wait at once; a deploy can take 30+ minutes, so these
+# stay off the shared service executor that every GCS and Vertex call runs on
+DEPLOY_WAIT_WORKERS = 64
+
+
+class DeploymentWatcher:
+    """Background poller that tracks endpoint deployments for all clients at once.
+
+    Each tracked endpoint is polled with adaptive backoff: the interval grows while
+    the state is unchanged and resets when it moves. The latest state is cached and
+    every transition is pushed to subscribers. An endpoint that no longer exists is
+    reported FAILED. Deployments in a terminal state are dropped ``terminal_ttl``
+    seconds after reaching it, so lookups fall back to a live status check.
+    """
+
+    def __init__(
+        self,
+        deployment_service: AsyncService,
+        min_interval: float = 5.0,
+        max_interval: float = 60.0,
+        backoff: float = 1.5,
+        terminal_ttl: float = TERMINAL_DEPLOYMENT_TTL,
+        wait_workers: int = DEPLOY_WAIT_WORKERS,
+    ):
+        self.deployment_service = deployment_service
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.terminal_ttl = terminal_ttl
+        self._deployments: Dict[str, dict] = {}
+        self._schedule: Dict[str, dict] = {}
+        # endpoint_id -> monotonic time it reached a terminal state
+        self._finished_at: Dict[str, float] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._previous_model_ids: Dict[str, Set[str]] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.wait_workers = wait_workers
+        self._wait_executor: Optional[ThreadPoolExecutor] = None
+        self.polls = 0
+        self.poll_errors = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._wait_executor is not None:
+            # Deploys carry on in Vertex AI; only the local waits are abandoned
+            self._wait_executor.shutdown(wait=False, cancel_futures=True)
+            self._wait_executor = None
+
+    def track(self, endpoint_id: str, wait: Callable[[], None] = None, previous_model_ids: List[str] = None):
+        """Starts watching an endpoint.
+
+        ``wait`` is the blocking ``Endpoint.wait`` of an in-progress deploy; if it
+        raises, the deployment is reported as FAILED with the error. For a redeploy
+        onto an endpoint that is already serving, ``previous_model_ids`` lists its
+        models; the endpoint is DEPLOYED again once a model not in that list serves.
+        """
+        if endpoint_id not in self._deployments or previous_model_ids is not None:
+            self._deployments[endpoint_id] = {
+                "endpoint_id": endpoint_id,
+                "state": "DEPLOYING",
+                "error": None,
+                "deployed_model_ids": [],
+                "started_at": time.time(),
+                "ready_at": None,
+                "time_to_ready_seconds": None,
+            }
+            self._previous_model_ids[endpoint_id] = set(previous_model_ids or [])
+            self._schedule[endpoint_id] = {"interval": self.min_interval, "next_poll": 0.0}
+            self._finished_at.pop(endpoint_id, None)
+            self._wake.set()
+        if wait is not None:
+            asyncio.create_task(self._wait_for_deploy(endpoint_id, wait))
+
+    def get(self, endpoint_id: str) -> Optional[dict]:
+        status = self._deployments.get(endpoint_id)
+        return dict(status) if status else None
+
+    def list(self) -> List[dict]:
+        return [dict(status) for status in self._deployments.values()]
+
+    async def subscribe(self, endpoint_id: str) -> AsyncIterator[dict]:
+        """Yields the current state and then every transition until a terminal state."""
+        self.track(endpoint_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(endpoint_id, []).append(queue)
+        try:
+            status = self.get(endpoint_id)
+            yield status
+            while status["state"] not in TERMINAL_DEPLOYMENT_STATES:
+                status = await queue.get()
+                yield status
+        finally:
+            self._subscribers[endpoint_id].remove(queue)
+
+    def _update(self, endpoint_id: str, state: str, error: str = None, deployed_model_ids: List[str] = None) -> bool:
+        status = self._deployments.get(endpoint_id)
+        # None once a finished deployment has been evicted
+        if status is None or status["state"] in TERMINAL_DEPLOYMENT_STATES or status["state"] == state:
+            return False
+        status["state"] = state
+        status["error"] = error
+        if deployed_model_ids is not None:
+            status["deployed_model_ids"] = deployed_model_ids
+        if state == "DEPLOYED":
+            status["ready_at"] = time.time()
+            status["time_to_ready_seconds"] = round(status["ready_at"] - status["started_at"], 1)
+        if state in TERMINAL_DEPLOYMENT_STATES:
+            self._finished_at[endpoint_id] = time.monotonic()
+            self._wake.set()
+        for queue in self._subscribers.get(endpoint_id, []):
+            queue.put_nowait(dict(status))
+        return True
+
+    async def _wait_for_deploy(self, endpoint_id: str, wait: Callable[[], None]):
+        if self._wait_executor is None:
+            self._wait_executor = ThreadPoolExecutor(max_workers=self.wait_workers, thread_name_prefix="deploy-wait")
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._wait_executor, wait)
+        except Exception as e:
+            self._update(endpoint_id, "FAILED", error=str(e))
+            return
+        # The deploy finished; poll right away instead of waiting for the backoff
+        if endpoint_id in self._schedule:
+            self._schedule[endpoint_id]["next_poll"] = 0.0
+            self._wake.set()
+
+    async def _poll(self, endpoint_id: str):
+        schedule = self._schedule[endpoint_id]
+        self.polls += 1
+        try:
+            status = await self.deployment_service.get_deployment_status(endpoint_id)
+            new_model_ids = set(status["deployed_model_ids"]) - self._previous_model_ids.get(endpoint_id, set())
+            state = "DEPLOYED" if status["state"] == "DEPLOYED" and new_model_ids else "DEPLOYING"
+            changed = self._update(endpoint_id, state, deployed_model_ids=status["deployed_model_ids"])
+        except NotFound:
+            # The endpoint was deleted; polling it again would never succeed
+            self._update(endpoint_id, "FAILED", error=f"Endpoint {endpoint_id} not found")
+            return
+        except Exception:
+            self.poll_errors += 1
+            logger.exception("Polling deployment status failed", extra={"endpoint_id": endpoint_id})
+            changed = False
+        schedule["interval"] = (
+            self.min_interval if changed else min(schedule["interval"] * self.backoff, self.max_interval)
+        )
+        schedule["next_poll"] = time.monotonic() + schedule["interval"]
+
+    def _evict_finished(self, now: float) -> Optional[float]:
+        """Drops deployments whose terminal state outlived the TTL; returns the next expiry."""
+        for endpoint_id, finished_at in list(self._finished_at.items()):
+            if now - finished_at >= self.terminal_ttl and not self._subscribers.get(endpoint_id):
+                del self._finished_at[endpoint_id]
+                self._deployments.pop(endpoint_id, None)
+                self._schedule.pop(endpoint_id, None)
+                self._previous_model_ids.pop(endpoint_id, None)
+                self._subscribers.pop(endpoint_id, None)
+        return min(self._finished_at.values()) + self.terminal_ttl if self._finished_at else None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            next_expiry = self._evict_finished(now)
+            due = [
+                endpoint_id
+                for endpoint_id, schedule in self._schedule.items()
+                if schedule["next_poll"] <= now
+                and self._deployments[endpoint_id]["state"] not in TERMINAL_DEPLOYMENT_STATES
+            ]
+            await asyncio.gather(*(self._poll(endpoint_id) for endpoint_id in due))
+            pending = [
+                schedule["next_poll"]
+                for endpoint_id, schedule in self._schedule.items()
+                if self._deployments[endpoint_id]["state"] not in TERMINAL_DEPLOYMENT_STATES
+            ]
+            if next_expiry is not None:
+                pending.append(next_expiry)
+            timeout = max(min(pending) - time.monotonic(), 0.1) if pending else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
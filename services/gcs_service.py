@@ -1,29 +1,113 @@
-from google.cloud import storage
-from typing import List, Optional, BinaryIO, Dict
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from typing import Any, List, Optional, BinaryIO, Dict, Tuple, Iterator
+import json
 import os
 from utils.validators import validate_gcs_url
+from services.client_registry import ClientRegistry, authorized_session
+from utils.cache import TTLCache
+from utils.content_hash import ContentHasher
+from utils.lazy_import import lazy_import
+from utils.metrics import DownloadCounter, instrument_service, record_download, record_upload
+from utils.streams import TeeReader
 
+storage = lazy_import("google.cloud.storage")
+
+# Resumable upload chunks other than the last must be a multiple of 256 KiB
+RESUMABLE_CHUNK_ALIGNMENT = 256 * 1024
+# Maximum number of source objects in a single compose request
+MAX_COMPOSE_SOURCES = 32
+# Bytes fetched per request when streaming an object out
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+# Content-addressed datasets live at CAS_PREFIX/{sha256}{ext}; uploads land in CAS_INCOMING_PREFIX first
+CAS_PREFIX = "datasets/cas/"
+CAS_INCOMING_PREFIX = "datasets/cas/.incoming/"
+# Seconds a listing page is served from memory before GCS is asked again
+LISTING_CACHE_TTL = float(os.environ.get("LISTING_CACHE_TTL", "30"))
+# Calls that move whole objects; they run on their own executor so a burst of large
+# uploads cannot hold every service thread
+TRANSFER_METHODS = (
+    "upload_file", "upload_chunk", "upload_bytes", "download_file", "feed_blob", "hash_blob", "promote_to_cas",
+)
+
+@instrument_service("gcs", exclude=("invalidate_listing",))
 class GcsService:
-    def __init__(self, bucket_name: str = None):
-        self.client = storage.Client()
+    def __init__(self, bucket_name: str = None, client_registry: ClientRegistry = None):
+        self.client_registry = client_registry
+        self.listing_cache = TTLCache(ttl=LISTING_CACHE_TTL)
+        self._client = None if client_registry else storage.Client()
+        self._upload_session = None
         self.bucket_name = bucket_name or os.environ.get("GCS_BUCKET_NAME")
-        if self.bucket_name:
-            self.bucket = self.client.bucket(self.bucket_name)
-        else:
+        if not self.bucket_name:
             raise ValueError("GCS_BUCKET_NAME environment variable not set.")
 
+    @property
+    def client(self) -> "storage.Client":
+        if self.client_registry:
+            return self.client_registry.get("storage")
+        return self._client
+
+    @property
+    def bucket(self) -> "storage.Bucket":
+        return self.client.bucket(self.bucket_name)
+
+    @property
+    def upload_session(self):
+        """Authorized HTTP session for the resumable upload requests sent directly."""
+        if self.client_registry:
+            return self.client_registry.get("upload_session")
+        if self._upload_session is None:
+            self._upload_session = authorized_session()
+        return self._upload_session
+
     def upload_file(self, file: BinaryIO, destination_blob_name: str) -> str:
         """Uploads a file to the bucket."""
         blob = self.bucket.blob(destination_blob_name)
+        start = file.tell()
         blob.upload_from_file(file)
+        record_upload(file.tell() - start)
+        self.invalidate_listing(destination_blob_name)
         return f"gs://{self.bucket_name}/{destination_blob_name}"
     
     def upload_string_as_file(self, content: str, destination_blob_name: str) -> str:
         """Uploads a string as a file to the bucket."""
         blob = self.bucket.blob(destination_blob_name)
         blob.upload_from_string(content)
+        record_upload(len(content.encode() if isinstance(content, str) else content))
+        self.invalidate_listing(destination_blob_name)
         return f"gs://{self.bucket_name}/{destination_blob_name}"
 
+    def read_json(self, blob_name: str) -> Tuple[Any, int]:
+        """Reads a JSON object and returns it with its generation (0 if it does not exist)."""
+        blob = self.bucket.get_blob(blob_name)
+        if blob is None:
+            return {}, 0
+        # Pin the read to the generation we report so a concurrent overwrite fails loudly
+        content = blob.download_as_bytes(if_generation_match=blob.generation)
+        record_download(len(content))
+        return json.loads(content), blob.generation
+
+    def get_generation(self, blob_name: str) -> int:
+        """Current generation of an object (0 if it does not exist), from its metadata alone."""
+        blob = self.bucket.get_blob(blob_name)
+        return blob.generation if blob is not None else 0
+
+    def write_json(self, blob_name: str, data: Any, if_generation_match: int) -> int:
+        """Writes a JSON object only if the stored generation still matches.
+
+        Raises google.api_core.exceptions.PreconditionFailed when another writer got
+        there first. Returns the new generation.
+        """
+        blob = self.bucket.blob(blob_name)
+        content = json.dumps(data, indent=2)
+        blob.upload_from_string(
+            content,
+            content_type="application/json",
+            if_generation_match=if_generation_match,
+        )
+        record_upload(len(content.encode()))
+        self.invalidate_listing(blob_name)
+        return blob.generation
+
     def list_files(self, prefix: Optional[str] = None) -> List[Dict[str, str]]:
         """Lists all the files in the bucket."""
         blobs = self.bucket.list_blobs(prefix=prefix)
@@ -35,17 +119,216 @@ class GcsService:
             })
         return files
 
+    def list_files_page(
+        self,
+        prefix: str,
+        page_size: int = 100,
+        page_token: Optional[str] = None,
+        match_glob: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Lists one page of objects under a prefix, served from the listing cache when fresh."""
+        key = (prefix, page_size, page_token, match_glob)
+        found, page = self.listing_cache.get(key)
+        if found:
+            return page
+        iterator = self.client.list_blobs(
+            self.bucket_name,
+            prefix=prefix,
+            page_size=page_size,
+            page_token=page_token,
+            match_glob=match_glob,
+        )
+        blobs = next(iterator.pages, [])
+        page = {
+            "items": [
+                {"filepath": blob.name, "gcs_url": f"gs://{self.bucket_name}/{blob.name}"}
+                for blob in blobs
+            ],
+            "next_page_token": iterator.next_page_token,
+        }
+        self.listing_cache.set(key, page)
+        return page
+
     def download_file(self, gcs_url: str) -> BinaryIO:
         """Downloads a file from the bucket."""
         validate_gcs_url(gcs_url, self.bucket_name)
         blob = self.bucket.blob(gcs_url.replace(f"gs://{self.bucket_name}/", ""))
-        
-        if not blob.exists():
+        try:
+            content = blob.download_as_bytes()
+        except NotFound:
+            raise FileNotFoundError(f"File not found: {gcs_url}")
+        record_download(len(content))
+        return content
+
+    def get_blob_metadata(self, gcs_url: str) -> "storage.Blob":
+        """Fetches an object's metadata (size, generation, crc32c) in one round trip."""
+        validate_gcs_url(gcs_url, self.bucket_name)
+        blob = self.bucket.get_blob(gcs_url.replace(f"gs://{self.bucket_name}/", ""))
+        if blob is None:
             raise FileNotFoundError(f"File not found: {gcs_url}")
-        return blob.download_as_bytes()
+        return blob
+
+    def iter_blob_range(self, blob: "storage.Blob", start: int, end: int, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        """Yields bytes ``start..end`` (inclusive) of a blob in bounded chunks.
+
+        The blob must come from ``get_blob_metadata`` so every chunk is read from the
+        same generation, even if the object is overwritten mid-download.
+        """
+        position = start
+        while position <= end:
+            chunk_end = min(position + chunk_size - 1, end)
+            chunk = blob.download_as_bytes(start=position, end=chunk_end)
+            record_download(len(chunk))
+            yield chunk
+            position = chunk_end + 1
     
+    def open_blob(self, blob_name: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> BinaryIO:
+        """Opens an object for sequential reading without downloading it whole."""
+        blob = self.bucket.blob(blob_name)
+        try:
+            blob.reload()
+        except NotFound:
+            raise FileNotFoundError(f"File not found: gs://{self.bucket_name}/{blob_name}")
+        return TeeReader(blob.open("rb", chunk_size=chunk_size), [DownloadCounter()])
+
+    def find_cas_object(self, sha256: str, extension: str, size: Optional[int] = None) -> Optional[str]:
+        """Returns the blob name holding this content, or None if it was never stored."""
+        blob = self.bucket.get_blob(f"{CAS_PREFIX}{sha256}{extension}")
+        if blob is None or (size is not None and blob.size != size):
+            return None
+        return blob.name
+
+    def feed_blob(self, blob_name: str, sinks: List[Any]):
+        """Reads an object back and feeds every chunk to each sink (profilers, hashers)."""
+        with self.open_blob(blob_name) as reader:
+            while True:
+                chunk = reader.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                for sink in sinks:
+                    sink.feed(chunk)
+
+    def hash_blob(self, blob_name: str) -> ContentHasher:
+        """Reads an object back to compute its content hash, e.g. after a resumed upload."""
+        hasher = ContentHasher()
+        self.feed_blob(blob_name, [hasher])
+        return hasher
+
+    def promote_to_cas(self, incoming_blob_name: str, hasher: ContentHasher, extension: str) -> Tuple[str, bool]:
+        """Moves a finished upload to its content address.
+
+        Verifies the stored crc32c against the bytes we hashed, then either copies the
+        object to ``cas/{sha256}{ext}`` or, if that content already exists, just drops
+        the upload. Returns the CAS blob name and whether it was a duplicate.
+        """
+        blob = self.bucket.get_blob(incoming_blob_name)
+        if blob is None:
+            raise FileNotFoundError(f"File not found: gs://{self.bucket_name}/{incoming_blob_name}")
+        if blob.crc32c != hasher.crc32c or (blob.md5_hash and blob.md5_hash != hasher.md5):
+            blob.delete()
+            raise ValueError("Uploaded object does not match the streamed bytes (checksum mismatch)")
+        cas_blob_name = f"{CAS_PREFIX}{hasher.sha256}{extension}"
+        duplicate = self.bucket.get_blob(cas_blob_name) is not None
+        if not duplicate:
+            try:
+                # Server-side copy; generation 0 means "only if nobody stored it meanwhile"
+                self.bucket.copy_blob(blob, self.bucket, cas_blob_name, if_generation_match=0)
+            except PreconditionFailed:
+                duplicate = True
+        blob.delete()
+        self.invalidate_listing(cas_blob_name)
+        return cas_blob_name, duplicate
+
     def file_exists(self, gcs_url: str) -> bool:
         """Checks if a file exists in the bucket."""
         validate_gcs_url(gcs_url, self.bucket_name)
         blob = self.bucket.blob(gcs_url.replace(f"gs://{self.bucket_name}/", ""))
-        return blob.exists()
\ No newline at end of file
+        return blob.exists()
+
+    def start_resumable_upload(self, destination_blob_name: str, content_type: str = "application/octet-stream") -> str:
+        """Opens a resumable upload session and returns its session URL."""
+        blob = self.bucket.blob(destination_blob_name)
+        return blob.create_resumable_upload_session(content_type=content_type)
+
+    def upload_chunk(self, session_url: str, data: bytes, offset: int, total_size: Optional[int] = None) -> Tuple[int, bool]:
+        """Sends one chunk of a resumable upload.
+
+        Pass ``total_size`` with the last chunk to finalize the object. Returns the
+        number of bytes GCS has committed and whether the upload is complete.
+        """
+        total = "*" if total_size is None else str(total_size)
+        if data:
+            content_range = f"bytes {offset}-{offset + len(data) - 1}/{total}"
+        else:
+            content_range = f"bytes */{total}"
+        response = self.upload_session.put(
+            session_url, data=data, headers={"Content-Range": content_range}
+        )
+        committed, complete = self._parse_resumable_response(response)
+        # Count what GCS confirmed, which can be less than what was sent
+        record_upload(max(committed - offset, 0))
+        return committed, complete
+
+    def query_upload_offset(self, session_url: str) -> Tuple[int, bool]:
+        """Asks GCS how many bytes of a resumable upload session are committed."""
+        response = self.upload_session.put(
+            session_url, data=b"", headers={"Content-Range": "bytes */*"}
+        )
+        return self._parse_resumable_response(response)
+
+    def _parse_resumable_response(self, response) -> Tuple[int, bool]:
+        if response.status_code in (200, 201):
+            return int(response.json().get("size", 0)), True
+        if response.status_code == 308:
+            committed = response.headers.get("Range")
+            # Range is "bytes=0-N" once at least one byte has been persisted
+            return (int(committed.split("-")[-1]) + 1 if committed else 0), False
+        if response.status_code == 404:
+            raise FileNotFoundError("Upload session not found or expired")
+        raise RuntimeError(f"Resumable upload failed ({response.status_code}): {response.text}")
+
+    def upload_bytes(self, data: bytes, destination_blob_name: str, content_type: str = "application/octet-stream") -> str:
+        """Uploads an in-memory buffer, e.g. one part of a parallel composite upload."""
+        blob = self.bucket.blob(destination_blob_name)
+        blob.upload_from_string(data, content_type=content_type)
+        record_upload(len(data))
+        self.invalidate_listing(destination_blob_name)
+        return destination_blob_name
+
+    def compose(self, source_blob_names: List[str], destination_blob_name: str) -> str:
+        """Concatenates parts into one object, composing in rounds of 32 sources.
+
+        The parts and intermediate objects are deleted whether or not the compose
+        succeeds, so a failed upload leaves nothing behind.
+        """
+        sources = list(source_blob_names)
+        intermediates = []
+        round_index = 0
+        try:
+            while len(sources) > MAX_COMPOSE_SOURCES:
+                next_round = []
+                for i in range(0, len(sources), MAX_COMPOSE_SOURCES):
+                    name = f"{destination_blob_name}.compose-{round_index}-{i // MAX_COMPOSE_SOURCES}"
+                    # Recorded before the call: a compose that fails after writing still leaves it
+                    intermediates.append(name)
+                    self.bucket.blob(name).compose([self.bucket.blob(s) for s in sources[i:i + MAX_COMPOSE_SOURCES]])
+                    next_round.append(name)
+                sources = next_round
+                round_index += 1
+            self.bucket.blob(destination_blob_name).compose([self.bucket.blob(s) for s in sources])
+        finally:
+            self.delete_blobs(list(source_blob_names) + intermediates)
+        self.invalidate_listing(destination_blob_name)
+        return f"gs://{self.bucket_name}/{destination_blob_name}"
+
+    def delete_blobs(self, blob_names: List[str]):
+        """Deletes objects, ignoring ones that are already gone."""
+        with self.client.batch(raise_exception=False):
+            for name in blob_names:
+                self.bucket.blob(name).delete()
+        for name in blob_names:
+            self.invalidate_listing(name)
+
+    def invalidate_listing(self, blob_name: str):
+        """Drops cached listing pages whose prefix covers a blob we just changed."""
+        self.listing_cache.invalidate(lambda key: blob_name.startswith(key[0]))
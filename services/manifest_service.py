@@ -0,0 +1,134 @@
+from google.api_core.exceptions import PreconditionFailed
+from services.async_service import AsyncService
+from utils.metrics import record_retry
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import copy
+import os
+import random
+import time
+
+DATASET_INFO_BLOB = "datasets/dataset_info.json"
+# Seconds the in-memory manifest is served before its generation is checked against GCS,
+# so changes made by other API processes show up
+MANIFEST_REFRESH_INTERVAL = float(os.environ.get("MANIFEST_REFRESH_INTERVAL", "30"))
+
+
+class DatasetManifest:
+    """In-memory view of dataset_info.json with batched compare-and-swap writes.
+
+    Registrations arriving within ``batch_window`` seconds are merged into a single
+    write guarded by a generation-match precondition. On conflict the manifest is
+    re-read from GCS, the batch re-applied, and the write retried. Reads are served
+    from memory, and re-read once ``refresh_interval`` has passed and the object's
+    generation has changed.
+    """
+
+    def __init__(
+        self,
+        gcs_service: AsyncService,
+        blob_name: str = DATASET_INFO_BLOB,
+        batch_window: float = 0.05,
+        max_retries: int = 10,
+        refresh_interval: float = MANIFEST_REFRESH_INTERVAL,
+    ):
+        self.gcs_service = gcs_service
+        self.blob_name = blob_name
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.refresh_interval = refresh_interval
+        self._entries: Dict[str, Any] = {}
+        self._generation: Optional[int] = None
+        # Monotonic time the in-memory copy was last known to match GCS
+        self._checked_at = 0.0
+        self._pending: List[Tuple[str, Dict[str, Any], bool]] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._commit_lock = asyncio.Lock()
+        self.registrations = 0
+        self.writes = 0
+        self.conflicts = 0
+        self.reloads = 0
+
+    async def register(self, name: str, entry: Dict[str, Any], merge: bool = False):
+        """Adds or replaces a dataset entry; returns once the change is durable in GCS.
+
+        With ``merge`` the fields are merged into the existing entry instead.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self._pending.append((name, entry, merge))
+        self._waiters.append(waiter)
+        self.registrations += 1
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        await waiter
+
+    async def get_entries(self) -> Dict[str, Any]:
+        """Returns the current manifest, loading it from GCS when missing or changed."""
+        if self._is_stale():
+            async with self._commit_lock:
+                if self._is_stale():
+                    await self._refresh()
+        return copy.deepcopy(self._entries)
+
+    def _is_stale(self) -> bool:
+        return self._generation is None or time.monotonic() - self._checked_at >= self.refresh_interval
+
+    async def _refresh(self):
+        # A metadata lookup is enough to tell whether another process wrote the manifest
+        if self._generation is None or await self.gcs_service.get_generation(self.blob_name) != self._generation:
+            self._entries, self._generation = await self.gcs_service.read_json(self.blob_name)
+            self.reloads += 1
+        self._checked_at = time.monotonic()
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        async with self._commit_lock:
+            ops, waiters = self._pending, self._waiters
+            self._pending, self._waiters = [], []
+            # Registrations from here on start the next batch
+            self._flush_task = None
+            try:
+                await self.gcs_service.run(self._commit, ops)
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                return
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def _commit(self, ops: List[Tuple[str, Dict[str, Any], bool]]):
+        gcs = self.gcs_service.service
+        for attempt in range(self.max_retries):
+            try:
+                if self._generation is None:
+                    self._entries, self._generation = gcs.read_json(self.blob_name)
+                entries = copy.deepcopy(self._entries)
+                for name, entry, merge in ops:
+                    if merge and name in entries:
+                        entries[name].update(entry)
+                    else:
+                        entries[name] = dict(entry)
+                generation = gcs.write_json(self.blob_name, entries, if_generation_match=self._generation)
+            except PreconditionFailed:
+                # Someone else wrote the manifest; reload and re-apply this batch
+                self.conflicts += 1
+                record_retry("gcs", "write_json")
+                self._generation = None
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+                continue
+            self._entries, self._generation = entries, generation
+            self._checked_at = time.monotonic()
+            self.writes += 1
+            return
+        raise RuntimeError(f"Could not update {self.blob_name} after {self.max_retries} attempts")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "registrations": self.registrations,
+            "writes": self.writes,
+            "conflicts": self.conflicts,
+            "reloads": self.reloads,
+        }
@@ -0,0 +1,157 @@
+from utils.cache import TTLCache
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Instance field that selects a LoRA adapter on the vLLM container
+LORA_FIELD = "dynamic-lora"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prediction_cache (
+    key TEXT PRIMARY KEY,
+    prediction TEXT NOT NULL,
+    latency REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prediction_cache_accessed ON prediction_cache (accessed_at);
+"""
+
+
+def is_deterministic(instance: Dict[str, Any]) -> bool:
+    """Greedy decoding: temperature 0, or top_k 1. vLLM's default temperature is 1."""
+    return float(instance.get("temperature", 1.0)) == 0 or int(instance.get("top_k", -1)) == 1
+
+
+def cache_key(endpoint: str, instance: Dict[str, Any]) -> str:
+    """Hash of the endpoint and every instance field.
+
+    That covers the prompt, sampling parameters and the ``dynamic-lora`` path, plus
+    any other field that changes the output, such as ``raw_response``.
+    """
+    payload = json.dumps([endpoint, instance], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PredictionCache:
+    """Exact-match cache for deterministic vLLM predictions.
+
+    The memory tier is an LRU bounded by ``max_entries``. With ``disk_path``, entries
+    are also written to SQLite, up to ``max_disk_entries``, so they survive restarts and
+    can be shared by processes on one host. Entries expire after ``ttl`` seconds in
+    both tiers. Each entry keeps the latency of the request that produced it, which is
+    what ``stats()`` reports as endpoint time saved.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl: float = 3600.0,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 1000000,
+    ):
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.memory = TTLCache(ttl=ttl, max_entries=max_entries)
+        self._db = None
+        self._lock = threading.Lock()
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.saved_seconds = 0.0
+
+    def get(self, endpoint: str, instance: Dict[str, Any]) -> Tuple[Optional[str], bool, Any]:
+        """Returns (key, found, prediction); the key is None when the instance must not be cached."""
+        if not is_deterministic(instance):
+            self.uncacheable += 1
+            return None, False, None
+        key = cache_key(endpoint, instance)
+        found, item = self.memory.get(key)
+        if found:
+            self.memory_hits += 1
+        else:
+            item = self._disk_get(key)
+            if item is None:
+                self.misses += 1
+                return key, False, None
+            self.disk_hits += 1
+            self.memory.set(key, item)
+        prediction, latency = item
+        self.saved_seconds += latency
+        return key, True, prediction
+
+    def set(self, key: str, prediction: Any, latency: float):
+        self.memory.set(key, (prediction, latency))
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(prediction), latency, now + self.ttl, now),
+            )
+            self._disk_writes += 1
+            # Trimming is amortised over writes; the table may briefly exceed its bound
+            if self._disk_writes % 1000 == 0:
+                self._trim(now)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        if self._db is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT prediction, latency, expires_at FROM prediction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] < now:
+                self._db.execute("DELETE FROM prediction_cache WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE prediction_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def _trim(self, now: float):
+        self._db.execute("DELETE FROM prediction_cache WHERE expires_at < ?", (now,))
+        self._db.execute(
+            "DELETE FROM prediction_cache WHERE key IN ("
+            "SELECT key FROM prediction_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+
+    def clear(self):
+        self.memory.invalidate()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM prediction_cache")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        stats = {
+            "memory_entries": self.memory.stats()["entries"],
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+        if self._db is not None:
+            with self._lock:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM prediction_cache").fetchone()[0]
+        return stats
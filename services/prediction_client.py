@@ -0,0 +1,278 @@
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+from services.prediction_cache import PredictionCache
+from utils.lazy_import import lazy_import
+from utils.metrics import CLOUD_CALL_DURATION, CLOUD_CALL_ERRORS, record_retry
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+import asyncio
+import random
+import time
+
+aiplatform = lazy_import("google.cloud.aiplatform")
+grpc = lazy_import("grpc")
+transports = lazy_import("google.cloud.aiplatform_v1.services.prediction_service.transports")
+
+# Errors that mean "try again later": overloaded replicas (503) and throttling (429)
+RETRYABLE_ERRORS = (ServiceUnavailable, ResourceExhausted)
+_PREDICT_DURATION = CLOUD_CALL_DURATION.labels("vertex_prediction", "predict")
+
+
+def _to_python(value: Any) -> Any:
+    """Converts proto-plus map and list wrappers in a prediction into plain dicts and lists."""
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, Mapping):
+        return {key: _to_python(item) for key, item in value.items()}
+    return [_to_python(item) for item in value]
+
+
+class PredictionClient:
+    """Async, batching client for a vLLM endpoint on Vertex AI.
+
+    Prompts submitted concurrently are grouped into multi-instance ``predict``
+    requests (up to ``max_batch_size`` instances, waiting at most ``max_batch_delay``
+    seconds to fill a batch). At most ``max_in_flight`` requests are outstanding,
+    and 503/429 responses are retried with full-jitter exponential backoff. One gRPC
+    channel is kept open for the life of the client.
+
+    With a ``cache``, deterministic instances are answered from it when possible, and
+    identical instances already in flight share one request.
+
+    Use it as an async context manager, or call ``close()`` when done.
+    """
+
+    def __init__(
+        self,
+        endpoint_id: str,
+        project_id: str,
+        location: str = "us-central1",
+        max_batch_size: int = 16,
+        max_batch_delay: float = 0.005,
+        max_in_flight: int = 32,
+        max_retries: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 20.0,
+        timeout: float = 300.0,
+        api_endpoint: Optional[str] = None,
+        insecure: bool = False,
+        cache: Optional[PredictionCache] = None,
+    ):
+        self.endpoint_id = endpoint_id
+        self.project_id = project_id
+        self.location = location
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        # ``insecure`` with a host:port api_endpoint talks to a local stub server
+        self.api_endpoint = api_endpoint or f"{location}-aiplatform.googleapis.com"
+        self.insecure = insecure
+        self.cache = cache
+        self._client: Optional["aiplatform.gapic.PredictionServiceAsyncClient"] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._requests: set = set()
+        # cache key -> future of the request computing it
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+        self.instances = 0
+        self.retries = 0
+        self.failures = 0
+        self.coalesced = 0
+
+    @property
+    def endpoint(self) -> str:
+        return f"projects/{self.project_id}/locations/{self.location}/endpoints/{self.endpoint_id}"
+
+    def _start(self):
+        """Opens the channel and batcher lazily, inside the running event loop."""
+        if self._client is not None:
+            return
+        if self.insecure:
+            transport = transports.PredictionServiceGrpcAsyncIOTransport(
+                host=self.api_endpoint, channel=grpc.aio.insecure_channel(self.api_endpoint)
+            )
+            self._client = aiplatform.gapic.PredictionServiceAsyncClient(transport=transport)
+        else:
+            self._client = aiplatform.gapic.PredictionServiceAsyncClient(
+                client_options={"api_endpoint": self.api_endpoint}
+            )
+        self._queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._batcher = asyncio.create_task(self._run_batcher())
+
+    async def __aenter__(self) -> "PredictionClient":
+        self._start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Waits for outstanding requests, then closes the channel."""
+        if self._client is None:
+            return
+        if self._requests:
+            await asyncio.gather(*self._requests, return_exceptions=True)
+        while not self._batcher.done():
+            # Before Python 3.12 wait_for can swallow a cancel that races with a queued item
+            self._batcher.cancel()
+            await asyncio.wait({self._batcher}, timeout=0.1)
+        # Instances queued by abandoned callers will never be sent
+        while not self._queue.empty():
+            _, future, key = self._queue.get_nowait()
+            self._pending.pop(key, None)
+            future.cancel()
+        await self._client.transport.close()
+        self._client = None
+
+    async def predict(self, instance: Union[str, Dict[str, Any]], **parameters) -> Any:
+        """Predicts one instance; concurrent calls share batched requests.
+
+        ``instance`` is a vLLM instance dict, or a prompt string combined with
+        ``parameters`` such as ``max_tokens`` and ``temperature``.
+        """
+        self._start()
+        if isinstance(instance, str):
+            instance = {"prompt": instance, **parameters}
+        key = None
+        if self.cache is not None:
+            key, found, prediction = self.cache.get(self.endpoint, instance)
+            if found:
+                return prediction
+            if key in self._pending:
+                self.coalesced += 1
+                return await asyncio.shield(self._pending[key])
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._pending[key] = future
+        self._queue.put_nowait((instance, future, key))
+        return await future
+
+    async def predict_many(self, instances: Iterable[Union[str, Dict[str, Any]]], **parameters) -> List[Any]:
+        """Predicts every instance and returns the results in input order."""
+        return await asyncio.gather(*(self.predict(instance, **parameters) for instance in instances))
+
+    async def stream(
+        self,
+        instances: Union[Iterable[Union[str, Dict[str, Any]]], AsyncIterable[Union[str, Dict[str, Any]]]],
+        window: Optional[int] = None,
+        **parameters,
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """Yields ``(index, prediction)`` pairs as they complete, in completion order.
+
+        At most ``window`` instances (by default enough to keep every in-flight
+        request full) are pending at once, so arbitrarily long inputs stream with
+        bounded memory. A failed instance yields its exception as the prediction.
+        """
+        self._start()
+        window = window or self.max_batch_size * self.max_in_flight * 2
+        pending: set = set()
+
+        async def indexed(index: int, instance):
+            try:
+                return index, await self.predict(instance, **parameters)
+            except Exception as e:
+                return index, e
+
+        async def items():
+            if hasattr(instances, "__aiter__"):
+                async for instance in instances:
+                    yield instance
+            else:
+                for instance in instances:
+                    yield instance
+
+        index = 0
+        async for instance in items():
+            pending.add(asyncio.ensure_future(indexed(index, instance)))
+            index += 1
+            if len(pending) >= window:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+
+    async def _run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_batch_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Drain anything queued while we waited, without waiting further
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._in_flight.acquire()
+            task = asyncio.create_task(self._send(batch))
+            self._requests.add(task)
+            task.add_done_callback(self._requests.discard)
+
+    async def _send(self, batch: List[Tuple[Dict[str, Any], asyncio.Future, Optional[str]]]):
+        try:
+            started = time.monotonic()
+            predictions = await self._predict_with_retry([instance for instance, _, _ in batch])
+            latency = time.monotonic() - started
+            if len(predictions) != len(batch):
+                raise RuntimeError(f"Endpoint returned {len(predictions)} predictions for {len(batch)} instances")
+            for (_, future, key), prediction in zip(batch, predictions):
+                prediction = _to_python(prediction)
+                if key is not None:
+                    self.cache.set(key, prediction, latency)
+                if not future.done():
+                    future.set_result(prediction)
+        except Exception as e:
+            self.failures += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _, _, key in batch:
+                self._pending.pop(key, None)
+            self._in_flight.release()
+
+    async def _predict_with_retry(self, instances: List[Dict[str, Any]]) -> List[Any]:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await self._client.predict(
+                    endpoint=self.endpoint, instances=instances, timeout=self.timeout
+                )
+                _PREDICT_DURATION.observe(time.perf_counter() - started)
+                self.requests += 1
+                self.instances += len(instances)
+                return list(response.predictions)
+            except Exception as e:
+                CLOUD_CALL_ERRORS.labels("vertex_prediction", "predict", type(e).__name__).inc()
+                if not isinstance(e, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                record_retry("vertex_prediction", "predict")
+                # Full jitter keeps many clients from retrying in lockstep
+                await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt)))
+                attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "instances": self.instances,
+            "avg_batch_size": round(self.instances / self.requests, 2) if self.requests else 0.0,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": len(self._requests),
+            "coalesced": self.coalesced,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
@@ -0,0 +1,72 @@
+from services.async_service import AsyncService
+from services.training_service import TERMINAL_JOB_STATES, not_found_status
+from utils.cache import TTLCache
+from typing import Dict, List
+import asyncio
+
+# Finished jobs never change, so their status can be kept much longer
+TERMINAL_STATUS_TTL = 3600.0
+
+
+class TrainingStatusCache:
+    """Short-TTL cache of training job states shared by every request.
+
+    Concurrent lookups of the same job share one in-flight Vertex call
+    (single-flight), so N pollers cost one RPC per TTL window.
+    """
+
+    def __init__(self, training_service: AsyncService, ttl: float = 5.0):
+        self.training_service = training_service
+        self.cache = TTLCache(ttl=ttl, max_entries=10000)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.rpc_calls = 0
+        self.coalesced = 0
+
+    def _store(self, status: dict):
+        ttl = TERMINAL_STATUS_TTL if status["state"] in TERMINAL_JOB_STATES else None
+        self.cache.set(status["job_id"], status, ttl=ttl)
+
+    async def _fetch(self, job_id: str) -> dict:
+        try:
+            self.rpc_calls += 1
+            status = await self.training_service.get_training_job_status(job_id)
+            self._store(status)
+            return status
+        finally:
+            self._in_flight.pop(job_id, None)
+
+    async def get(self, job_id: str) -> dict:
+        found, status = self.cache.get(job_id)
+        if found:
+            return status
+        task = self._in_flight.get(job_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(job_id))
+            self._in_flight[job_id] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def get_many(self, job_ids: List[str]) -> List[dict]:
+        """Resolves many jobs, fetching every uncached one in a single list call.
+
+        A job that does not exist comes back with state NOT_FOUND.
+        """
+        statuses = {}
+        missing = []
+        for job_id in dict.fromkeys(job_ids):
+            found, status = self.cache.get(job_id)
+            if found:
+                statuses[job_id] = status
+            else:
+                missing.append(job_id)
+        if missing:
+            self.rpc_calls += 1
+            fetched = await self.training_service.get_training_job_statuses(missing)
+            for status in fetched.values():
+                self._store(status)
+            statuses.update(fetched)
+        return [statuses.get(job_id) or not_found_status(job_id) for job_id in job_ids]
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "rpc_calls": self.rpc_calls, "coalesced": self.coalesced}
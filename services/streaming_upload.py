@@ -0,0 +1,121 @@
+from services.async_service import AsyncService
+from services.gcs_service import RESUMABLE_CHUNK_ALIGNMENT
+from typing import AsyncIterator, Dict, List
+import asyncio
+import base64
+import json
+import os
+
+# Bytes buffered before each PUT to the resumable session
+RESUMABLE_CHUNK_SIZE = 32 * RESUMABLE_CHUNK_ALIGNMENT  # 8 MiB
+# Size of each object in a parallel composite upload
+COMPOSITE_PART_SIZE = 32 * 1024 * 1024
+# Parts uploaded at once; bounds memory to roughly PARTS_IN_FLIGHT * COMPOSITE_PART_SIZE
+COMPOSITE_PARTS_IN_FLIGHT = int(os.environ.get("COMPOSITE_PARTS_IN_FLIGHT", "4"))
+
+
+class UploadInterrupted(Exception):
+    """Raised when a streaming upload stops early; carries what is needed to resume."""
+
+    def __init__(self, session_id: str, offset: int, reason: str):
+        super().__init__(reason)
+        self.session_id = session_id
+        self.offset = offset
+
+
+def encode_session_id(session_url: str, blob_name: str) -> str:
+    """Packs the session into an opaque ID so any worker can resume it."""
+    payload = json.dumps({"u": session_url, "b": blob_name}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_session_id(session_id: str) -> Dict[str, str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(session_id.encode()))
+        return {"session_url": payload["u"], "blob_name": payload["b"]}
+    except (ValueError, KeyError):
+        raise ValueError("Invalid upload session ID")
+
+
+def _check_progress(sent: int, committed: int):
+    # Resending from an offset GCS will not move past would loop forever
+    if committed <= sent:
+        raise RuntimeError(f"Upload made no progress: GCS committed {committed} bytes, {sent} were already committed")
+
+
+async def stream_resumable(
+    gcs_service: AsyncService,
+    chunks: AsyncIterator[bytes],
+    session_id: str,
+    offset: int = 0,
+) -> int:
+    """Pipes chunks into a resumable session as they arrive. Returns the final object size."""
+    session_url = decode_session_id(session_id)["session_url"]
+    buffer = bytearray()
+    sent = offset
+    try:
+        async for chunk in chunks:
+            buffer.extend(chunk)
+            while len(buffer) >= RESUMABLE_CHUNK_SIZE:
+                committed, _ = await gcs_service.upload_chunk(
+                    session_url, bytes(buffer[:RESUMABLE_CHUNK_SIZE]), sent
+                )
+                # GCS may persist less than it was sent; keep the remainder buffered
+                _check_progress(sent, committed)
+                del buffer[:committed - sent]
+                sent = committed
+        total = sent + len(buffer)
+        while True:
+            committed, done = await gcs_service.upload_chunk(session_url, bytes(buffer), sent, total)
+            if done:
+                return total
+            _check_progress(sent, committed)
+            del buffer[:committed - sent]
+            sent = committed
+    except Exception as e:
+        raise UploadInterrupted(session_id, sent, str(e)) from e
+
+
+async def stream_parallel_composite(
+    gcs_service: AsyncService,
+    chunks: AsyncIterator[bytes],
+    destination_blob_name: str,
+) -> int:
+    """Uploads fixed-size parts concurrently as they fill, then composes them."""
+    upload_id = os.urandom(8).hex()
+    in_flight = asyncio.Semaphore(COMPOSITE_PARTS_IN_FLIGHT)
+    tasks: List[asyncio.Task] = []
+    part_names: List[str] = []
+    buffer = bytearray()
+    total = 0
+
+    async def upload_part(data: bytes, name: str):
+        try:
+            await gcs_service.upload_bytes(data, name)
+        finally:
+            in_flight.release()
+
+    async def flush(data: bytes):
+        name = f"{destination_blob_name}.parts/{upload_id}/{len(part_names):05d}"
+        part_names.append(name)
+        await in_flight.acquire()
+        tasks.append(asyncio.create_task(upload_part(data, name)))
+
+    try:
+        async for chunk in chunks:
+            buffer.extend(chunk)
+            total += len(chunk)
+            while len(buffer) >= COMPOSITE_PART_SIZE:
+                await flush(bytes(buffer[:COMPOSITE_PART_SIZE]))
+                del buffer[:COMPOSITE_PART_SIZE]
+        if buffer or not part_names:
+            await flush(bytes(buffer))
+        await asyncio.gather(*tasks)
+    except Exception:
+        # Cancelling would not stop uploads already running on executor threads, and a
+        # part written after the delete would be leaked; let the few in flight finish
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await gcs_service.delete_blobs(part_names)
+        raise
+    await gcs_service.compose(part_names, destination_blob_name)
+    return total
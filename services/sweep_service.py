@@ -0,0 +1,295 @@
+from services.async_service import AsyncService
+from services.status_cache import TrainingStatusCache
+from services.training_queue import TrainingQueue
+from services.training_service import JOB_NOT_FOUND_STATE, TERMINAL_JOB_STATES
+from schemas import SweepRange, SweepSchema, TrainingConfig
+from utils.config_generator import generate_training_config
+from typing import Any, Dict, List, Tuple
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import statistics
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on trials in one sweep (grid points x random samples)
+MAX_SWEEP_TRIALS = 256
+# Seconds between checks of trial status and eval loss
+SWEEP_POLL_INTERVAL = float(os.environ.get("SWEEP_POLL_INTERVAL", "60"))
+# Trial states that will not change any more
+FINISHED_TRIAL_STATES = TERMINAL_JOB_STATES | {"STOPPED_EARLY", "REJECTED", JOB_NOT_FOUND_STATE}
+# Errors that another tick would only repeat, e.g. an Idempotency-Key reused for a different
+# config; anything else (GCS, Vertex AI, the queue) is logged and retried next tick
+NON_RETRYABLE_ERRORS = (ValueError,)
+
+
+def expand_search_space(
+    grid: Dict[str, List[Any]], ranges: Dict[str, SweepRange], num_trials: int, seed: int
+) -> List[Dict[str, Any]]:
+    """Every grid point, each combined with ``num_trials`` random draws when ranges are given."""
+    keys = sorted(grid)
+    points = [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+    if not ranges:
+        return points
+    rng = random.Random(seed)
+    trials = []
+    for point in points:
+        for _ in range(num_trials):
+            sample = dict(point)
+            for key in sorted(ranges):
+                spec = ranges[key]
+                if spec.values is not None:
+                    sample[key] = rng.choice(spec.values)
+                elif spec.log:
+                    sample[key] = math.exp(rng.uniform(math.log(spec.min), math.log(spec.max)))
+                else:
+                    sample[key] = rng.uniform(spec.min, spec.max)
+            trials.append(sample)
+    return trials
+
+
+def parse_eval_history(log_text: str) -> List[Tuple[int, float]]:
+    """Extracts (step, eval_loss) points from llamafactory's trainer_log.jsonl."""
+    history = []
+    for line in log_text.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get("eval_loss") is not None:
+            history.append((int(record.get("current_steps", 0)), float(record["eval_loss"])))
+    return history
+
+
+def should_stop(history: List[Tuple[int, float]], peers: List[List[Tuple[int, float]]], min_evals: int, min_peers: int) -> bool:
+    """Median stopping rule.
+
+    A trial is stopped when its best eval_loss so far is worse than the median of
+    the other trials' running-average eval_loss up to the same step.
+    """
+    if len(history) < min_evals:
+        return False
+    step = history[-1][0]
+    best = min(loss for _, loss in history)
+    averages = []
+    for peer in peers:
+        losses = [loss for peer_step, loss in peer if peer_step <= step]
+        if losses:
+            averages.append(sum(losses) / len(losses))
+    return len(averages) >= min_peers and best > statistics.median(averages)
+
+
+class SweepService:
+    """Runs hyperparameter sweeps on top of the training queue.
+
+    All trial configs are rendered and uploaded up front under
+    ``training_configs/sweeps/{sweep_id}/``, at most ``max_parallel`` trials are in the
+    queue or running at a time, and, with early stopping on, trials whose eval loss
+    falls behind their peers are cancelled to free GPUs.
+    """
+
+    def __init__(
+        self,
+        gcs_service: AsyncService,
+        training_service: AsyncService,
+        training_queue: TrainingQueue,
+        status_cache: TrainingStatusCache,
+        poll_interval: float = SWEEP_POLL_INTERVAL,
+    ):
+        self.gcs_service = gcs_service
+        self.training_service = training_service
+        self.training_queue = training_queue
+        self.status_cache = status_cache
+        self.poll_interval = poll_interval
+        self.sweeps: Dict[str, Dict[str, Any]] = {}
+        self._histories: Dict[str, Dict[int, List[Tuple[int, float]]]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.tick_errors = 0
+
+    async def create(self, sweep: SweepSchema) -> Dict[str, Any]:
+        """Validates and uploads every trial config, then starts submitting in the background."""
+        points = expand_search_space(sweep.grid, sweep.random, sweep.num_trials, sweep.seed)
+        if not points or points == [{}]:
+            raise ValueError("The sweep has no parameters to vary")
+        if len(points) > MAX_SWEEP_TRIALS:
+            raise ValueError(f"The sweep has {len(points)} trials; the limit is {MAX_SWEEP_TRIALS}")
+        base_config = sweep.base.training_config.model_dump()
+        unknown = {key for point in points for key in point} - set(TrainingConfig.model_fields)
+        if unknown:
+            raise ValueError(f"Not TrainingConfig fields: {', '.join(sorted(unknown))}")
+
+        sweep_id = f"sweep-{os.urandom(4).hex()}"
+        bucket = self.gcs_service.bucket_name
+        trials = []
+        uploads = []
+        for index, params in enumerate(points):
+            training_config = TrainingConfig(**{**base_config, **params})
+            output_dir = f"/gcs/{bucket}/sweeps/{sweep_id}/trial-{index:03d}"
+            yaml_content = generate_training_config(
+                sweep.base.dataset_dir, sweep.base.model_name_or_path, output_dir, sweep.base.dataset,
+                training_config, eval_dataset=sweep.base.eval_dataset,
+            )
+            blob_name = f"training_configs/sweeps/{sweep_id}/trial-{index:03d}.yaml"
+            uploads.append(self.gcs_service.upload_string_as_file(yaml_content, blob_name))
+            trials.append({
+                "trial": index,
+                "params": params,
+                "config_gcs_url": f"gs://{bucket}/{blob_name}",
+                "output_dir": output_dir,
+                "state": "WAITING",
+                "queue_id": None,
+                "job_id": None,
+                "best_eval_loss": None,
+                "last_eval_step": None,
+            })
+        await asyncio.gather(*uploads)
+
+        record = {
+            "sweep_id": sweep_id,
+            "state": "RUNNING",
+            "error": None,
+            "started_at": time.time(),
+            "finished_at": None,
+            "max_parallel": sweep.max_parallel,
+            "early_stopping": sweep.early_stopping,
+            "best_trial": None,
+            "trials": trials,
+        }
+        self.sweeps[sweep_id] = record
+        self._histories[sweep_id] = {}
+        await self._save(record)
+        self._tasks[sweep_id] = asyncio.create_task(self._run(record, sweep))
+        return record
+
+    async def cancel(self, sweep_id: str) -> Dict[str, Any]:
+        """Stops submitting new trials and cancels the queued and running ones."""
+        record = self.sweeps[sweep_id]
+        task = self._tasks.pop(sweep_id, None)
+        if task is not None:
+            task.cancel()
+        for trial in record["trials"]:
+            if trial["state"] in FINISHED_TRIAL_STATES:
+                continue
+            await self._stop_trial(trial, "CANCELLED")
+        record["state"] = "CANCELLED"
+        record["finished_at"] = time.time()
+        await self._save(record)
+        return record
+
+    async def _save(self, record: Dict[str, Any]):
+        """Writes the sweep record next to its trial outputs so runs stay linked after a restart."""
+        await self.gcs_service.upload_string_as_file(
+            json.dumps(record, indent=2), f"sweeps/{record['sweep_id']}/sweep.json"
+        )
+
+    async def _stop_trial(self, trial: Dict[str, Any], state: str):
+        if trial["queue_id"] and await self.training_queue.cancel(trial["queue_id"]):
+            trial["state"] = state
+            return
+        if trial["queue_id"] and not trial["job_id"]:
+            trial["job_id"] = (await self.training_queue.get(trial["queue_id"]) or {}).get("job_id")
+        if trial["job_id"]:
+            await self.training_service.cancel_training_job(trial["job_id"])
+        trial["state"] = state
+
+    async def _tick(self, record: Dict[str, Any], sweep: SweepSchema) -> bool:
+        """Submits, refreshes and early-stops trials once; returns True when all have finished."""
+        await self._submit(record, sweep)
+        await self._refresh(record)
+        if sweep.early_stopping:
+            await self._early_stop(record, sweep)
+        await self._save(record)
+        return all(trial["state"] in FINISHED_TRIAL_STATES for trial in record["trials"])
+
+    async def _run(self, record: Dict[str, Any], sweep: SweepSchema):
+        try:
+            while True:
+                try:
+                    if await self._tick(record, sweep):
+                        break
+                except NON_RETRYABLE_ERRORS:
+                    raise
+                except Exception:
+                    # Trials are enqueued with idempotency keys, so repeating a tick is safe
+                    self.tick_errors += 1
+                    logger.exception("Sweep tick failed", extra={"sweep_id": record["sweep_id"]})
+                await asyncio.sleep(self.poll_interval)
+            record["state"] = "SUCCEEDED"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            record["state"] = "FAILED"
+            record["error"] = str(e)
+        record["finished_at"] = time.time()
+        self._tasks.pop(record["sweep_id"], None)
+        try:
+            await self._save(record)
+        except Exception:
+            logger.exception("Saving the finished sweep failed", extra={"sweep_id": record["sweep_id"]})
+
+    async def _submit(self, record: Dict[str, Any], sweep: SweepSchema):
+        active = sum(trial["state"] not in FINISHED_TRIAL_STATES | {"WAITING"} for trial in record["trials"])
+        for trial in record["trials"]:
+            if active >= record["max_parallel"]:
+                break
+            if trial["state"] != "WAITING":
+                continue
+            entry = await self.training_queue.enqueue(
+                trial["config_gcs_url"],
+                team=sweep.team,
+                priority=sweep.priority,
+                idempotency_key=f"{record['sweep_id']}-trial-{trial['trial']:03d}",
+            )
+            trial["queue_id"] = entry["queue_id"]
+            trial["state"] = "QUEUED"
+            active += 1
+
+    async def _refresh(self, record: Dict[str, Any]):
+        running = []
+        for trial in record["trials"]:
+            if trial["state"] in FINISHED_TRIAL_STATES or trial["state"] == "WAITING":
+                continue
+            entry = await self.training_queue.get(trial["queue_id"])
+            if entry["state"] in ("REJECTED", "CANCELLED"):
+                trial["state"] = entry["state"]
+                continue
+            trial["job_id"] = entry["job_id"]
+            if trial["job_id"]:
+                running.append(trial)
+        if not running:
+            return
+        statuses = await self.status_cache.get_many([trial["job_id"] for trial in running])
+        histories = self._histories[record["sweep_id"]]
+        for trial, status in zip(running, statuses):
+            trial["state"] = status["state"]
+            history = await self._read_eval_history(trial["output_dir"])
+            if history:
+                histories[trial["trial"]] = history
+                trial["best_eval_loss"] = min(loss for _, loss in history)
+                trial["last_eval_step"] = history[-1][0]
+        scored = [trial for trial in record["trials"] if trial["best_eval_loss"] is not None]
+        if scored:
+            record["best_trial"] = min(scored, key=lambda trial: trial["best_eval_loss"])["trial"]
+
+    async def _read_eval_history(self, output_dir: str) -> List[Tuple[int, float]]:
+        bucket = self.gcs_service.bucket_name
+        gcs_url = f"gs://{bucket}/{output_dir[len(f'/gcs/{bucket}/'):]}/trainer_log.jsonl"
+        try:
+            data = await self.gcs_service.download_file(gcs_url)
+        except FileNotFoundError:
+            return []
+        return parse_eval_history(data.decode("utf-8", errors="replace"))
+
+    async def _early_stop(self, record: Dict[str, Any], sweep: SweepSchema):
+        histories = self._histories[record["sweep_id"]]
+        for trial in record["trials"]:
+            if trial["state"] != "RUNNING" or trial["trial"] not in histories:
+                continue
+            peers = [history for index, history in histories.items() if index != trial["trial"]]
+            if should_stop(histories[trial["trial"]], peers, sweep.min_evals, sweep.min_peers):
+                await self._stop_trial(trial, "STOPPED_EARLY")
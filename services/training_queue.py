@@ -0,0 +1,419 @@
+from google.api_core.exceptions import DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable
+from services.async_service import AsyncService
+from services.status_cache import TrainingStatusCache
+from services.training_service import DEFAULT_MACHINE_SPEC, TERMINAL_JOB_STATES
+from utils.metrics import record_retry
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Lower rank is admitted first
+PRIORITY_CLASSES = {"high": 0, "normal": 1, "low": 2}
+# Entry states: QUEUED -> SUBMITTING -> SUBMITTED -> (a terminal job state), or REJECTED / CANCELLED
+ACTIVE_STATES = ("SUBMITTING", "SUBMITTED")
+# Vertex label that ties a custom job back to its queue entry, used to recover after a crash
+QUEUE_ENTRY_LABEL = "queue_entry"
+# Errors after which a submission is retried on a later tick instead of rejected
+TRANSIENT_ERRORS = (ServiceUnavailable, DeadlineExceeded, InternalServerError)
+MAX_SUBMIT_ATTEMPTS = 5
+# Submissions kept for the wait-time percentiles
+WAIT_TIME_WINDOW = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS training_queue (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE,
+    team TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    priority_rank INTEGER NOT NULL,
+    config_gcs_url TEXT NOT NULL,
+    machine_spec TEXT NOT NULL,
+    node_count INTEGER NOT NULL,
+    plan TEXT,
+    state TEXT NOT NULL,
+    job_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    enqueued_at REAL NOT NULL,
+    submitted_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS training_queue_state ON training_queue (state, priority_rank, enqueued_at);
+"""
+
+
+class TrainingQueue:
+    """Persistent queue in front of TrainingService.
+
+    Jobs are admitted in priority order while their team is under its concurrency
+    limit and their accelerator type is under its GPU quota. A ResourceExhausted
+    error from Vertex AI pauses admission for that accelerator type with exponential
+    backoff. State lives in SQLite, so queued and running jobs survive restarts; queries
+    run on the training service's executor so they never block the event loop.
+    """
+
+    def __init__(
+        self,
+        training_service: AsyncService,
+        status_cache: TrainingStatusCache,
+        db_path: str = "training_queue.db",
+        team_limits: Dict[str, int] = None,
+        default_team_limit: int = 2,
+        gpu_quotas: Dict[str, int] = None,
+        poll_interval: float = 15.0,
+        min_backoff: float = 60.0,
+        max_backoff: float = 1800.0,
+    ):
+        self.training_service = training_service
+        self.status_cache = status_cache
+        self.team_limits = team_limits or {}
+        self.default_team_limit = default_team_limit
+        self.gpu_quotas = gpu_quotas or {}
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # accelerator type -> {"until": monotonic deadline, "delay": seconds}
+        self._backoff: Dict[str, Dict[str, float]] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # False until entries a previous process left in SUBMITTING have been resolved
+        self._recovered = False
+        self.submitted = 0
+        self.resource_exhausted = 0
+        self.submit_errors = 0
+        self.deduplicated = 0
+        self.loop_errors = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    async def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        return await self.training_service.run(self._query, sql, params)
+
+    def _entry(self, row: sqlite3.Row) -> Dict[str, Any]:
+        entry = dict(row)
+        entry["queue_id"] = entry.pop("id")
+        entry.pop("priority_rank")
+        entry["machine_spec"] = json.loads(entry["machine_spec"])
+        entry["plan"] = json.loads(entry["plan"]) if entry["plan"] else None
+        return entry
+
+    async def enqueue(
+        self,
+        config_gcs_url: str,
+        team: str = "default",
+        priority: str = "normal",
+        machine_spec: Optional[Dict[str, Any]] = None,
+        node_count: int = 1,
+        plan: Optional[Dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Adds a job to the queue.
+
+        Repeating a call with the same ``idempotency_key`` returns the original entry
+        (with ``duplicate: true``) instead of queueing a second job; reusing a key for
+        a different config raises ValueError.
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        entry_id = uuid.uuid4().hex
+        try:
+            await self._execute(
+                "INSERT INTO training_queue (id, idempotency_key, team, priority, priority_rank, config_gcs_url,"
+                " machine_spec, node_count, plan, state, enqueued_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'QUEUED', ?)",
+                (
+                    entry_id, idempotency_key, team, priority, PRIORITY_CLASSES[priority], config_gcs_url,
+                    json.dumps(machine_spec or DEFAULT_MACHINE_SPEC), node_count,
+                    json.dumps(plan) if plan else None, time.time(),
+                ),
+            )
+        except sqlite3.IntegrityError:
+            rows = await self._execute("SELECT * FROM training_queue WHERE idempotency_key = ?", (idempotency_key,))
+            existing = self._entry(rows[0])
+            if existing["config_gcs_url"] != config_gcs_url:
+                raise ValueError("Idempotency-Key was already used for a different training config")
+            self.deduplicated += 1
+            return {**existing, "duplicate": True}
+        self._wake.set()
+        return {**await self.get(entry_id), "duplicate": False}
+
+    async def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._execute("SELECT * FROM training_queue WHERE id = ?", (entry_id,))
+        return self._entry(rows[0]) if rows else None
+
+    async def list(self, include_finished: bool = False, limit: int = 100) -> List[Dict[str, Any]]:
+        if include_finished:
+            rows = await self._execute("SELECT * FROM training_queue ORDER BY enqueued_at DESC LIMIT ?", (limit,))
+        else:
+            rows = await self._execute(
+                "SELECT * FROM training_queue WHERE state IN ('QUEUED', 'SUBMITTING', 'SUBMITTED')"
+                " ORDER BY priority_rank, enqueued_at LIMIT ?",
+                (limit,),
+            )
+        return [self._entry(row) for row in rows]
+
+    def _cancel_queued(self, entry_id: str) -> bool:
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE training_queue SET state = 'CANCELLED', finished_at = ? WHERE id = ? AND state = 'QUEUED'",
+                (time.time(), entry_id),
+            )
+        return bool(cursor.rowcount)
+
+    async def cancel(self, entry_id: str) -> bool:
+        """Removes a job that has not been submitted yet. Returns False if it already was."""
+        updated = await self.training_service.run(self._cancel_queued, entry_id)
+        if updated:
+            self._notify(entry_id)
+        return updated
+
+    async def wait_for_submission(self, entry_id: str, timeout: float) -> Dict[str, Any]:
+        """Waits up to ``timeout`` seconds for an entry to leave the queue; returns it either way."""
+        entry = await self.get(entry_id)
+        if entry["state"] in ("QUEUED", "SUBMITTING") and timeout > 0:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(entry_id, []).append(future)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiters[entry_id].remove(future)
+                if not self._waiters[entry_id]:
+                    del self._waiters[entry_id]
+        return await self.get(entry_id)
+
+    def _notify(self, entry_id: str):
+        for future in self._waiters.get(entry_id, []):
+            if not future.done():
+                future.set_result(None)
+
+    async def _set(self, entry_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        await self._execute(f"UPDATE training_queue SET {columns} WHERE id = ?", (*fields.values(), entry_id))
+
+    def _backed_off(self, accelerator_type: str) -> bool:
+        backoff = self._backoff.get(accelerator_type)
+        return backoff is not None and backoff["until"] > time.monotonic()
+
+    def _on_resource_exhausted(self, accelerator_type: str):
+        backoff = self._backoff.get(accelerator_type)
+        delay = min(backoff["delay"] * 2, self.max_backoff) if backoff else self.min_backoff
+        self._backoff[accelerator_type] = {"until": time.monotonic() + delay, "delay": delay}
+
+    async def _gpus_in_flight(self) -> Dict[str, int]:
+        in_flight: Dict[str, int] = {}
+        for row in await self._execute(
+            "SELECT machine_spec, node_count FROM training_queue WHERE state IN ('SUBMITTING', 'SUBMITTED')"
+        ):
+            spec = json.loads(row["machine_spec"])
+            in_flight[spec["accelerator_type"]] = (
+                in_flight.get(spec["accelerator_type"], 0) + spec["accelerator_count"] * row["node_count"]
+            )
+        return in_flight
+
+    async def _recover(self):
+        """Resolves entries a previous process left mid-submission, without resubmitting them."""
+        for row in await self._execute("SELECT id FROM training_queue WHERE state = 'SUBMITTING'"):
+            job_id = await self.training_service.find_training_job(QUEUE_ENTRY_LABEL, row["id"])
+            if job_id:
+                await self._set(row["id"], state="SUBMITTED", job_id=job_id, submitted_at=time.time())
+            else:
+                await self._set(row["id"], state="QUEUED")
+
+    async def _adopt_existing_job(self, entry: Dict[str, Any]) -> bool:
+        """Marks an entry SUBMITTED if an earlier attempt created its job after all.
+
+        A timeout or 5xx on create does not mean the job was not created; resubmitting
+        blindly would launch a second multi-GPU job.
+        """
+        job_id = await self.training_service.find_training_job(QUEUE_ENTRY_LABEL, entry["queue_id"])
+        if not job_id:
+            return False
+        self.submitted += 1
+        await self._set(entry["queue_id"], state="SUBMITTED", job_id=job_id, last_error=None, submitted_at=time.time())
+        self._notify(entry["queue_id"])
+        return True
+
+    async def _refresh_active(self):
+        rows = await self._execute("SELECT id, job_id FROM training_queue WHERE state = 'SUBMITTED'")
+        if not rows:
+            return
+        statuses = await self.status_cache.get_many([row["job_id"] for row in rows])
+        for row, status in zip(rows, statuses):
+            if status["state"] in TERMINAL_JOB_STATES:
+                await self._set(row["id"], state=status["state"], last_error=status["error"], finished_at=time.time())
+
+    async def _admit(self):
+        in_flight = await self._gpus_in_flight()
+        team_active = {
+            row["team"]: row["active"]
+            for row in await self._execute(
+                "SELECT team, COUNT(*) AS active FROM training_queue"
+                " WHERE state IN ('SUBMITTING', 'SUBMITTED') GROUP BY team"
+            )
+        }
+        for row in await self._execute(
+            "SELECT * FROM training_queue WHERE state = 'QUEUED' ORDER BY priority_rank, enqueued_at"
+        ):
+            entry = self._entry(row)
+            spec = entry["machine_spec"]
+            accelerator_type = spec["accelerator_type"]
+            gpus = spec["accelerator_count"] * entry["node_count"]
+            if team_active.get(entry["team"], 0) >= self.team_limits.get(entry["team"], self.default_team_limit):
+                continue
+            if self._backed_off(accelerator_type):
+                continue
+            quota = self.gpu_quotas.get(accelerator_type)
+            if quota is not None and in_flight.get(accelerator_type, 0) + gpus > quota:
+                continue
+            if entry["attempts"] and await self._adopt_existing_job(entry):
+                team_active[entry["team"]] = team_active.get(entry["team"], 0) + 1
+                in_flight[accelerator_type] = in_flight.get(accelerator_type, 0) + gpus
+                continue
+            # Mark first so a crash between create and commit is recoverable via the job label
+            await self._set(entry["queue_id"], state="SUBMITTING", attempts=entry["attempts"] + 1)
+            try:
+                job_id = await self.training_service.start_training_job(
+                    entry["config_gcs_url"],
+                    spec,
+                    entry["node_count"],
+                    labels={QUEUE_ENTRY_LABEL: entry["queue_id"]},
+                )
+            except ResourceExhausted as e:
+                self.resource_exhausted += 1
+                record_retry("vertex_training", "start_training_job")
+                self._on_resource_exhausted(accelerator_type)
+                await self._set(entry["queue_id"], state="QUEUED", last_error=str(e))
+                continue
+            except Exception as e:
+                self.submit_errors += 1
+                retry = isinstance(e, TRANSIENT_ERRORS) and entry["attempts"] + 1 < MAX_SUBMIT_ATTEMPTS
+                if retry:
+                    record_retry("vertex_training", "start_training_job")
+                    await self._set(entry["queue_id"], state="QUEUED", last_error=str(e))
+                else:
+                    await self._set(entry["queue_id"], state="REJECTED", last_error=str(e), finished_at=time.time())
+                    self._notify(entry["queue_id"])
+                continue
+            self.submitted += 1
+            self._backoff.pop(accelerator_type, None)
+            await self._set(entry["queue_id"], state="SUBMITTED", job_id=job_id, last_error=None, submitted_at=time.time())
+            team_active[entry["team"]] = team_active.get(entry["team"], 0) + 1
+            in_flight[accelerator_type] = in_flight.get(accelerator_type, 0) + gpus
+            self._notify(entry["queue_id"])
+
+    async def _tick(self):
+        if not self._recovered:
+            try:
+                await self._recover()
+                self._recovered = True
+            except Exception:
+                # Entries left in SUBMITTING are not admitted again until recovery succeeds
+                self.loop_errors += 1
+                logger.exception("Recovering in-flight training submissions failed")
+        try:
+            await self._refresh_active()
+        except Exception:
+            # Status lookups are retried next tick; admission does not depend on them succeeding
+            self.loop_errors += 1
+            logger.exception("Refreshing training job states failed")
+        await self._admit()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self._tick()
+            except Exception:
+                self.loop_errors += 1
+                logger.exception("Admitting queued training jobs failed")
+            timeout = self.poll_interval
+            pending = [b["until"] - time.monotonic() for b in self._backoff.values() if b["until"] > time.monotonic()]
+            if pending:
+                timeout = min(timeout, max(min(pending), 0.1))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait times and admission counters."""
+        now = time.time()
+        depth = await self._execute(
+            "SELECT priority, team, COUNT(*) AS n, MIN(enqueued_at) AS oldest FROM training_queue"
+            " WHERE state = 'QUEUED' GROUP BY priority, team"
+        )
+        by_priority: Dict[str, int] = {}
+        by_team: Dict[str, int] = {}
+        for row in depth:
+            by_priority[row["priority"]] = by_priority.get(row["priority"], 0) + row["n"]
+            by_team[row["team"]] = by_team.get(row["team"], 0) + row["n"]
+        oldest = min((row["oldest"] for row in depth), default=None)
+        active = await self._execute(
+            "SELECT COUNT(*) AS n FROM training_queue WHERE state IN ('SUBMITTING', 'SUBMITTED')"
+        )
+        waits = sorted(
+            row["wait"]
+            for row in await self._execute(
+                "SELECT submitted_at - enqueued_at AS wait FROM training_queue WHERE submitted_at IS NOT NULL"
+                " ORDER BY submitted_at DESC LIMIT ?",
+                (WAIT_TIME_WINDOW,),
+            )
+        )
+        return {
+            "queued": sum(by_priority.values()),
+            "queued_by_priority": by_priority,
+            "queued_by_team": by_team,
+            "oldest_queued_seconds": round(now - oldest, 1) if oldest else None,
+            "active": active[0]["n"],
+            "gpus_in_flight": await self._gpus_in_flight(),
+            "wait_seconds": {
+                "samples": len(waits),
+                "mean": round(sum(waits) / len(waits), 1) if waits else None,
+                "p50": round(waits[len(waits) // 2], 1) if waits else None,
+                "p95": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)], 1) if waits else None,
+                "max": round(waits[-1], 1) if waits else None,
+            },
+            "backoff_seconds": {
+                accelerator_type: round(backoff["until"] - time.monotonic(), 1)
+                for accelerator_type, backoff in self._backoff.items()
+                if backoff["until"] > time.monotonic()
+            },
+            "submitted": self.submitted,
+            "resource_exhausted": self.resource_exhausted,
+            "submit_errors": self.submit_errors,
+            "deduplicated": self.deduplicated,
+            "loop_errors": self.loop_errors,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
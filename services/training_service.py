@@ -1,6 +1,44 @@
-from google.cloud import aiplatform
+from services.client_registry import ClientRegistry
+from utils.lazy_import import lazy_import
+from utils.metrics import instrument_service
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import logging
 import os
 
+aiplatform = lazy_import("google.cloud.aiplatform")
+logger = logging.getLogger(__name__)
+
+# Job states after which a training job never changes again
+TERMINAL_JOB_STATES = {"SUCCEEDED", "FAILED", "CANCELLED", "EXPIRED"}
+# State in batched status lookups for a job that does not exist
+JOB_NOT_FOUND_STATE = "NOT_FOUND"
+# Machine used when a job is not sized by the resource planner
+DEFAULT_MACHINE_SPEC = {
+    "machine_type": "a2-highgpu-8g",
+    "accelerator_type": "NVIDIA_TESLA_A100",
+    "accelerator_count": 8,
+}
+# Display name of every job this service submits
+TRAINING_JOB_DISPLAY_NAME = "llm-training-job"
+# Port torchrun's rendezvous listens on at the chief replica
+MASTER_PORT = 29500
+# Derives torchrun's rendezvous settings from the CLUSTER_SPEC Vertex AI sets on each
+# replica: workerpool0 is the chief (rank 0), workerpool1 replicas follow in order.
+_RENDEZVOUS_SCRIPT = (
+    "import json, os; "
+    "spec = json.loads(os.environ['CLUSTER_SPEC']); "
+    "task = spec['task']; "
+    "chief = spec['cluster']['workerpool0'][0].split(':')[0]; "
+    "rank = 0 if task['type'] == 'workerpool0' else task['index'] + 1; "
+    "print(f'export MASTER_ADDR={chief} NODE_RANK={rank}')"
+)
+
+def not_found_status(job_id: str) -> dict:
+    """Status reported for a job ID that Vertex AI has no training job for."""
+    return {"job_id": job_id, "state": JOB_NOT_FOUND_STATE, "error": f"Training job not found: {job_id}"}
+
+@instrument_service("vertex_training")
 class TrainingService:
     def __init__(
         self,
@@ -8,78 +46,176 @@ class TrainingService:
         location: str = "us-central1",
         model_image_uri: str = None,
         hf_token: str = None,
+        client_registry: ClientRegistry = None,
     ):
         self.project_id = project_id
         self.location = location
         self.model_image_uri = model_image_uri
         self.hf_token = hf_token
-        self.client = aiplatform.gapic.JobServiceClient(
-            client_options={"api_endpoint": f"{location}-aiplatform.googleapis.com"}
-        )
+        self.client_registry = client_registry
+        # job_id -> create time, for jobs submitted or looked up; bounds batched status lists
+        self._create_times: Dict[str, datetime] = {}
+        self._client = None
+        if client_registry is None:
+            self._client = aiplatform.gapic.JobServiceClient(
+                client_options={"api_endpoint": f"{location}-aiplatform.googleapis.com"}
+            )
         self.bucket_name = os.environ.get("GCS_BUCKET_NAME")
-    def start_training_job(self, config_gcs_url: str) -> str:
-        """Starts a Vertex AI Custom Training job."""
+
+    @property
+    def client(self) -> "aiplatform.gapic.JobServiceClient":
+        if self.client_registry:
+            return self.client_registry.get("job")
+        return self._client
+
+    def start_training_job(
+        self,
+        config_gcs_url: str,
+        machine_spec: Optional[Dict[str, Any]] = None,
+        node_count: int = 1,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Starts a Vertex AI Custom Training job, on DEFAULT_MACHINE_SPEC unless one is given.
+
+        With ``node_count`` > 1 the job gets a chief pool and a pool of ``node_count - 1``
+        workers on the same machine spec, and llamafactory runs under torchrun across them.
+        """
+        machine_spec = machine_spec or DEFAULT_MACHINE_SPEC
 
         # Extract the path relative to the bucket
         relative_path = config_gcs_url.replace(f"gs://{self.bucket_name}/", "")
         # Construct the /gcs/ path
         gcs_path = f"/gcs/{self.bucket_name}/{relative_path}"
-        print("GCS Config Path:", gcs_path)
-        print("HF_TOKEN:", self.hf_token)
-        custom_job = {
-            "display_name": "llm-training-job",
-            "job_spec": {
-                "worker_pool_specs": [
-                    {
-                        "machine_spec": {
-                            "machine_type": "a2-highgpu-8g",
-                            "accelerator_type":  getattr(aiplatform.gapic.AcceleratorType, "NVIDIA_TESLA_A100"), 
-                            "accelerator_count": 8 
-                        },
-                        "replica_count": 1,
-                        "container_spec": {
-                            "image_uri": self.model_image_uri.format(
-                                PROJECT_ID=self.project_id
-                            ),
-                            "command": [ "bash", 
-                                        "-c",
-                                        f"/usr/local/bin/llamafactory-cli train {gcs_path}"
-                                        ],
-                            "env": [
-                                {"name": "HF_TOKEN", "value": self.hf_token},
-                                {"name": "PYTHONUNBUFFERED", "value": "1"},
-                                {"name": "WORLD_SIZE", "value": "1"},
-                                {"name": "RANK", "value": "0"},
-                                {"name": "N_NODES", "value": "1"},
+        pool = {
+            "machine_spec": {
+                "machine_type": machine_spec["machine_type"],
+                "accelerator_type":  getattr(aiplatform.gapic.AcceleratorType, machine_spec["accelerator_type"]), 
+                "accelerator_count": machine_spec["accelerator_count"] 
+            },
+            "replica_count": 1,
+            "container_spec": {
+                "image_uri": self.model_image_uri.format(
+                    PROJECT_ID=self.project_id
+                ),
+                "command": [ "bash", 
+                            "-c",
+                            self._training_command(gcs_path, node_count)
                             ],
-                        },
-                    }
-                ]
+                "env": self._training_env(machine_spec, node_count),
             },
         }
+        worker_pool_specs = [pool]
+        if node_count > 1:
+            worker_pool_specs.append({**pool, "replica_count": node_count - 1})
+        custom_job = {
+            "display_name": TRAINING_JOB_DISPLAY_NAME,
+            "job_spec": {"worker_pool_specs": worker_pool_specs},
+        }
+        if labels:
+            custom_job["labels"] = labels
 
         parent = f"projects/{self.project_id}/locations/{self.location}"
         response = self.client.create_custom_job(
             parent=parent, custom_job=custom_job
         )
         job_id = response.name.split("/")[-1]
+        self._remember_create_time(job_id, response)
+        logger.info(
+            "Submitted training job",
+            extra={"job_id": job_id, "config": gcs_path, "node_count": node_count, **machine_spec},
+        )
         return job_id
 
+    def _training_command(self, gcs_path: str, node_count: int) -> str:
+        if node_count == 1:
+            return f"/usr/local/bin/llamafactory-cli train {gcs_path}"
+        return (
+            f'eval "$(python3 -c "{_RENDEZVOUS_SCRIPT}")" && '
+            f"/usr/local/bin/llamafactory-cli train {gcs_path}"
+        )
+
+    def _training_env(self, machine_spec: Dict[str, Any], node_count: int) -> List[Dict[str, str]]:
+        env = [
+            {"name": "HF_TOKEN", "value": self.hf_token},
+            {"name": "PYTHONUNBUFFERED", "value": "1"},
+        ]
+        if node_count == 1:
+            return env + [
+                {"name": "WORLD_SIZE", "value": "1"},
+                {"name": "RANK", "value": "0"},
+                {"name": "N_NODES", "value": "1"},
+            ]
+        # llamafactory-cli launches torchrun with these; NODE_RANK and MASTER_ADDR come from CLUSTER_SPEC
+        return env + [
+            {"name": "FORCE_TORCHRUN", "value": "1"},
+            {"name": "NNODES", "value": str(node_count)},
+            {"name": "NPROC_PER_NODE", "value": str(machine_spec["accelerator_count"])},
+            {"name": "MASTER_PORT", "value": str(MASTER_PORT)},
+        ]
+
     def get_training_job_status(self, job_id: str):
         """Gets the status of a Vertex AI Custom Training job."""
         name = self.client.custom_job_path(
             project=self.project_id, location=self.location, custom_job=job_id
         )
-        print(name)
         response = self.client.get_custom_job(name=name)
+        return self._job_status(job_id, response)
 
-        state = response.state.name
+    def get_training_job_statuses(self, job_ids: List[str]) -> Dict[str, dict]:
+        """Gets the status of many training jobs with a single server-filtered list call.
+
+        ListCustomJobs cannot filter by job ID, so the list is filtered to this service's
+        jobs and, when every requested job has been seen before (submitted or looked up),
+        to those created since the oldest of them. A requested job the list does not
+        return gets a NOT_FOUND status instead of failing the whole batch.
+        """
+        wanted = set(job_ids)
+        parent = f"projects/{self.project_id}/locations/{self.location}"
+        job_filter = f'display_name="{TRAINING_JOB_DISPLAY_NAME}"'
+        if wanted <= self._create_times.keys():
+            since = min(self._create_times[job_id] for job_id in wanted).astimezone(timezone.utc)
+            job_filter += f' AND create_time>="{since.strftime("%Y-%m-%dT%H:%M:%SZ")}"'
+        statuses = {}
+        if wanted:
+            for job in self.client.list_custom_jobs(request={"parent": parent, "filter": job_filter}):
+                job_id = job.name.split("/")[-1]
+                if job_id in wanted:
+                    statuses[job_id] = self._job_status(job_id, job)
+                    if len(statuses) == len(wanted):
+                        break
+        for job_id in wanted - statuses.keys():
+            statuses[job_id] = not_found_status(job_id)
+        return statuses
+
+    def cancel_training_job(self, job_id: str):
+        """Requests cancellation of a running training job; Vertex AI stops it asynchronously."""
+        name = self.client.custom_job_path(
+            project=self.project_id, location=self.location, custom_job=job_id
+        )
+        self.client.cancel_custom_job(name=name)
+
+    def find_training_job(self, label: str, value: str) -> Optional[str]:
+        """Returns the ID of a training job carrying the given label, if one was created."""
+        parent = f"projects/{self.project_id}/locations/{self.location}"
+        for job in self.client.list_custom_jobs(
+            request={"parent": parent, "filter": f'labels.{label}="{value}"'}
+        ):
+            return job.name.split("/")[-1]
+        return None
+
+    def _remember_create_time(self, job_id: str, job):
+        if job.create_time:
+            self._create_times[job_id] = job.create_time
+
+    def _job_status(self, job_id: str, job) -> dict:
+        self._remember_create_time(job_id, job)
+        state = job.state.name
         error_message = None
         if state == "JOB_STATE_FAILED":
-            error_message = response.error.message
+            error_message = job.error.message
 
         return {
             "job_id": job_id,
             "state": state.replace("JOB_STATE_", ""),
             "error": error_message,
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+from typing import Any, Dict, List
+import re
+
+_LABEL_FILTER = re.compile(r'labels\.(\w+)="([^"]*)"')
+
+
+def _matches(labels: Dict[str, str], filter: str) -> bool:
+    return all(labels.get(key) == value for key, value in _LABEL_FILTER.findall(filter or ""))
+
+
+class FakeAiplatform:
+    """The slice of google.cloud.aiplatform that DeploymentService uses, kept in memory.
+
+    Records every ``Model.upload`` and ``Model.deploy`` call with its keyword arguments.
+    """
+
+    def __init__(self):
+        self.uploads: List[Dict[str, Any]] = []
+        self.deploys: List[Dict[str, Any]] = []
+        self.models: Dict[str, "SimpleNamespace"] = {}
+        self.endpoints: Dict[str, Any] = {}
+        self.init_calls = 0
+        fake = self
+
+        class Endpoint:
+            def __init__(self, endpoint_name, project=None, location=None):
+                existing = fake.endpoints[endpoint_name]
+                self.__dict__.update(existing.__dict__)
+
+            @classmethod
+            def _new(cls, display_name, labels=None):
+                endpoint = cls.__new__(cls)
+                endpoint.name = endpoint.resource_name = str(len(fake.endpoints) + 1)
+                endpoint.display_name = display_name
+                endpoint.labels = dict(labels or {})
+                endpoint.create_time = "2026-01-01T00:00:00Z"
+                endpoint.gca_resource = SimpleNamespace(deployed_models=[])
+                fake.endpoints[endpoint.name] = endpoint
+                return endpoint
+
+            @classmethod
+            def create(cls, display_name, labels=None, **kwargs):
+                return cls._new(display_name, labels)
+
+            @classmethod
+            def list(cls, filter=None, **kwargs):
+                return [endpoint for endpoint in fake.endpoints.values() if _matches(endpoint.labels, filter)]
+
+            def update(self, display_name=None, labels=None):
+                stored = fake.endpoints[self.name]
+                stored.display_name = display_name or stored.display_name
+                stored.labels = dict(labels) if labels is not None else stored.labels
+                return stored
+
+            def wait(self):
+                pass
+
+            def undeploy(self, deployed_model_id):
+                pass
+
+        class Model:
+            def __init__(self, model_name):
+                self.resource_name = model_name
+
+            @classmethod
+            def upload(cls, display_name, labels=None, **spec):
+                fake.uploads.append({"display_name": display_name, "labels": labels, **spec})
+                model = cls(f"projects/project/locations/us-central1/models/{len(fake.uploads)}")
+                fake.models[model.resource_name] = SimpleNamespace(resource_name=model.resource_name, labels=labels or {})
+                return model
+
+            @classmethod
+            def list(cls, filter=None, **kwargs):
+                return [model for model in reversed(list(fake.models.values())) if _matches(model.labels, filter)]
+
+            def deploy(self, **kwargs):
+                fake.deploys.append({"model": self.resource_name, **kwargs})
+                kwargs["endpoint"].gca_resource.deployed_models.append(SimpleNamespace(id=str(len(fake.deploys))))
+
+        self.Endpoint = Endpoint
+        self.Model = Model
+
+    def init(self, **kwargs):
+        self.init_calls += 1
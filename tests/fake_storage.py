@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from typing import Dict, List
+import io
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    def compose(self, sources: List["FakeBlob"]):
+        self.bucket.compose_calls.append((self.name, [source.name for source in sources]))
+        if self.name in self.bucket.fail_compose:
+            raise RuntimeError(f"compose of {self.name} failed")
+        self.bucket.objects[self.name] = b"".join(self.bucket.objects[source.name] for source in sources)
+
+    @property
+    def generation(self) -> int:
+        return self.bucket.generations.get(self.name, 0)
+
+    def reload(self):
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+
+    def open(self, mode="rb", chunk_size=None):
+        return io.BytesIO(self.bucket.objects[self.name])
+
+    def download_as_bytes(self, if_generation_match=None, **kwargs):
+        self.reload()
+        return self.bucket.objects[self.name]
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None, **kwargs):
+        if if_generation_match is not None and if_generation_match != self.generation:
+            raise PreconditionFailed(self.name)
+        self.bucket.objects[self.name] = data.encode() if isinstance(data, str) else bytes(data)
+        self.bucket.generations[self.name] = self.generation + 1
+
+    def delete(self):
+        self.bucket.objects.pop(self.name, None)
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+        self.generations: Dict[str, int] = {}
+        self.compose_calls = []
+        self.fail_compose = set()
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+    def get_blob(self, name: str):
+        return FakeBlob(self, name) if name in self.objects else None
+
+
+class FakeStorageClient:
+    """The slice of google.cloud.storage.Client that GcsService uses, kept in memory."""
+
+    def __init__(self):
+        self.fake_bucket = FakeBucket()
+
+    def bucket(self, name: str) -> FakeBucket:
+        return self.fake_bucket
+
+    @contextmanager
+    def batch(self, raise_exception=True):
+        yield
+
+
+class FakeRegistry:
+    def __init__(self, **clients):
+        self.clients = clients
+
+    def get(self, name: str):
+        return self.clients[name]
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: Dict[str, str] = None, body: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body
+        self.text = str(body)
+
+    def json(self):
+        return self._body
+
+
+class FakeUploadSession:
+    """Resumable upload endpoint; ``persist_limit`` caps the bytes one PUT commits, as GCS may.
+
+    Sessions listed in ``targets`` (session URL to blob name) write their object to
+    ``bucket`` when finalized.
+    """
+
+    def __init__(self, persist_limit: int = None, bucket: FakeBucket = None):
+        self.uploads: Dict[str, bytearray] = {}
+        self.persist_limit = persist_limit
+        self.bucket = bucket
+        self.targets: Dict[str, str] = {}
+
+    def put(self, url, data=b"", headers=None):
+        stored = self.uploads.setdefault(url, bytearray())
+        byte_range, total = headers["Content-Range"][len("bytes "):].split("/")
+        if byte_range != "*":
+            start = int(byte_range.split("-")[0])
+            assert start == len(stored), (start, len(stored))
+            stored.extend(data[:self.persist_limit] if self.persist_limit else data)
+        if total != "*" and int(total) == len(stored):
+            if url in self.targets:
+                self.bucket.blob(self.targets[url]).upload_from_string(bytes(stored))
+            return FakeResponse(200, body={"size": str(len(stored))})
+        return FakeResponse(308, {"Range": f"bytes=0-{len(stored) - 1}"} if stored else {})
@@ -0,0 +1,69 @@
+from google.cloud.aiplatform_v1.types import PredictRequest, PredictResponse
+from google.protobuf import struct_pb2
+from services.prediction_client import PredictionClient
+from typing import Any, Dict, List
+import asyncio
+import grpc
+
+SERVICE = "google.cloud.aiplatform.v1.PredictionService"
+
+
+class StubPredictionServer:
+    """In-process gRPC PredictionService answering each prompt with ``echo:<prompt>``.
+
+    Each request takes ``delay`` seconds (an ``asyncio.Event`` in ``gate`` holds
+    them all instead while it is clear). Records the instances of every request and
+    the most requests it ever had open at once.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.batches: List[List[Dict[str, Any]]] = []
+        self.open = 0
+        self.max_open = 0
+        self.port = None
+        self._server = None
+
+    async def _predict(self, request_bytes: bytes, context) -> bytes:
+        request = PredictRequest.deserialize(request_bytes)
+        instances = [dict(instance) for instance in request.instances]
+        self.batches.append(instances)
+        self.open += 1
+        self.max_open = max(self.max_open, self.open)
+        try:
+            await self.gate.wait()
+            await asyncio.sleep(self.delay)
+        finally:
+            self.open -= 1
+        response = PredictResponse.pb()()
+        response.predictions.extend(
+            struct_pb2.Value(string_value=f"echo:{instance['prompt']}") for instance in instances
+        )
+        return response.SerializeToString()
+
+    def client(self, endpoint_id: str = "1", **options) -> PredictionClient:
+        return PredictionClient(
+            endpoint_id, "project", api_endpoint=f"localhost:{self.port}", insecure=True, **options
+        )
+
+    @property
+    def instances(self) -> List[Dict[str, Any]]:
+        return [instance for batch in self.batches for instance in batch]
+
+    async def __aenter__(self) -> "StubPredictionServer":
+        self._server = grpc.aio.server()
+        handler = grpc.method_handlers_generic_handler(SERVICE, {
+            "Predict": grpc.unary_unary_rpc_method_handler(
+                self._predict, request_deserializer=bytes, response_serializer=bytes
+            ),
+        })
+        self._server.add_generic_rpc_handlers((handler,))
+        self.port = self._server.add_insecure_port("localhost:0")
+        await self._server.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.gate.set()
+        await self._server.stop(None)
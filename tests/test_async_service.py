@@ -0,0 +1,106 @@
+from services.async_service import AsyncService, create_executor
+import asyncio
+import dependencies
+import contextvars
+import time
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class EchoService:
+    def current_request(self):
+        return request_id.get()
+
+
+def test_calls_see_the_callers_context():
+    async def scenario():
+        service = AsyncService(EchoService(), executor)
+        request_id.set("req-1")
+        return await service.current_request()
+
+    executor = create_executor(2)
+    try:
+        assert asyncio.run(scenario()) == "req-1"
+    finally:
+        executor.shutdown()
+
+
+class SlowBackend:
+    """Blocks like a slow SDK call would."""
+
+    def fetch(self, delay):
+        time.sleep(delay)
+        return delay
+
+
+def test_slow_calls_do_not_block_the_event_loop():
+    delay, calls = 0.2, 8
+
+    async def heartbeat(stop: asyncio.Event, ticks: list):
+        while not stop.is_set():
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        service = AsyncService(SlowBackend(), executor)
+        stop, ticks = asyncio.Event(), []
+        beat = asyncio.create_task(heartbeat(stop, ticks))
+        started = time.perf_counter()
+        results = await asyncio.gather(*(service.fetch(delay) for _ in range(calls)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await beat
+        return results, elapsed, ticks
+
+    executor = create_executor(calls)
+    try:
+        results, elapsed, ticks = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert results == [delay] * calls
+    # The calls overlap instead of running one after another on the loop
+    assert elapsed < delay * calls / 2
+    # The loop kept running other work: no gap between heartbeats near the length of a call
+    gaps = [later - earlier for earlier, later in zip(ticks, ticks[1:])]
+    assert len(ticks) >= 10
+    assert max(gaps) < delay / 2
+
+
+class SlowUploads:
+    """GcsService stand-in whose uploads hold a thread like a large object would."""
+
+    def upload_bytes(self, data, destination_blob_name):
+        time.sleep(0.5)
+        return destination_blob_name
+
+
+class StatusBackend:
+    def get_training_job_status(self, job_id):
+        return {"job_id": job_id, "state": "JOB_STATE_RUNNING"}
+
+
+def test_status_calls_stay_fast_while_uploads_fill_the_executor(monkeypatch):
+    monkeypatch.setattr(dependencies, "get_gcs_service", SlowUploads)
+    monkeypatch.setattr(dependencies, "get_training_service", StatusBackend)
+    uploads = dependencies.SERVICE_EXECUTOR_WORKERS + 8
+
+    async def scenario():
+        gcs_service = dependencies.get_async_gcs_service()
+        training_service = dependencies.get_async_training_service()
+        in_flight = [asyncio.create_task(gcs_service.upload_bytes(b"x", f"part-{i}")) for i in range(uploads)]
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        status = await training_service.get_training_job_status("1")
+        latency = time.perf_counter() - started
+        await asyncio.gather(*in_flight)
+        return status, latency
+
+    try:
+        status, latency = asyncio.run(scenario())
+    finally:
+        for factory in (dependencies.get_service_executor, dependencies.get_transfer_executor):
+            factory().shutdown()
+            factory.cache_clear()
+    assert status["state"] == "JOB_STATE_RUNNING"
+    # Waiting behind the uploads would take the length of one (0.5 s)
+    assert latency < 0.1
@@ -0,0 +1,106 @@
+from schemas import BatchInferenceSchema
+from services.batch_inference import BatchInferenceService
+from tests.stub_prediction_server import StubPredictionServer
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+import asyncio
+import io
+import json
+
+LINES = 20
+SHARD_SIZE = 4
+INPUT = "".join(json.dumps({"prompt": f"p{i}"}) + "\n" for i in range(LINES)).encode()
+
+
+class FakeAsyncGcs:
+    """The AsyncService(GcsService) calls BatchInferenceService makes, kept in memory."""
+
+    bucket_name = "bucket"
+
+    def __init__(self, objects: Dict[str, bytes]):
+        self.objects = dict(objects)
+        self.uploads: List[str] = []
+        self.on_upload: Optional[Callable[[str], None]] = None
+
+    async def run(self, func, *args):
+        return func(*args)
+
+    run_transfer = run
+
+    async def get_blob_metadata(self, gcs_url: str):
+        name = gcs_url[len(f"gs://{self.bucket_name}/"):]
+        return SimpleNamespace(name=name, size=len(self.objects[name]))
+
+    async def open_blob(self, blob_name: str, chunk_size: int = None):
+        return io.BytesIO(self.objects[blob_name])
+
+    async def read_json(self, blob_name: str):
+        return (json.loads(self.objects[blob_name]), 1) if blob_name in self.objects else ({}, 0)
+
+    async def upload_string_as_file(self, content: str, blob_name: str):
+        self.objects[blob_name] = content.encode()
+
+    async def upload_bytes(self, data: bytes, blob_name: str, content_type: str = None):
+        self.objects[blob_name] = data
+        self.uploads.append(blob_name)
+        if self.on_upload:
+            self.on_upload(blob_name)
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+def test_cancelled_job_resumes_without_rewriting_shards():
+    async def scenario():
+        gcs = FakeAsyncGcs({"eval/prompts.jsonl": INPUT})
+        async with StubPredictionServer(delay=0.01) as server:
+            service = BatchInferenceService(gcs, "project", "us-central1", client_factory=server.client)
+
+            def hold_after_second_shard(blob_name: str):
+                # Later requests stall at the stub, so the job is cancelled part way through
+                if blob_name.endswith("part-00001.jsonl"):
+                    server.gate.clear()
+
+            gcs.on_upload = hold_after_second_shard
+            job = await service.create(BatchInferenceSchema(
+                endpoint_id="1", input_gcs_url="gs://bucket/eval/prompts.jsonl",
+                shard_size=SHARD_SIZE, max_batch_size=2, max_in_flight=1,
+            ))
+            job_id = job["job_id"]
+            await wait_for(lambda: not server.gate.is_set() and server.open)
+            cancel = asyncio.ensure_future(service.cancel(job_id))
+            # Closing the client waits for the stalled request, whose answer is dropped
+            await asyncio.sleep(0.05)
+            server.gate.set()
+            cancelled = await asyncio.wait_for(cancel, 5)
+            assert cancelled["state"] == "CANCELLED"
+            assert cancelled["checkpoint"]["completed_shards"] == [0, 1]
+            assert cancelled["checkpoint"]["resume_shard"] == 2
+
+        # A fresh service picks the job up from its saved checkpoint
+        gcs.on_upload = None
+        async with StubPredictionServer() as server:
+            service = BatchInferenceService(gcs, "project", "us-central1", client_factory=server.client)
+            await service.resume(job_id)
+            await wait_for(lambda: service.jobs[job_id]["state"] != "RUNNING")
+            record = await service.get(job_id)
+
+        assert record["state"] == "SUCCEEDED", record["error"]
+        assert record["attempts"] == 2
+        prefix = f"batch_inference/{job_id}/outputs"
+        assert gcs.uploads == [f"{prefix}/part-{shard:05d}.jsonl" for shard in range(LINES // SHARD_SIZE)]
+        indexes = []
+        for name in gcs.uploads:
+            rows = [json.loads(line) for line in gcs.objects[name].decode().splitlines()]
+            assert all(row["prediction"] == f"echo:p{row['index']}" for row in rows)
+            indexes += [row["index"] for row in rows]
+        assert indexes == list(range(LINES))
+        # The resumed run seeks past the written shards instead of re-sending them
+        resent = [instance["prompt"] for instance in server.instances]
+        assert resent == [f"p{i}" for i in range(2 * SHARD_SIZE, LINES)]
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from main import report_client_reuse
+from services.async_service import AsyncService, create_executor
+from services.client_registry import ClientRegistry
+from utils.metrics import MetricsMiddleware
+
+
+class BucketService:
+    def __init__(self, registry: ClientRegistry):
+        self.registry = registry
+
+    def list_blobs(self):
+        self.registry.get("storage")
+        self.registry.get("storage")
+        return []
+
+
+def make_app(registry: ClientRegistry, executor) -> FastAPI:
+    app = FastAPI()
+    service = AsyncService(BucketService(registry), executor)
+
+    @app.get("/blobs")
+    async def list_blobs():
+        return await service.list_blobs()
+
+    app.add_middleware(MetricsMiddleware, header_hooks=[report_client_reuse])
+    return app
+
+
+def test_header_counts_only_clients_served_from_the_pool():
+    registry = ClientRegistry(project_id="project")
+    registry._factories = {"storage": object}
+    executor = create_executor(2)
+    try:
+        client = TestClient(make_app(registry, executor))
+        cold = client.get("/blobs")
+        warm = client.get("/blobs")
+    finally:
+        executor.shutdown()
+    # The cold request built the client once and reused it once
+    assert cold.headers["X-Client-Constructions-Avoided"] == "1"
+    assert warm.headers["X-Client-Constructions-Avoided"] == "2"
+    assert registry.constructed == 1
@@ -0,0 +1,48 @@
+from utils import dataset_profiler
+from utils.dataset_profiler import DatasetProfiler
+import json
+
+
+def profile(file_name: str, data: bytes, chunk_size: int = 7) -> dict:
+    profiler = DatasetProfiler(file_name)
+    for start in range(0, len(data), chunk_size):
+        profiler.feed(data[start:start + chunk_size])
+    return profiler.finish()
+
+
+def test_oversized_jsonl_line_is_malformed_and_parsing_resumes(monkeypatch):
+    monkeypatch.setattr(dataset_profiler, "MAX_RECORD_CHARS", 64)
+    data = b'{"a": 1}\n{"a": "' + b"x" * 500 + b'"}\n{"a": 2}\n'
+
+    result = profile("train.jsonl", data)
+
+    assert result["rows"] == 3
+    assert result["malformed_rows"] == 1
+    assert result["max_row_chars"] == len('{"a": 1}')
+
+
+def test_oversized_csv_record_is_malformed_and_parsing_resumes(monkeypatch):
+    monkeypatch.setattr(dataset_profiler, "MAX_RECORD_CHARS", 64)
+    data = b'prompt,answer\nhi,there\nhi,"' + b"x" * 500 + b'"\nok,fine\n'
+
+    result = profile("train.csv", data)
+
+    assert result["malformed_rows"] == 1
+    assert result["rows"] - result["malformed_rows"] == 2
+
+
+def test_unique_rows_report_no_duplicates():
+    for rows in (1000, dataset_profiler.EXACT_DISTINCT_ROWS * 2):
+        data = "".join(json.dumps({"prompt": f"question {i}"}) + "\n" for i in range(rows)).encode()
+        result = profile("train.jsonl", data, chunk_size=1 << 20)
+        assert result["rows"] == rows
+        assert result["duplicate_ratio"] == 0.0
+
+
+def test_duplicates_are_counted_exactly_on_small_datasets():
+    data = "".join(json.dumps({"prompt": f"question {i % 750}"}) + "\n" for i in range(1000)).encode()
+
+    result = profile("train.jsonl", data)
+
+    assert result["distinct_rows_estimate"] == 750
+    assert result["duplicate_ratio"] == 0.25
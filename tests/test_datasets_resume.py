@@ -0,0 +1,61 @@
+from dependencies import get_async_gcs_service, get_dataset_manifest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routers import datasets
+from services.async_service import AsyncService, create_executor
+from services.gcs_service import GcsService
+from services.manifest_service import DatasetManifest
+from services.streaming_upload import encode_session_id
+from tests.fake_storage import FakeRegistry, FakeStorageClient, FakeUploadSession
+import json
+import pytest
+
+ROWS = [{"prompt": f"question {i}", "answer": f"answer {i}"} for i in range(20)]
+BODY = "".join(json.dumps(row) + "\n" for row in ROWS).encode()
+SESSION_URL = "https://upload/train"
+BLOB_NAME = "datasets/train.jsonl"
+
+
+@pytest.fixture
+def upload():
+    storage_client = FakeStorageClient()
+    bucket = storage_client.fake_bucket
+    session = FakeUploadSession(bucket=bucket)
+    session.targets[SESSION_URL] = BLOB_NAME
+    executor = create_executor(2)
+    gcs_service = AsyncService(
+        GcsService("bucket", client_registry=FakeRegistry(storage=storage_client, upload_session=session)), executor
+    )
+    app = FastAPI()
+    app.include_router(datasets.router)
+    manifest = DatasetManifest(gcs_service, batch_window=0)
+    app.dependency_overrides[get_async_gcs_service] = lambda: gcs_service
+    app.dependency_overrides[get_dataset_manifest] = lambda: manifest
+    yield TestClient(app), session, bucket
+    executor.shutdown()
+
+
+def test_resumed_upload_keeps_columns_and_profiles_the_data(upload):
+    client, session, bucket = upload
+    bucket.blob("datasets/dataset_info.json").upload_from_string(json.dumps({
+        "train": {"file_name": "train.jsonl", "formatting": "alpaca", "columns": {"prompt": "prompt"}},
+    }))
+    # The first attempt got this far before it was cut off
+    committed = len(BODY) // 2
+    session.uploads[SESSION_URL] = bytearray(BODY[:committed])
+
+    response = client.put(
+        f"/datasets/upload/{encode_session_id(SESSION_URL, BLOB_NAME)}",
+        params={"offset": committed, "columns": json.dumps({"response": "answer"})},
+        content=BODY[committed:],
+    )
+
+    assert response.status_code == 200, response.text
+    assert bucket.objects[BLOB_NAME] == BODY
+    profile = response.json()["profile"]
+    # The profile covers the whole object, not just the bytes sent on resume
+    assert profile["rows"] == len(ROWS)
+    entry = json.loads(bucket.objects["datasets/dataset_info.json"])["train"]
+    assert entry["formatting"] == "alpaca"
+    assert entry["columns"] == {"prompt": "prompt", "response": "answer"}
+    assert entry["profile"] == profile
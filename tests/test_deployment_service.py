@@ -0,0 +1,125 @@
+from services import deployment_service
+from services.deployment_service import (
+    ENDPOINT_POOL_LABEL,
+    POOL_CLAIM_TTL,
+    POOL_CLAIMS_BLOB,
+    POOL_ENDPOINT_DISPLAY_NAME,
+    SERVING_SPEC_LABEL,
+    DeploymentService,
+)
+from services.gcs_service import GcsService
+from tests.fake_aiplatform import FakeAiplatform
+from tests.fake_storage import FakeRegistry, FakeStorageClient
+import json
+import pytest
+import time
+
+# Arguments deploy_model* add to Model.deploy on top of the previewed deploy spec
+PLACEMENT_KWARGS = {"model", "endpoint", "deployed_model_display_name", "traffic_percentage", "deploy_request_timeout", "sync"}
+AUTOSCALING = [
+    {},
+    {"min_replica_count": 2, "max_replica_count": 2, "target_cpu_utilization": 50},
+    {"min_replica_count": 1, "max_replica_count": 4},
+    {"min_replica_count": 1, "max_replica_count": 4, "target_request_count_per_minute": 600},
+]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeAiplatform()
+    monkeypatch.setattr(deployment_service, "aiplatform", fake)
+    monkeypatch.delenv("HF_TOKEN", raising=False)
+    return fake
+
+
+def deployed_spec(call):
+    return {key: value for key, value in call.items() if key not in PLACEMENT_KWARGS}
+
+
+@pytest.mark.parametrize("scaling", AUTOSCALING)
+def test_deploy_model_preview_matches_deploy_call(fake, scaling):
+    service = DeploymentService("project")
+    preview = service.deploy_model("models/1", machine_type="n1-standard-4", dry_run=True, **scaling)
+    assert fake.deploys == []
+
+    result = service.deploy_model("models/1", machine_type="n1-standard-4", **scaling)
+    (call,) = fake.deploys
+    assert deployed_spec(call) == preview["deploy_spec"] == result["deploy_spec"]
+    assert result["warnings"] == preview["warnings"]
+
+
+@pytest.mark.parametrize("scaling", AUTOSCALING + [{"max_replica_count": 3, "target_accelerator_duty_cycle": 70}])
+def test_deploy_model_vllm_preview_matches_upload_and_deploy_calls(fake, scaling):
+    service = DeploymentService("project")
+    args = dict(model_name="llama", model_id="gs://bucket/llama", service_account="sa@project.iam", **scaling)
+    preview = service.deploy_model_vllm(dry_run=True, **args)
+    assert fake.uploads == [] and fake.deploys == []
+
+    result = service.deploy_model_vllm(**args)
+    (upload,) = fake.uploads
+    (call,) = fake.deploys
+    assert deployed_spec(call) == preview["deploy_spec"] == result["deploy_spec"]
+    assert call["accelerator_type"] == "NVIDIA_L4" and call["service_account"] == "sa@project.iam"
+    assert upload["labels"] == {SERVING_SPEC_LABEL: preview["serving_spec_hash"]}
+    assert {key: value for key, value in upload.items() if key not in ("display_name", "labels")} == preview["model_upload"]
+
+
+def pooled_services(fake, count):
+    """Services standing in for separate API processes that share one bucket."""
+    registry = FakeRegistry(storage=FakeStorageClient())
+    fake.Endpoint.create(POOL_ENDPOINT_DISPLAY_NAME, labels={ENDPOINT_POOL_LABEL: "idle"})
+    return [
+        DeploymentService("project", gcs_service=GcsService("bucket", client_registry=registry))
+        for _ in range(count)
+    ]
+
+
+def test_processes_racing_for_the_last_pool_endpoint_claim_it_once(fake, monkeypatch):
+    first, second = pooled_services(fake, 2)
+    read_json = first.gcs_service.read_json
+    raced = []
+
+    def read_then_lose_the_race(blob_name):
+        result = read_json(blob_name)
+        if not raced:
+            # The other process claims the endpoint between this read and our write
+            raced.append(second.deploy_model("models/2"))
+        return result
+
+    monkeypatch.setattr(first.gcs_service, "read_json", read_then_lose_the_race)
+    result = first.deploy_model("models/1")
+
+    assert raced[0]["endpoint_source"] == "pool"
+    assert result["endpoint_source"] == "created"
+    assert result["endpoint"].name != raced[0]["endpoint"].name
+    assert raced[0]["endpoint"].labels == {ENDPOINT_POOL_LABEL: "in_use"}
+
+
+def test_abandoned_pool_claims_expire(fake):
+    (service,) = pooled_services(fake, 1)
+    service.gcs_service.write_json(
+        POOL_CLAIMS_BLOB, {"claims": {"1": {"claimed_at": time.time() - POOL_CLAIM_TTL - 1, "display_name": "x"}}}, 0
+    )
+    result = service.deploy_model("models/1")
+    assert result["endpoint_source"] == "pool"
+    assert result["endpoint"].name == "1"
+
+
+def test_serving_spec_hash_changes_with_the_hf_token(fake, monkeypatch):
+    service = DeploymentService("project")
+    args = dict(model_name="llama", model_id="gs://bucket/llama", service_account="sa@project.iam")
+    monkeypatch.setenv("HF_TOKEN", "hf_first_token")
+    first = service.deploy_model_vllm(**args)
+    again = service.deploy_model_vllm(**args)
+    monkeypatch.setenv("HF_TOKEN", "hf_rotated_token")
+    preview = service.deploy_model_vllm(dry_run=True, **args)
+    rotated = service.deploy_model_vllm(**args)
+
+    assert not first["model_reused"] and again["model_reused"]
+    # A model serving with the old token is not reused for the new one
+    assert not rotated["model_reused"]
+    assert len(fake.uploads) == 2
+    hashes = [upload["labels"][SERVING_SPEC_LABEL] for upload in fake.uploads]
+    assert hashes[0] != hashes[1]
+    assert preview["serving_spec_hash"] == hashes[1]
+    assert "hf_rotated_token" not in json.dumps(preview)
@@ -0,0 +1,103 @@
+from google.api_core.exceptions import NotFound
+from services.async_service import AsyncService, create_executor
+from services.deployment_watcher import DeploymentWatcher
+import asyncio
+import threading
+
+
+class FakeDeploymentService:
+    """Answers get_deployment_status from ``statuses``; endpoints missing from it are NotFound."""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = 0
+
+    async def get_deployment_status(self, endpoint_id: str) -> dict:
+        self.calls += 1
+        if endpoint_id not in self.statuses:
+            raise NotFound(f"Endpoint {endpoint_id} not found")
+        return self.statuses[endpoint_id]
+
+
+
+def test_deleted_endpoint_is_marked_failed_and_no_longer_polled():
+    async def scenario():
+        service = FakeDeploymentService({})
+        watcher = DeploymentWatcher(service, min_interval=0.01, max_interval=0.01, terminal_ttl=60)
+        watcher.start()
+        try:
+            watcher.track("gone")
+            await asyncio.sleep(0.1)
+            status = watcher.get("gone")
+            assert status["state"] == "FAILED"
+            assert "not found" in status["error"]
+            assert service.calls == 1
+        finally:
+            await watcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_finished_deployments_are_dropped_after_the_ttl():
+    async def scenario():
+        service = FakeDeploymentService({"1": {"state": "DEPLOYED", "deployed_model_ids": ["m1"]}})
+        watcher = DeploymentWatcher(service, min_interval=0.01, terminal_ttl=0.2)
+        watcher.start()
+        try:
+            watcher.track("1")
+            await asyncio.sleep(0.05)
+            assert watcher.get("1")["state"] == "DEPLOYED"
+            await asyncio.sleep(0.3)
+            assert watcher.get("1") is None
+            assert watcher.list() == []
+        finally:
+            await watcher.stop()
+
+    asyncio.run(scenario())
+
+
+class BlockingDeploymentService:
+    """Synchronous service for AsyncService; every endpoint reports a model serving."""
+
+    def get_deployment_status(self, endpoint_id: str) -> dict:
+        return {"state": "DEPLOYED", "deployed_model_ids": [f"m-{endpoint_id}"]}
+
+
+def test_deploy_waits_do_not_hold_the_service_executor():
+    async def scenario():
+        executor = create_executor(2)
+        watcher = DeploymentWatcher(AsyncService(BlockingDeploymentService(), executor), min_interval=0.01)
+        release = threading.Event()
+        watcher.start()
+        try:
+            for endpoint_id in range(8):
+                watcher.track(str(endpoint_id), wait=release.wait)
+            # Eight blocked waits, yet every poll still gets a service thread
+            await asyncio.sleep(0.2)
+            assert all(status["state"] == "DEPLOYED" for status in watcher.list())
+            assert watcher.poll_errors == 0
+        finally:
+            release.set()
+            await watcher.stop()
+            executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_failed_deploy_wait_marks_the_deployment_failed():
+    def wait():
+        raise RuntimeError("Model server never became ready")
+
+    async def scenario():
+        watcher = DeploymentWatcher(FakeDeploymentService({"1": {"state": "NOT_DEPLOYED", "deployed_model_ids": []}}))
+        watcher.start()
+        try:
+            watcher.track("1", wait=wait)
+            await asyncio.sleep(0.05)
+            status = watcher.get("1")
+            assert status["state"] == "FAILED"
+            assert status["error"] == "Model server never became ready"
+        finally:
+            await watcher.stop()
+
+    asyncio.run(scenario())
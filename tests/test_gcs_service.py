@@ -0,0 +1,61 @@
+from services.gcs_service import MAX_COMPOSE_SOURCES, GcsService
+from prometheus_client import REGISTRY
+from tests.fake_storage import FakeRegistry, FakeStorageClient, FakeUploadSession
+import pytest
+
+
+def make_service(**clients):
+    storage_client = FakeStorageClient()
+    service = GcsService("bucket", client_registry=FakeRegistry(storage=storage_client, **clients))
+    return service, storage_client.fake_bucket
+
+
+def upload_parts(bucket, count):
+    names = [f"datasets/big.jsonl.parts/x/{i:05d}" for i in range(count)]
+    for i, name in enumerate(names):
+        bucket.objects[name] = f"{i},".encode()
+    return names
+
+
+def test_compose_deletes_parts_after_success():
+    service, bucket = make_service()
+    parts = upload_parts(bucket, MAX_COMPOSE_SOURCES + 3)
+    service.compose(parts, "datasets/big.jsonl")
+    assert list(bucket.objects) == ["datasets/big.jsonl"]
+    assert bucket.objects["datasets/big.jsonl"] == b"".join(f"{i},".encode() for i in range(len(parts)))
+
+
+def test_compose_deletes_parts_and_intermediates_when_it_fails():
+    service, bucket = make_service()
+    parts = upload_parts(bucket, MAX_COMPOSE_SOURCES + 3)
+    bucket.fail_compose.add("datasets/big.jsonl")
+    with pytest.raises(RuntimeError):
+        service.compose(parts, "datasets/big.jsonl")
+    # The intermediate rounds ran; nothing they or the parts wrote is left behind
+    assert len(bucket.compose_calls) == 3
+    assert bucket.objects == {}
+
+
+def uploaded_bytes() -> float:
+    return REGISTRY.get_sample_value("gcs_bytes_total", {"direction": "upload"}) or 0.0
+
+
+def test_upload_chunk_counts_only_committed_bytes():
+    session = FakeUploadSession(persist_limit=3)
+    service, _ = make_service(upload_session=session)
+    before = uploaded_bytes()
+    committed, complete = service.upload_chunk("https://upload/1", b"0123456789", 0)
+    assert (committed, complete) == (3, False)
+    assert uploaded_bytes() - before == 3
+    # Resending from the committed offset, as stream_resumable does
+    committed, complete = service.upload_chunk("https://upload/1", b"3456789", 3)
+    assert committed == 6
+    assert uploaded_bytes() - before == 6
+    assert service.query_upload_offset("https://upload/1") == (6, False)
+
+
+def test_upload_chunk_finalizes_the_object():
+    session = FakeUploadSession()
+    service, _ = make_service(upload_session=session)
+    assert service.upload_chunk("https://upload/2", b"abc", 0, total_size=3) == (3, True)
+    assert bytes(session.uploads["https://upload/2"]) == b"abc"
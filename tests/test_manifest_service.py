@@ -0,0 +1,55 @@
+from services.async_service import AsyncService, create_executor
+from services.gcs_service import GcsService
+from services.manifest_service import DatasetManifest
+from tests.fake_storage import FakeRegistry, FakeStorageClient
+import asyncio
+import pytest
+
+
+@pytest.fixture
+def gcs_service():
+    executor = create_executor(2)
+    yield AsyncService(GcsService("bucket", client_registry=FakeRegistry(storage=FakeStorageClient())), executor)
+    executor.shutdown()
+
+
+def test_entries_written_by_another_process_show_up_after_the_refresh_interval(gcs_service):
+    async def scenario():
+        writer = DatasetManifest(gcs_service, batch_window=0)
+        reader = DatasetManifest(gcs_service, batch_window=0, refresh_interval=3600)
+        await writer.register("first", {"file_name": "first.jsonl"})
+        before = await reader.get_entries()
+        await writer.register("second", {"file_name": "second.jsonl"})
+        cached = await reader.get_entries()
+        reader.refresh_interval = 0
+        refreshed = await reader.get_entries()
+        return before, cached, refreshed, reader
+
+    before, cached, refreshed, reader = asyncio.run(scenario())
+    assert set(before) == set(cached) == {"first"}
+    assert set(refreshed) == {"first", "second"}
+    assert reader.reloads == 2
+
+
+def test_unchanged_manifest_is_not_downloaded_again(gcs_service):
+    reads = []
+    read_json = gcs_service.service.read_json
+
+    def counting_read_json(blob_name):
+        reads.append(blob_name)
+        return read_json(blob_name)
+
+    gcs_service.service.read_json = counting_read_json
+
+    async def scenario():
+        manifest = DatasetManifest(gcs_service, batch_window=0, refresh_interval=0)
+        await manifest.register("first", {"file_name": "first.jsonl"})
+        for _ in range(3):
+            entries = await manifest.get_entries()
+        return entries, manifest
+
+    entries, manifest = asyncio.run(scenario())
+    assert set(entries) == {"first"}
+    # One read before the first write; every later check only compares generations
+    assert len(reads) == 1
+    assert manifest.reloads == 0
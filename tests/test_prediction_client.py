@@ -0,0 +1,52 @@
+from services.prediction_cache import PredictionCache
+from tests.stub_prediction_server import StubPredictionServer
+import asyncio
+
+
+def test_concurrent_prompts_share_batched_requests():
+    async def scenario():
+        async with StubPredictionServer(delay=0.01) as server:
+            async with server.client(max_batch_size=8, max_batch_delay=0.05) as client:
+                predictions = await client.predict_many([f"p{i}" for i in range(20)], max_tokens=4)
+                assert predictions == [f"echo:p{i}" for i in range(20)]
+                assert sorted(len(batch) for batch in server.batches) == [4, 8, 8]
+                assert sorted(instance["prompt"] for instance in server.instances) == sorted(f"p{i}" for i in range(20))
+                assert all(instance["max_tokens"] == 4 for instance in server.instances)
+                assert client.stats()["requests"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_identical_deterministic_prompts_are_coalesced():
+    async def scenario():
+        async with StubPredictionServer(delay=0.05) as server:
+            async with server.client(max_batch_size=1, cache=PredictionCache()) as client:
+                first = asyncio.ensure_future(client.predict("same", temperature=0))
+                await asyncio.sleep(0.02)
+                # Sent while the first request is still in flight
+                second = await client.predict("same", temperature=0)
+                assert await first == second == "echo:same"
+                # Answered from the cache once the first request has finished
+                assert await client.predict("same", temperature=0) == "echo:same"
+                assert len(server.batches) == 1
+                assert client.stats()["coalesced"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_max_in_flight_bounds_open_requests():
+    async def scenario():
+        async with StubPredictionServer() as server:
+            server.gate.clear()
+            async with server.client(max_batch_size=1, max_in_flight=3) as client:
+                calls = asyncio.ensure_future(client.predict_many([f"p{i}" for i in range(10)]))
+                await asyncio.sleep(0.2)
+                # The rest wait in the client rather than piling onto the endpoint
+                assert server.open == 3
+                assert client.stats()["in_flight"] == 3
+                server.gate.set()
+                assert await calls == [f"echo:p{i}" for i in range(10)]
+                assert server.max_open == 3
+                assert len(server.batches) == 10
+
+    asyncio.run(scenario())
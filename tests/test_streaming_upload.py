@@ -0,0 +1,71 @@
+from services import streaming_upload
+from services.streaming_upload import UploadInterrupted, encode_session_id, stream_parallel_composite, stream_resumable
+import asyncio
+import pytest
+
+
+async def chunks_of(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+class StalledSession:
+    """upload_chunk that accepts the first ``accept`` bytes and then never moves."""
+
+    def __init__(self, accept: int):
+        self.accept = accept
+        self.calls = 0
+
+    async def upload_chunk(self, session_url, data, offset, total_size=None):
+        self.calls += 1
+        return min(offset + len(data), self.accept), False
+
+
+def test_resumable_upload_stops_when_gcs_stops_committing():
+    session = StalledSession(accept=4)
+
+    async def scenario():
+        return await stream_resumable(session, chunks_of(b"0123456789"), encode_session_id("https://upload/1", "x"))
+
+    with pytest.raises(UploadInterrupted) as raised:
+        asyncio.run(scenario())
+    assert raised.value.offset == 4
+    assert "no progress" in str(raised.value)
+    assert session.calls == 2
+
+
+class PartStore:
+    """upload_bytes that writes slowly on a thread; part 1 fails straight away."""
+
+    def __init__(self):
+        self.objects = {}
+        self.deleted = []
+
+    def _write(self, data, name):
+        import time
+        time.sleep(0.1)
+        self.objects[name] = data
+
+    async def upload_bytes(self, data, name):
+        if name.endswith("/00001"):
+            raise RuntimeError("part upload failed")
+        await asyncio.get_running_loop().run_in_executor(None, self._write, data, name)
+
+    async def delete_blobs(self, names):
+        self.deleted.extend(names)
+        for name in names:
+            self.objects.pop(name, None)
+
+
+def test_failed_composite_upload_leaves_no_parts_behind(monkeypatch):
+    monkeypatch.setattr(streaming_upload, "COMPOSITE_PART_SIZE", 4)
+    store = PartStore()
+
+    async def scenario():
+        await stream_parallel_composite(store, chunks_of(b"aaaabbbbcccc"), "datasets/big.jsonl")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
+    # Part 0 was still being written when part 1 failed; it must not outlive the cleanup
+    assert store.objects == {}
+    assert "datasets/big.jsonl.parts" in store.deleted[0]
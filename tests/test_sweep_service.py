@@ -0,0 +1,201 @@
+from schemas import GenerateConfigSchema, SweepRange, SweepSchema, TrainingConfig
+from services.async_service import AsyncService, create_executor
+from services.gcs_service import GcsService
+from services.sweep_service import SweepService, expand_search_space, should_stop
+from services.training_queue import TrainingQueue
+from tests.fake_storage import FakeRegistry, FakeStorageClient
+import asyncio
+import json
+import pytest
+
+BASE = GenerateConfigSchema(
+    dataset_dir="datasets",
+    model_name_or_path="meta-llama/Meta-Llama-3-8B-Instruct",
+    output_dir="saves/sweep",
+    dataset="alpaca_en_demo",
+    training_config=TrainingConfig(
+        learning_rate=1e-4, template="llama3", stage="sft", do_train=True, finetuning_type="lora",
+        lora_target="all", per_device_train_batch_size=1, gradient_accumulation_steps=8, num_train_epochs=1.0,
+        lr_scheduler_type="cosine", warmup_ratio=0.1, bf16=True, ddp_timeout=180000000, val_size=0.1,
+        per_device_eval_batch_size=1, eval_strategy="steps", eval_steps=100,
+    ),
+)
+
+
+class FakeTrainingService:
+    """Async stand-in for the wrapped TrainingService the queue and sweeps call."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.cancelled = []
+
+    async def run(self, func, *args):
+        return func(*args)
+
+    async def start_training_job(self, config_gcs_url, machine_spec, node_count, labels):
+        job_id = f"job-{len(self.jobs) + 1}"
+        self.jobs[job_id] = config_gcs_url
+        return job_id
+
+    async def find_training_job(self, label, value):
+        return None
+
+    async def cancel_training_job(self, job_id):
+        self.cancelled.append(job_id)
+
+
+class FakeStatusCache:
+    def __init__(self):
+        self.states = {}
+        self.failures = 0
+
+    async def get_many(self, job_ids):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("status lookup failed")
+        return [{"job_id": job_id, "state": self.states.get(job_id, "RUNNING"), "error": None} for job_id in job_ids]
+
+
+@pytest.fixture
+def sweeps(tmp_path):
+    storage_client = FakeStorageClient()
+    executor = create_executor(2)
+    gcs_service = AsyncService(GcsService("bucket", client_registry=FakeRegistry(storage=storage_client)), executor)
+    training_service = FakeTrainingService()
+    status_cache = FakeStatusCache()
+    queue = TrainingQueue(
+        training_service, status_cache, db_path=str(tmp_path / "queue.db"), default_team_limit=16
+    )
+    service = SweepService(gcs_service, training_service, queue, status_cache, poll_interval=3600)
+    yield service, storage_client.fake_bucket, training_service, status_cache
+    queue.close()
+    executor.shutdown()
+
+
+async def start(service: SweepService, **options) -> dict:
+    """Creates a sweep and stops its background loop, so the test drives each tick."""
+    record = await service.create(SweepSchema(base=BASE, **options))
+    task = service._tasks.pop(record["sweep_id"])
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return record
+
+
+def test_grid_points_are_each_combined_with_random_draws():
+    ranges = {"learning_rate": SweepRange(min=1e-5, max=1e-3, log=True), "lora_target": SweepRange(values=["all", "q_proj"])}
+
+    trials = expand_search_space({"num_train_epochs": [1.0, 2.0]}, ranges, num_trials=3, seed=7)
+
+    assert len(trials) == 6
+    assert [trial["num_train_epochs"] for trial in trials] == [1.0] * 3 + [2.0] * 3
+    assert all(1e-5 <= trial["learning_rate"] <= 1e-3 for trial in trials)
+    assert {trial["lora_target"] for trial in trials} <= {"all", "q_proj"}
+    # The same seed draws the same trials
+    assert expand_search_space({"num_train_epochs": [1.0, 2.0]}, ranges, num_trials=3, seed=7) == trials
+
+
+def test_grid_without_ranges_is_the_cartesian_product():
+    trials = expand_search_space({"a": [1, 2], "b": ["x", "y", "z"]}, {}, num_trials=5, seed=0)
+
+    assert len(trials) == 6
+    assert {(trial["a"], trial["b"]) for trial in trials} == {(a, b) for a in (1, 2) for b in "xyz"}
+
+
+def test_median_stopping_rule():
+    peers = [[(100, 0.5), (200, 0.4)], [(100, 0.6), (200, 0.5)], [(300, 0.1)]]
+
+    # Best 0.9 is worse than the median running average (0.5) of the peers evaluated by step 200
+    assert should_stop([(100, 1.0), (200, 0.9)], peers, min_evals=2, min_peers=2)
+    assert not should_stop([(100, 0.5), (200, 0.3)], peers, min_evals=2, min_peers=2)
+    # Too few evaluations of its own, or too few peers evaluated by then
+    assert not should_stop([(200, 0.9)], peers, min_evals=2, min_peers=2)
+    assert not should_stop([(100, 1.0), (200, 0.9)], peers, min_evals=2, min_peers=3)
+
+
+def test_trial_behind_its_peers_is_stopped_early(sweeps):
+    service, bucket, training_service, _ = sweeps
+
+    sweep = SweepSchema(base=BASE, grid={"learning_rate": [1e-5, 1e-4, 1e-3]}, max_parallel=3)
+
+    async def scenario():
+        record = await start(service, grid={"learning_rate": [1e-5, 1e-4, 1e-3]}, max_parallel=3)
+        await service._tick(record, sweep)
+        await service.training_queue._admit()
+        for trial, losses in zip(record["trials"], ([0.5, 0.4], [0.6, 0.5], [1.0, 0.9])):
+            log = "".join(
+                json.dumps({"current_steps": 100 * (step + 1), "eval_loss": loss}) + "\n"
+                for step, loss in enumerate(losses)
+            )
+            bucket.blob(f"sweeps/{record['sweep_id']}/trial-{trial['trial']:03d}/trainer_log.jsonl").upload_from_string(log)
+        await service._tick(record, sweep)
+        return record
+
+    record = asyncio.run(scenario())
+
+    assert [trial["state"] for trial in record["trials"]] == ["RUNNING", "RUNNING", "STOPPED_EARLY"]
+    assert training_service.cancelled == [record["trials"][2]["job_id"]]
+    assert record["best_trial"] == 0
+
+
+def test_resubmitting_trials_reuses_their_queue_entries(sweeps):
+    service, _, training_service, _ = sweeps
+    sweep = SweepSchema(base=BASE, grid={"learning_rate": [1e-5, 1e-4]})
+
+    async def scenario():
+        record = await start(service, grid={"learning_rate": [1e-5, 1e-4]})
+        await service._submit(record, sweep)
+        first = [trial["queue_id"] for trial in record["trials"]]
+        # As after a restart that lost the in-memory trial states
+        for trial in record["trials"]:
+            trial.update(state="WAITING", queue_id=None)
+        await service._submit(record, sweep)
+        await service.training_queue._admit()
+        return record, first
+
+    record, first = asyncio.run(scenario())
+
+    assert [trial["queue_id"] for trial in record["trials"]] == first
+    assert service.training_queue.deduplicated == 2
+    assert len(training_service.jobs) == 2
+
+
+def test_failed_tick_is_retried_instead_of_failing_the_sweep(sweeps):
+    service, _, _, status_cache = sweeps
+    sweep = SweepSchema(base=BASE, grid={"learning_rate": [1e-5, 1e-4]})
+
+    async def scenario():
+        record = await start(service, grid={"learning_rate": [1e-5, 1e-4]})
+        await service._submit(record, sweep)
+        await service.training_queue._admit()
+        for trial in record["trials"]:
+            status_cache.states[(await service.training_queue.get(trial["queue_id"]))["job_id"]] = "SUCCEEDED"
+        status_cache.failures = 1
+        service.poll_interval = 0
+        await service._run(record, sweep)
+        return record
+
+    record = asyncio.run(scenario())
+
+    assert service.tick_errors == 1
+    assert record["state"] == "SUCCEEDED"
+    assert {trial["state"] for trial in record["trials"]} == {"SUCCEEDED"}
+
+
+def test_non_retryable_error_fails_the_sweep(sweeps):
+    service, _, _, _ = sweeps
+    sweep = SweepSchema(base=BASE, grid={"learning_rate": [1e-5, 1e-4]})
+
+    async def scenario():
+        record = await start(service, grid={"learning_rate": [1e-5, 1e-4]})
+        # The first trial's Idempotency-Key is already taken by a different config
+        await service.training_queue.enqueue(
+            "gs://bucket/other.yaml", idempotency_key=f"{record['sweep_id']}-trial-000"
+        )
+        await service._run(record, sweep)
+        return record
+
+    record = asyncio.run(scenario())
+
+    assert record["state"] == "FAILED"
+    assert "Idempotency-Key" in record["error"]
+    assert service.tick_errors == 0
@@ -0,0 +1,119 @@
+from google.api_core.exceptions import DeadlineExceeded
+from services.training_queue import QUEUE_ENTRY_LABEL, TrainingQueue
+import asyncio
+
+
+class FakeTrainingService:
+    """Async stand-in for the wrapped TrainingService; the first create times out after succeeding."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.creates = 0
+        self.fail_next_create = True
+
+    async def run(self, func, *args):
+        return func(*args)
+
+    async def start_training_job(self, config_gcs_url, machine_spec, node_count, labels):
+        self.creates += 1
+        job_id = f"job-{self.creates}"
+        self.jobs[job_id] = labels
+        if self.fail_next_create:
+            self.fail_next_create = False
+            raise DeadlineExceeded("create timed out")
+        return job_id
+
+    async def find_training_job(self, label, value):
+        for job_id, labels in self.jobs.items():
+            if labels.get(label) == value:
+                return job_id
+        return None
+
+
+class FakeStatusCache:
+    async def get_many(self, job_ids):
+        return [{"job_id": job_id, "state": "RUNNING", "error": None} for job_id in job_ids]
+
+
+def test_transient_create_error_adopts_job_instead_of_resubmitting(tmp_path):
+    async def scenario():
+        service = FakeTrainingService()
+        queue = TrainingQueue(service, FakeStatusCache(), db_path=str(tmp_path / "queue.db"))
+        entry = await queue.enqueue("gs://bucket/training_configs/a.yaml")
+        await queue._admit()
+        assert (await queue.get(entry["queue_id"]))["state"] == "QUEUED"
+        await queue._admit()
+        state = await queue.get(entry["queue_id"])
+        queue.close()
+        return service, entry, state
+
+    service, entry, state = asyncio.run(scenario())
+    # The job the timed-out create made is adopted, not created a second time
+    assert service.creates == 1
+    assert service.jobs["job-1"] == {QUEUE_ENTRY_LABEL: entry["queue_id"]}
+    assert state["state"] == "SUBMITTED"
+    assert state["job_id"] == "job-1"
+
+
+def test_transient_create_error_resubmits_when_no_job_exists(tmp_path):
+    async def scenario():
+        service = FakeTrainingService()
+        original = service.start_training_job
+
+        async def create_without_job(*args, **kwargs):
+            if service.fail_next_create:
+                service.fail_next_create = False
+                raise DeadlineExceeded("create timed out")
+            return await original(*args, **kwargs)
+
+        service.start_training_job = create_without_job
+        queue = TrainingQueue(service, FakeStatusCache(), db_path=str(tmp_path / "queue.db"))
+        entry = await queue.enqueue("gs://bucket/training_configs/a.yaml")
+        await queue._admit()
+        await queue._admit()
+        state = await queue.get(entry["queue_id"])
+        queue.close()
+        return service, state
+
+    service, state = asyncio.run(scenario())
+    assert service.creates == 1
+    assert state["state"] == "SUBMITTED"
+    assert state["job_id"] == "job-1"
+    assert state["attempts"] == 2
+
+
+def test_failed_recovery_is_retried_on_the_next_tick(tmp_path):
+    async def scenario():
+        service = FakeTrainingService()
+        service.fail_next_create = False
+        queue = TrainingQueue(service, FakeStatusCache(), db_path=str(tmp_path / "queue.db"))
+        entry = await queue.enqueue("gs://bucket/training_configs/a.yaml")
+        # A previous process created the job and crashed before recording it
+        service.jobs["job-1"] = {QUEUE_ENTRY_LABEL: entry["queue_id"]}
+        await queue._set(entry["queue_id"], state="SUBMITTING", attempts=1)
+        original = service.find_training_job
+        lookups = []
+
+        async def unavailable_once(label, value):
+            lookups.append(value)
+            if len(lookups) == 1:
+                raise DeadlineExceeded("list timed out")
+            return await original(label, value)
+
+        service.find_training_job = unavailable_once
+        await queue._tick()
+        after_failure = await queue.get(entry["queue_id"])
+        await queue._tick()
+        recovered = await queue.get(entry["queue_id"])
+        await queue._tick()
+        queue.close()
+        return service, queue, lookups, after_failure, recovered
+
+    service, queue, lookups, after_failure, recovered = asyncio.run(scenario())
+    assert after_failure["state"] == "SUBMITTING"
+    assert queue.loop_errors == 1
+    assert recovered["state"] == "SUBMITTED"
+    assert recovered["job_id"] == "job-1"
+    # Recovery runs until it succeeds and not after; nothing was created again
+    assert len(lookups) == 2
+    assert service.creates == 0
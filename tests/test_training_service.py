@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+from services.training_service import DEFAULT_MACHINE_SPEC, MASTER_PORT, TrainingService
+from tests.fake_storage import FakeRegistry
+from types import SimpleNamespace
+import pytest
+import re
+
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeJobServiceClient:
+    """Records the custom jobs it is asked to create; lists them applying create_time filters.
+
+    Job N is created N minutes after EPOCH.
+    """
+
+    def __init__(self):
+        self.created = []
+        self.jobs = []
+        self.list_filters = []
+        self.gets = []
+
+    def _job(self, parent, custom_job):
+        number = len(self.jobs) + 1
+        job = SimpleNamespace(
+            name=f"{parent}/customJobs/{number}",
+            display_name=custom_job["display_name"],
+            create_time=EPOCH + timedelta(minutes=number),
+            state=SimpleNamespace(name="JOB_STATE_RUNNING"),
+        )
+        self.jobs.append(job)
+        return job
+
+    def create_custom_job(self, parent, custom_job):
+        self.created.append(custom_job)
+        return self._job(parent, custom_job)
+
+    def list_custom_jobs(self, request):
+        self.list_filters.append(request["filter"])
+        since = re.search(r'create_time>="([^"]+)"', request["filter"])
+        since = datetime.strptime(since.group(1), "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc) if since else None
+        return [job for job in self.jobs if since is None or job.create_time >= since]
+
+    def custom_job_path(self, project, location, custom_job):
+        return f"projects/{project}/locations/{location}/customJobs/{custom_job}"
+
+    def get_custom_job(self, name):
+        self.gets.append(name.split("/")[-1])
+        return next(job for job in self.jobs if job.name == name)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("GCS_BUCKET_NAME", "bucket")
+    client = FakeJobServiceClient()
+    service = TrainingService(
+        "project",
+        model_image_uri="us-docker.pkg.dev/{PROJECT_ID}/llamafactory:latest",
+        hf_token="hf-token",
+        client_registry=FakeRegistry(job=client),
+    )
+    return service, client
+
+
+def env_of(pool):
+    return {var["name"]: var["value"] for var in pool["container_spec"]["env"]}
+
+
+def test_single_node_job_has_one_pool(service):
+    service, client = service
+    assert service.start_training_job("gs://bucket/configs/run.yaml") == "1"
+    (pool,) = client.created[0]["job_spec"]["worker_pool_specs"]
+    assert pool["replica_count"] == 1
+    assert pool["machine_spec"]["machine_type"] == DEFAULT_MACHINE_SPEC["machine_type"]
+    assert pool["container_spec"]["image_uri"] == "us-docker.pkg.dev/project/llamafactory:latest"
+    assert pool["container_spec"]["command"] == [
+        "bash", "-c", "/usr/local/bin/llamafactory-cli train /gcs/bucket/configs/run.yaml"
+    ]
+    env = env_of(pool)
+    assert env["WORLD_SIZE"] == "1"
+    assert "FORCE_TORCHRUN" not in env
+
+
+@pytest.mark.parametrize("node_count", [2, 4])
+def test_multi_node_job_adds_a_worker_pool(service, node_count):
+    service, client = service
+    machine_spec = {"machine_type": "a3-highgpu-8g", "accelerator_type": "NVIDIA_H100_80GB", "accelerator_count": 8}
+    service.start_training_job("gs://bucket/configs/run.yaml", machine_spec, node_count=node_count)
+    chief, workers = client.created[0]["job_spec"]["worker_pool_specs"]
+    assert chief["replica_count"] == 1
+    assert workers["replica_count"] == node_count - 1
+    # Both pools run the same container on the same machines so torchrun ranks line up
+    assert workers["machine_spec"] == chief["machine_spec"]
+    assert workers["container_spec"] == chief["container_spec"]
+    assert chief["machine_spec"]["accelerator_count"] == 8
+    env = env_of(chief)
+    assert env["FORCE_TORCHRUN"] == "1"
+    assert env["NNODES"] == str(node_count)
+    assert env["NPROC_PER_NODE"] == "8"
+    assert env["MASTER_PORT"] == str(MASTER_PORT)
+    assert "WORLD_SIZE" not in env
+    assert "CLUSTER_SPEC" in chief["container_spec"]["command"][-1]
+
+
+def test_batched_statuses_list_only_jobs_since_the_oldest_requested(service):
+    service, client = service
+    for _ in range(5):
+        service.start_training_job("gs://bucket/configs/run.yaml")
+    statuses = service.get_training_job_statuses(["4", "5"])
+
+    assert {job_id: status["state"] for job_id, status in statuses.items()} == {"4": "RUNNING", "5": "RUNNING"}
+    assert client.list_filters == ['display_name="llm-training-job" AND create_time>="2026-01-01T00:04:00Z"']
+    assert client.gets == []
+
+
+def test_unseen_jobs_are_found_with_one_list_call(service):
+    service, client = service
+    parent = "projects/project/locations/us-central1"
+    # Submitted by another process, so this service has no create time for them
+    for _ in range(3):
+        client._job(parent, {"display_name": "llm-training-job"})
+
+    service.get_training_job_statuses(["2", "3"])
+    assert client.list_filters == ['display_name="llm-training-job"'] and client.gets == []
+
+    # Seen now, so the next list is bounded by their create time
+    service.get_training_job_statuses(["2", "3"])
+    assert client.list_filters[-1] == 'display_name="llm-training-job" AND create_time>="2026-01-01T00:02:00Z"'
+    assert client.gets == []
+
+
+def test_missing_jobs_are_reported_not_found(service):
+    service, client = service
+    service.start_training_job("gs://bucket/configs/run.yaml")
+
+    statuses = service.get_training_job_statuses(["1", "404"])
+
+    assert statuses["1"]["state"] == "RUNNING"
+    assert statuses["404"] == {"job_id": "404", "state": "NOT_FOUND", "error": "Training job not found: 404"}
+    assert len(client.list_filters) == 1 and client.gets == []
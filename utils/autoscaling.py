@@ -0,0 +1,54 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+# Target Vertex AI uses when autoscaling is on but no target is given
+DEFAULT_TARGET_UTILIZATION = 60
+
+
+def autoscaling_spec(
+    min_replica_count: int = 1,
+    max_replica_count: Optional[int] = None,
+    target_accelerator_duty_cycle: Optional[int] = None,
+    target_cpu_utilization: Optional[int] = None,
+    target_request_count_per_minute: Optional[int] = None,
+    has_accelerator: bool = False,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """``Model.deploy`` replica and autoscaling arguments, with warnings about ignored settings.
+
+    Replicas scale between ``min_replica_count`` and ``max_replica_count`` (default:
+    fixed at the minimum) to hold the given targets. When the range allows scaling but
+    no target is set, GPU deployments scale on accelerator duty cycle and CPU-only ones
+    on CPU utilization, both at Vertex AI's default of 60%. Raises ValueError for
+    settings Vertex AI would reject.
+    """
+    if min_replica_count < 1:
+        # Scale-to-zero is only offered by the v1beta1 API, which this SDK's deploy does not use
+        raise ValueError("min_replica_count must be at least 1; Vertex AI v1 deployments cannot scale to zero")
+    max_replica_count = max_replica_count or min_replica_count
+    if max_replica_count < min_replica_count:
+        raise ValueError(f"max_replica_count ({max_replica_count}) is below min_replica_count ({min_replica_count})")
+    for name, value in (
+        ("target_accelerator_duty_cycle", target_accelerator_duty_cycle),
+        ("target_cpu_utilization", target_cpu_utilization),
+    ):
+        if value is not None and not 1 <= value <= 100:
+            raise ValueError(f"{name} must be a percentage between 1 and 100, got {value}")
+    if target_accelerator_duty_cycle is not None and not has_accelerator:
+        raise ValueError("target_accelerator_duty_cycle needs a deployment with accelerators")
+
+    spec: Dict[str, Any] = {"min_replica_count": min_replica_count, "max_replica_count": max_replica_count}
+    warnings = []
+    targets = {
+        "autoscaling_target_accelerator_duty_cycle": target_accelerator_duty_cycle,
+        "autoscaling_target_cpu_utilization": target_cpu_utilization,
+        "autoscaling_target_request_count_per_minute": target_request_count_per_minute,
+    }
+    targets = {key: value for key, value in targets.items() if value is not None}
+    if max_replica_count == min_replica_count:
+        if targets:
+            warnings.append("Autoscaling targets are ignored while min_replica_count equals max_replica_count")
+        return spec, warnings
+    if not targets:
+        key = "autoscaling_target_accelerator_duty_cycle" if has_accelerator else "autoscaling_target_cpu_utilization"
+        targets = {key: DEFAULT_TARGET_UTILIZATION}
+    spec.update(targets)
+    return spec, warnings
@@ -1,13 +1,17 @@
 import yaml
 from schemas import TrainingConfig
 
-def generate_training_config(dataset_dir: str, model_name_or_path: str,  output_dir: str,dataset:str, training_config: TrainingConfig) -> str:
+def generate_training_config(dataset_dir: str, model_name_or_path: str,  output_dir: str,dataset:str, training_config: TrainingConfig, eval_dataset: str = None) -> str:
     """Generates a training configuration YAML for llama-factory."""
     config = {
         "dataset_dir": dataset_dir,
         "model_name_or_path": model_name_or_path,
          "output_dir": output_dir,
          "dataset" : dataset,
-        **training_config.model_dump(),  # Use model_dump() to unpack the training config
+        **training_config.model_dump(exclude_none=True),  # Use model_dump() to unpack the training config
     }
+    if eval_dataset:
+        # A prepared validation split replaces the random val_size split
+        config["eval_dataset"] = eval_dataset
+        config.pop("val_size", None)
     return yaml.dump(config)
\ No newline at end of file
@@ -0,0 +1,33 @@
+import base64
+import hashlib
+import google_crc32c
+
+
+class ContentHasher:
+    """Computes the content address (sha256) and GCS checksums of a byte stream in one pass."""
+
+    def __init__(self):
+        self._sha256 = hashlib.sha256()
+        self._md5 = hashlib.md5()
+        self._crc32c = google_crc32c.Checksum()
+        self.size = 0
+
+    def feed(self, data: bytes):
+        self._sha256.update(data)
+        self._md5.update(data)
+        self._crc32c.update(data)
+        self.size += len(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def md5(self) -> str:
+        """Base64 MD5, as reported by ``Blob.md5_hash``."""
+        return base64.b64encode(self._md5.digest()).decode()
+
+    @property
+    def crc32c(self) -> str:
+        """Base64 big-endian CRC32C, as reported by ``Blob.crc32c``."""
+        return base64.b64encode(self._crc32c.digest()).decode()
@@ -0,0 +1,43 @@
+from typing import Optional, Tuple
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header does not overlap the object."""
+
+
+def make_etag(generation: int, crc32c: Optional[str]) -> str:
+    """Builds a strong ETag from the object generation and its crc32c checksum."""
+    return f'"{generation}-{crc32c or ""}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Checks an If-None-Match header against an ETag (weak comparison, as RFC 9110 asks)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parses a single ``bytes=`` range into inclusive (start, end) offsets.
+
+    Returns None when the header is absent or not a single byte range, in which case
+    the whole object is served.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if not start_text:
+            # Suffix range: the last N bytes
+            suffix = int(end_text)
+            if suffix == 0:
+                raise RangeNotSatisfiable(range_header)
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(range_header)
+    return start, min(end, size - 1)
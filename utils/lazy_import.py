@@ -0,0 +1,95 @@
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Every lazy module created, by name, so they can be pre-warmed together
+_lazy_modules: Dict[str, "LazyModule"] = {}
+_registry_lock = threading.Lock()
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    The Google Cloud SDKs take seconds to import, which every worker spawn and
+    cold start would otherwise pay before serving /health. Call sites keep using
+    ``aiplatform.Model`` as before; only the first access pays for the import.
+    Attribute writes go to the real module, so ``mock.patch`` behaves as usual.
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "import_seconds", None)
+
+    def _load(self) -> ModuleType:
+        module = self._module
+        if module is None:
+            started = time.perf_counter()
+            # The import lock makes concurrent first accesses wait for one import
+            module = importlib.import_module(self._name)
+            if self._module is None:
+                object.__setattr__(self, "import_seconds", time.perf_counter() - started)
+                object.__setattr__(self, "_module", module)
+                logger.debug(
+                    "Imported module lazily",
+                    extra={"module": self._name, "seconds": round(self.import_seconds, 3)},
+                )
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr: str):
+        delattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Returns a proxy for ``name`` that is imported the first time it is used."""
+    with _registry_lock:
+        module = _lazy_modules.get(name)
+        if module is None:
+            module = _lazy_modules[name] = LazyModule(name)
+        return module
+
+
+def prewarm(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Imports lazy modules now, e.g. from a background thread after startup.
+
+    Returns the seconds each import took; modules that were already loaded are
+    skipped.
+    """
+    timings = {}
+    for name in list(names or _lazy_modules):
+        module = lazy_import(name)
+        if not module.loaded:
+            module._load()
+            timings[name] = round(module.import_seconds, 3)
+    return timings
+
+
+def import_status() -> List[dict]:
+    """Which lazy modules have been imported and how long each took."""
+    return [
+        {
+            "module": name,
+            "loaded": module.loaded,
+            "import_seconds": round(module.import_seconds, 3) if module.loaded else None,
+        }
+        for name, module in sorted(_lazy_modules.items())
+    ]
@@ -0,0 +1,97 @@
+from typing import Any, Iterable
+import hashlib
+import json
+import logging
+import re
+import sys
+import time
+
+# Keys whose values are never logged or returned as-is
+SECRET_KEY_PATTERN = re.compile(r"token|secret|password|passwd|api[_-]?key|credential|authorization", re.IGNORECASE)
+REDACTED = "***"
+# Attributes every LogRecord has; anything else was passed through ``extra`` and is logged as a field
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+_secret_values: set = set()
+
+
+def register_secrets(values: Iterable[Any]):
+    """Adds literal values, e.g. HF_TOKEN, that are masked wherever they appear in a log line."""
+    _secret_values.update(str(value) for value in values if value and len(str(value)) >= 4)
+
+
+def _is_secret(key: Any, value: Any) -> bool:
+    # Only strings can hold a secret; flags such as hf_token_set stay readable
+    return isinstance(value, str) and bool(value) and SECRET_KEY_PATTERN.search(str(key)) is not None
+
+
+def _scrub(text: str) -> str:
+    for secret in _secret_values:
+        if secret in text:
+            text = text.replace(secret, REDACTED)
+    return text
+
+
+def redact(value: Any) -> Any:
+    """Copy of ``value`` with secret-looking keys and registered secret values masked."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if _is_secret(key, item) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return _scrub(value)
+    return value
+
+
+def digest_secrets(value: Any) -> Any:
+    """Like ``redact``, but each secret becomes its sha256 digest instead of ``***``.
+
+    For hashing a value that holds secrets: the result changes when a secret does,
+    without the secret itself appearing in it.
+    """
+    if isinstance(value, dict):
+        return {
+            key: _digest(item) if _is_secret(key, item) else digest_secrets(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [digest_secrets(item) for item in value]
+    if isinstance(value, str):
+        for secret in _secret_values:
+            if secret in value:
+                value = value.replace(secret, _digest(secret))
+        return value
+    return value
+
+
+def _digest(secret: str) -> str:
+    return "sha256:" + hashlib.sha256(secret.encode()).hexdigest()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any ``extra`` fields, redacted."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": _scrub(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = REDACTED if _is_secret(key, value) else redact(value)
+        if record.exc_info:
+            entry["exception"] = _scrub(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = "INFO"):
+    """Sends application logs to stderr as redacted JSON lines."""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper())
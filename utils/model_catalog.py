@@ -0,0 +1,99 @@
+from typing import Any, Dict, List, Optional
+import re
+
+# Static model and hardware facts for sizing training and serving jobs, kept local so
+# planning never needs network access.
+
+# Architectures keyed by the substring that identifies them in a lower-cased model name or path
+MODEL_ARCHITECTURES: Dict[str, Dict[str, Any]] = {
+    "llama-3.2-1b": {"params_b": 1.24, "hidden_size": 2048, "num_layers": 16, "num_attention_heads": 32, "num_kv_heads": 8, "vocab_size": 128256, "max_position_embeddings": 131072},
+    "llama-3.2-3b": {"params_b": 3.21, "hidden_size": 3072, "num_layers": 28, "num_attention_heads": 24, "num_kv_heads": 8, "vocab_size": 128256, "max_position_embeddings": 131072},
+    "llama-3.1-8b": {"params_b": 8.03, "hidden_size": 4096, "num_layers": 32, "num_attention_heads": 32, "num_kv_heads": 8, "vocab_size": 128256, "max_position_embeddings": 131072},
+    "llama-3.1-70b": {"params_b": 70.6, "hidden_size": 8192, "num_layers": 80, "num_attention_heads": 64, "num_kv_heads": 8, "vocab_size": 128256, "max_position_embeddings": 131072},
+    "llama-3-8b": {"params_b": 8.03, "hidden_size": 4096, "num_layers": 32, "num_attention_heads": 32, "num_kv_heads": 8, "vocab_size": 128256, "max_position_embeddings": 8192},
+    "llama-3-70b": {"params_b": 70.6, "hidden_size": 8192, "num_layers": 80, "num_attention_heads": 64, "num_kv_heads": 8, "vocab_size": 128256, "max_position_embeddings": 8192},
+    "llama-2-7b": {"params_b": 6.74, "hidden_size": 4096, "num_layers": 32, "num_attention_heads": 32, "num_kv_heads": 32, "vocab_size": 32000, "max_position_embeddings": 4096},
+    "llama-2-13b": {"params_b": 13.0, "hidden_size": 5120, "num_layers": 40, "num_attention_heads": 40, "num_kv_heads": 40, "vocab_size": 32000, "max_position_embeddings": 4096},
+    "mistral-7b": {"params_b": 7.24, "hidden_size": 4096, "num_layers": 32, "num_attention_heads": 32, "num_kv_heads": 8, "vocab_size": 32768, "max_position_embeddings": 32768},
+    "mixtral-8x7b": {"params_b": 46.7, "hidden_size": 4096, "num_layers": 32, "num_attention_heads": 32, "num_kv_heads": 8, "vocab_size": 32000, "max_position_embeddings": 32768, "active_params_b": 12.9},
+    "qwen2.5-0.5b": {"params_b": 0.49, "hidden_size": 896, "num_layers": 24, "num_attention_heads": 14, "num_kv_heads": 2, "vocab_size": 151936, "max_position_embeddings": 32768},
+    "qwen2.5-1.5b": {"params_b": 1.54, "hidden_size": 1536, "num_layers": 28, "num_attention_heads": 12, "num_kv_heads": 2, "vocab_size": 151936, "max_position_embeddings": 32768},
+    "qwen2.5-3b": {"params_b": 3.09, "hidden_size": 2048, "num_layers": 36, "num_attention_heads": 16, "num_kv_heads": 2, "vocab_size": 151936, "max_position_embeddings": 32768},
+    "qwen2.5-7b": {"params_b": 7.62, "hidden_size": 3584, "num_layers": 28, "num_attention_heads": 28, "num_kv_heads": 4, "vocab_size": 152064, "max_position_embeddings": 32768},
+    "qwen2.5-14b": {"params_b": 14.8, "hidden_size": 5120, "num_layers": 48, "num_attention_heads": 40, "num_kv_heads": 8, "vocab_size": 152064, "max_position_embeddings": 32768},
+    "qwen2.5-32b": {"params_b": 32.8, "hidden_size": 5120, "num_layers": 64, "num_attention_heads": 40, "num_kv_heads": 8, "vocab_size": 152064, "max_position_embeddings": 32768},
+    "qwen2.5-72b": {"params_b": 72.7, "hidden_size": 8192, "num_layers": 80, "num_attention_heads": 64, "num_kv_heads": 8, "vocab_size": 152064, "max_position_embeddings": 32768},
+    "gemma-2-2b": {"params_b": 2.61, "hidden_size": 2304, "num_layers": 26, "num_attention_heads": 8, "num_kv_heads": 4, "vocab_size": 256000, "max_position_embeddings": 8192},
+    "gemma-2-9b": {"params_b": 9.24, "hidden_size": 3584, "num_layers": 42, "num_attention_heads": 16, "num_kv_heads": 8, "vocab_size": 256000, "max_position_embeddings": 8192},
+    "gemma-2-27b": {"params_b": 27.2, "hidden_size": 4608, "num_layers": 46, "num_attention_heads": 32, "num_kv_heads": 16, "vocab_size": 256000, "max_position_embeddings": 8192},
+    "phi-3-mini": {"params_b": 3.82, "hidden_size": 3072, "num_layers": 32, "num_attention_heads": 32, "num_kv_heads": 32, "vocab_size": 32064, "max_position_embeddings": 4096},
+}
+
+# Per-GPU facts: memory, dense bf16/fp16 tensor throughput, and native bf16 support
+ACCELERATORS: Dict[str, Dict[str, Any]] = {
+    "NVIDIA_TESLA_T4": {"memory_gb": 16, "tflops": 65, "bf16": False},
+    "NVIDIA_TESLA_V100": {"memory_gb": 16, "tflops": 125, "bf16": False},
+    "NVIDIA_L4": {"memory_gb": 24, "tflops": 121, "bf16": True},
+    "NVIDIA_TESLA_A100": {"memory_gb": 40, "tflops": 312, "bf16": True},
+    "NVIDIA_A100_80GB": {"memory_gb": 80, "tflops": 312, "bf16": True},
+    "NVIDIA_H100_80GB": {"memory_gb": 80, "tflops": 989, "bf16": True},
+}
+
+# Machine shapes Vertex AI accepts, with approximate on-demand us-central1 prices (machine + GPUs,
+# USD/hour) and host RAM
+MACHINE_TYPES: List[Dict[str, Any]] = [
+    {"machine_type": "n1-standard-8", "accelerator_type": "NVIDIA_TESLA_T4", "accelerator_count": 1, "hourly_usd": 0.73, "host_memory_gb": 30},
+    {"machine_type": "n1-standard-16", "accelerator_type": "NVIDIA_TESLA_T4", "accelerator_count": 2, "hourly_usd": 1.46, "host_memory_gb": 60},
+    {"machine_type": "n1-standard-8", "accelerator_type": "NVIDIA_TESLA_V100", "accelerator_count": 1, "hourly_usd": 2.86, "host_memory_gb": 30},
+    {"machine_type": "g2-standard-8", "accelerator_type": "NVIDIA_L4", "accelerator_count": 1, "hourly_usd": 0.85, "host_memory_gb": 32},
+    {"machine_type": "g2-standard-24", "accelerator_type": "NVIDIA_L4", "accelerator_count": 2, "hourly_usd": 2.00, "host_memory_gb": 96},
+    {"machine_type": "g2-standard-48", "accelerator_type": "NVIDIA_L4", "accelerator_count": 4, "hourly_usd": 4.00, "host_memory_gb": 192},
+    {"machine_type": "g2-standard-96", "accelerator_type": "NVIDIA_L4", "accelerator_count": 8, "hourly_usd": 8.00, "host_memory_gb": 384},
+    {"machine_type": "a2-highgpu-1g", "accelerator_type": "NVIDIA_TESLA_A100", "accelerator_count": 1, "hourly_usd": 3.67, "host_memory_gb": 85},
+    {"machine_type": "a2-highgpu-2g", "accelerator_type": "NVIDIA_TESLA_A100", "accelerator_count": 2, "hourly_usd": 7.35, "host_memory_gb": 170},
+    {"machine_type": "a2-highgpu-4g", "accelerator_type": "NVIDIA_TESLA_A100", "accelerator_count": 4, "hourly_usd": 14.69, "host_memory_gb": 340},
+    {"machine_type": "a2-highgpu-8g", "accelerator_type": "NVIDIA_TESLA_A100", "accelerator_count": 8, "hourly_usd": 29.39, "host_memory_gb": 680},
+    {"machine_type": "a2-ultragpu-1g", "accelerator_type": "NVIDIA_A100_80GB", "accelerator_count": 1, "hourly_usd": 5.07, "host_memory_gb": 170},
+    {"machine_type": "a2-ultragpu-2g", "accelerator_type": "NVIDIA_A100_80GB", "accelerator_count": 2, "hourly_usd": 10.14, "host_memory_gb": 340},
+    {"machine_type": "a2-ultragpu-4g", "accelerator_type": "NVIDIA_A100_80GB", "accelerator_count": 4, "hourly_usd": 20.28, "host_memory_gb": 680},
+    {"machine_type": "a2-ultragpu-8g", "accelerator_type": "NVIDIA_A100_80GB", "accelerator_count": 8, "hourly_usd": 40.55, "host_memory_gb": 1360},
+    {"machine_type": "a3-highgpu-8g", "accelerator_type": "NVIDIA_H100_80GB", "accelerator_count": 8, "hourly_usd": 88.49, "host_memory_gb": 1872},
+]
+
+_SIZE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)b\b")
+
+
+def find_model(model_name_or_path: str) -> Dict[str, Any]:
+    """Looks up a model's architecture from its Hugging Face ID or path.
+
+    Unknown models are approximated from the parameter count in their name
+    (e.g. ``my-org/custom-13B-chat``); raises ValueError if there is none.
+    """
+    name = model_name_or_path.lower().replace("meta-llama-3", "llama-3").replace("_", "-")
+    for key, architecture in MODEL_ARCHITECTURES.items():
+        if key in name:
+            return {"name": key, **architecture}
+    match = _SIZE_PATTERN.search(name)
+    if not match:
+        raise ValueError(f"Unknown model size for {model_name_or_path}; add it to MODEL_ARCHITECTURES")
+    params_b = float(match.group(1))
+    # Rough shape of a dense decoder of this size (hidden^2 * layers * 12 ~= params)
+    num_layers = max(16, int(round(params_b ** 0.35 * 16)))
+    hidden_size = int((params_b * 1e9 / (12 * num_layers)) ** 0.5) // 128 * 128
+    return {
+        "name": f"unknown-{params_b:g}b",
+        "params_b": params_b,
+        "hidden_size": hidden_size,
+        "num_layers": num_layers,
+        "num_attention_heads": hidden_size // 128,
+        "num_kv_heads": max(hidden_size // 128 // 4, 1),
+        "vocab_size": 128256,
+        "max_position_embeddings": 8192,
+    }
+
+
+def find_machine(machine_type: str, accelerator_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    for machine in MACHINE_TYPES:
+        if machine["machine_type"] == machine_type and accelerator_type in (None, machine["accelerator_type"]):
+            return machine
+    return None
@@ -0,0 +1,192 @@
+from typing import Any, Dict, List, Optional
+from utils.model_catalog import ACCELERATORS, MACHINE_TYPES, find_model
+
+# Back-of-the-envelope estimates, good enough to choose a machine shape; not a runtime predictor.
+
+# llama-factory's default cutoff_len when the config does not set one
+DEFAULT_CUTOFF_LEN = 2048
+# Rough characters per token for English text and JSON markup
+CHARS_PER_TOKEN = 4
+# Share of parameters trained by each finetuning type (LoRA on all linear layers at rank 8)
+TRAINABLE_FRACTION = {"lora": 0.006, "freeze": 0.1, "full": 1.0}
+# Bytes per trainable parameter: bf16 gradient + fp32 master weight + two Adam moments
+OPTIMIZER_BYTES_PER_PARAM = 2 + 4 + 8
+# CUDA context, allocator fragmentation and NCCL buffers, per GPU
+RUNTIME_OVERHEAD_GB = 2.0
+# Fraction of GPU memory the plan may use
+MEMORY_HEADROOM = 0.9
+# Model FLOPs utilisation assumed for throughput, lower on GPUs without bf16 tensor cores
+MFU = {True: 0.35, False: 0.2}
+# Throughput kept per extra GPU under data parallelism
+SCALING_EFFICIENCY = 0.9
+# Provisioning, image pull and model download before the first step
+STARTUP_HOURS = 0.25
+
+GB = 1024 ** 3
+
+
+def sharding_stage(config: Dict[str, Any]) -> int:
+    """ZeRO-style stage implied by the config: 0 none, 2 optimizer+gradients, 3 everything."""
+    deepspeed = str(config.get("deepspeed") or "").lower()
+    fsdp = str(config.get("fsdp") or "").lower()
+    if "z3" in deepspeed or "full_shard" in fsdp:
+        return 3
+    if "z2" in deepspeed or "shard_grad_op" in fsdp:
+        return 2
+    return 0
+
+
+def estimate_memory_gb(
+    config: Dict[str, Any], model: Dict[str, Any], seq_len: int, world_size: int = 1
+) -> Dict[str, float]:
+    """Per-GPU memory, broken down by what uses it.
+
+    ``world_size`` is the total number of GPUs; DeepSpeed ZeRO / FSDP configs shard
+    optimizer state (stage 2) and weights (stage 3) across them.
+    """
+    stage = sharding_stage(config)
+    params = model["params_b"] * 1e9
+    batch = config.get("per_device_train_batch_size", 1)
+    finetuning_type = config.get("finetuning_type", "lora")
+    weight_bytes = 2 if config.get("bf16") or config.get("fp16") else 4
+    trainable = params * TRAINABLE_FRACTION.get(finetuning_type, 1.0)
+    tokens = batch * seq_len
+    # Gradient checkpointing keeps one hidden state per layer plus one layer's full activations
+    activations = tokens * model["hidden_size"] * (2 * model["num_layers"] + 34)
+    # fp32 logits and their gradient
+    logits = tokens * model["vocab_size"] * 8
+    breakdown = {
+        "weights_gb": params * weight_bytes / (world_size if stage >= 3 else 1) / GB,
+        "optimizer_gb": trainable * OPTIMIZER_BYTES_PER_PARAM / (world_size if stage >= 2 else 1) / GB,
+        "activations_gb": (activations + logits) / GB,
+        "overhead_gb": RUNTIME_OVERHEAD_GB,
+    }
+    breakdown["total_gb"] = sum(breakdown.values())
+    return {key: round(value, 2) for key, value in breakdown.items()}
+
+
+def estimate_tokens_per_second(
+    config: Dict[str, Any], model: Dict[str, Any], machine: Dict[str, Any], node_count: int = 1
+) -> float:
+    accelerator = ACCELERATORS[machine["accelerator_type"]]
+    params = model.get("active_params_b", model["params_b"]) * 1e9
+    # Forward + backward + checkpoint recompute; frozen weights skip their weight gradients
+    flops_per_token = (8 if config.get("finetuning_type") == "full" else 6) * params
+    count = machine["accelerator_count"] * node_count
+    effective_gpus = 1 + (count - 1) * SCALING_EFFICIENCY
+    return effective_gpus * accelerator["tflops"] * 1e12 * MFU[accelerator["bf16"]] / flops_per_token
+
+
+def plan_training(
+    config: Dict[str, Any],
+    dataset_rows: Optional[int] = None,
+    avg_tokens_per_row: Optional[float] = None,
+    max_tokens_per_row: Optional[float] = None,
+    max_hours: Optional[float] = None,
+    node_count: int = 1,
+) -> Dict[str, Any]:
+    """Picks the cheapest machine shape that fits a llama-factory training config.
+
+    ``config`` is the training YAML as a dict. Dataset size, usually taken from the
+    upload-time profile, drives the time and cost estimates; without it the plan
+    ranks machines by hourly price. With ``max_hours`` the cheapest machine that
+    also finishes in time wins. Machine prices and GPU counts are per node, times
+    ``node_count``. Raises ValueError when nothing fits.
+    """
+    model = find_model(config["model_name_or_path"])
+    cutoff_len = config.get("cutoff_len", DEFAULT_CUTOFF_LEN)
+    # Batches are padded to their longest row, so memory is sized for the longest one
+    seq_len = int(min(cutoff_len, max_tokens_per_row or cutoff_len))
+    avg_tokens = min(avg_tokens_per_row or seq_len, seq_len)
+    epochs = config.get("num_train_epochs", 1.0)
+    train_rows = dataset_rows * (1 - config.get("val_size", 0.0)) if dataset_rows else None
+
+    candidates: List[Dict[str, Any]] = []
+    rejected: Dict[str, str] = {}
+    smallest_memory = None
+    for machine in MACHINE_TYPES:
+        accelerator = ACCELERATORS[machine["accelerator_type"]]
+        label = f"{machine['machine_type']}/{machine['accelerator_type']}x{machine['accelerator_count']}"
+        if config.get("bf16") and not accelerator["bf16"]:
+            rejected[label] = "no bf16 support"
+            continue
+        memory = estimate_memory_gb(config, model, seq_len, machine["accelerator_count"] * node_count)
+        if smallest_memory is None or memory["total_gb"] < smallest_memory["total_gb"]:
+            smallest_memory = memory
+        if memory["total_gb"] > accelerator["memory_gb"] * MEMORY_HEADROOM:
+            rejected[label] = f"needs {memory['total_gb']} GB per GPU, has {accelerator['memory_gb']}"
+            continue
+        tokens_per_second = estimate_tokens_per_second(config, model, machine, node_count)
+        candidate = {
+            **machine,
+            "memory_per_gpu": memory,
+            "tokens_per_second": round(tokens_per_second),
+            "hours": None,
+            "cost_usd": None,
+        }
+        if train_rows:
+            global_batch = (
+                config.get("per_device_train_batch_size", 1)
+                * config.get("gradient_accumulation_steps", 1)
+                * machine["accelerator_count"]
+                * node_count
+            )
+            hours = train_rows * avg_tokens * epochs / tokens_per_second / 3600 + STARTUP_HOURS
+            candidate.update(
+                steps=int(train_rows * epochs / global_batch),
+                seconds_per_step=round(global_batch * avg_tokens / tokens_per_second, 2),
+                hours=round(hours, 2),
+                cost_usd=round(hours * machine["hourly_usd"] * node_count, 2),
+            )
+            if max_hours is not None and hours > max_hours:
+                rejected[label] = f"takes {candidate['hours']} h"
+                continue
+        candidates.append(candidate)
+
+    if not candidates:
+        raise ValueError(
+            f"No machine type fits {model['name']}"
+            + (f" (needs at least {smallest_memory['total_gb']} GB per GPU)" if smallest_memory else "")
+            + (f" within {max_hours} h" if max_hours is not None else "")
+        )
+    candidates.sort(
+        key=lambda c: (c["cost_usd"] if c["cost_usd"] is not None else c["hourly_usd"], c["accelerator_count"])
+    )
+    return {
+        "model": model["name"],
+        "seq_len": seq_len,
+        "node_count": node_count,
+        "sharding_stage": sharding_stage(config),
+        "memory_per_gpu": candidates[0]["memory_per_gpu"],
+        "dataset_rows": dataset_rows,
+        "avg_tokens_per_row": round(avg_tokens, 1),
+        "machine_spec": {
+            "machine_type": candidates[0]["machine_type"],
+            "accelerator_type": candidates[0]["accelerator_type"],
+            "accelerator_count": candidates[0]["accelerator_count"],
+        },
+        "estimate": candidates[0],
+        "alternatives": candidates[1:5],
+        "rejected": rejected,
+    }
+
+
+def dataset_stats(entries: Dict[str, Any], dataset: str) -> Dict[str, Optional[float]]:
+    """Sums the upload-time profiles of the (comma-separated) datasets a config trains on.
+
+    Returns None values when any of them was never profiled.
+    """
+    rows, chars, max_chars = 0, 0.0, 0
+    for name in (part.strip() for part in dataset.split(",")):
+        profile = entries.get(name, {}).get("profile")
+        if not profile or not profile.get("rows"):
+            return {"dataset_rows": None, "avg_tokens_per_row": None, "max_tokens_per_row": None}
+        valid_rows = profile["rows"] - profile.get("malformed_rows", 0)
+        rows += valid_rows
+        chars += profile.get("avg_row_chars", 0) * valid_rows
+        max_chars = max(max_chars, profile.get("max_row_chars", 0))
+    return {
+        "dataset_rows": rows,
+        "avg_tokens_per_row": chars / rows / CHARS_PER_TOKEN if rows else None,
+        "max_tokens_per_row": max_chars / CHARS_PER_TOKEN or None,
+    }
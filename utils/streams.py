@@ -0,0 +1,34 @@
+from typing import BinaryIO, Sequence
+
+
+class TeeReader:
+    """File wrapper that feeds every byte read through it to one or more sinks.
+
+    A sink is anything with a ``feed(bytes)`` method (profilers, hashers). Bytes
+    re-read after a seek backwards, e.g. an upload retry, are only fed once.
+    """
+
+    def __init__(self, file: BinaryIO, sinks: Sequence):
+        self._file = file
+        self.sinks = sinks
+        self._fed_to = file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._file.tell()
+        data = self._file.read(size)
+        end = start + len(data)
+        if end > self._fed_to:
+            fresh = data[max(self._fed_to - start, 0):]
+            for sink in self.sinks:
+                sink.feed(fresh)
+            self._fed_to = end
+        return data
+
+    def __enter__(self) -> "TeeReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self._file, name)
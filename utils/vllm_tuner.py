@@ -0,0 +1,130 @@
+from typing import Any, Dict, Optional
+from utils.model_catalog import ACCELERATORS, find_machine, find_model
+
+# Bytes per weight / KV-cache element for vLLM's --dtype values
+DTYPE_BYTES = {"auto": 2, "half": 2, "float16": 2, "bfloat16": 2, "float": 4, "float32": 4}
+# Context length used when neither the caller nor the model table gives a smaller one
+DEFAULT_TARGET_CONTEXT_LEN = 8192
+# vLLM's default --max-lora-rank, used to size LoRA adapter slots
+LORA_RANK = 16
+# CUDA context, CUDA graphs and NCCL buffers, per GPU
+RUNTIME_OVERHEAD_GB = 1.5
+# vLLM refuses to start unless the KV cache can hold at least one max_model_len sequence
+MIN_CONTEXT_LEN = 512
+# Upper bound on concurrent sequences; scheduling overhead dominates past this
+MAX_NUM_SEQS = 512
+# Share of host RAM the KV swap space may take across all GPUs
+SWAP_SHARE_OF_HOST_MEMORY = 0.3
+MAX_SWAP_SPACE_GB = 16
+
+GB = 1024 ** 3
+
+
+def _gpu_memory_utilization(memory_gb: float) -> float:
+    """Larger GPUs keep proportionally less headroom for fragmentation."""
+    if memory_gb >= 80:
+        return 0.95
+    if memory_gb >= 40:
+        return 0.92
+    return 0.9
+
+
+def _tensor_parallel_size(accelerator_count: int, num_attention_heads: int) -> int:
+    """Largest TP size up to the GPU count that divides the attention heads, as vLLM requires."""
+    for size in range(accelerator_count, 0, -1):
+        if num_attention_heads % size == 0:
+            return size
+    return 1
+
+
+def tune_vllm(
+    model_id: str,
+    machine_type: str,
+    accelerator_type: str,
+    accelerator_count: int,
+    target_context_len: Optional[int] = None,
+    dtype: str = "auto",
+    enable_lora: bool = False,
+    max_loras: int = 1,
+) -> Dict[str, Any]:
+    """Derives vLLM serving flags that maximise KV-cache capacity for a machine.
+
+    Weights are split across tensor-parallel GPUs, and whatever memory is left
+    after weights, LoRA slots and runtime overhead goes to the KV cache. That
+    capacity decides ``max_model_len`` (the target context, if it fits) and
+    ``max_num_seqs`` (how many full-length sequences fit at once).
+    """
+    model = find_model(model_id)
+    if accelerator_type not in ACCELERATORS:
+        raise ValueError(f"Unknown accelerator type: {accelerator_type}")
+    accelerator = ACCELERATORS[accelerator_type]
+    value_bytes = DTYPE_BYTES.get(dtype)
+    if value_bytes is None:
+        raise ValueError(f"Unsupported dtype for auto-tuning: {dtype}")
+
+    tensor_parallel_size = _tensor_parallel_size(accelerator_count, model["num_attention_heads"])
+    utilization = _gpu_memory_utilization(accelerator["memory_gb"])
+    head_dim = model["hidden_size"] // model["num_attention_heads"]
+    # KV heads are split across TP ranks, or replicated when there are fewer heads than ranks
+    kv_heads_per_gpu = max(model["num_kv_heads"] / tensor_parallel_size, 1)
+    kv_bytes_per_token = 2 * model["num_layers"] * kv_heads_per_gpu * head_dim * value_bytes
+
+    weights = model["params_b"] * 1e9 * value_bytes / tensor_parallel_size
+    # A, B matrices for the seven projection modules of every layer, per adapter slot
+    lora = (
+        max_loras * LORA_RANK * 2 * model["hidden_size"] * 7 * model["num_layers"] * value_bytes / tensor_parallel_size
+        if enable_lora else 0
+    )
+    budget = accelerator["memory_gb"] * GB * utilization - weights - lora - RUNTIME_OVERHEAD_GB * GB
+    if budget <= 0:
+        raise ValueError(
+            f"{model['name']} does not fit on {accelerator_count}x {accelerator_type}: "
+            f"weights need {weights / GB:.1f} GB per GPU"
+        )
+    kv_cache_tokens = int(budget / kv_bytes_per_token)
+
+    target = target_context_len or min(model["max_position_embeddings"], DEFAULT_TARGET_CONTEXT_LEN)
+    target = min(target, model["max_position_embeddings"])
+    max_model_len = min(target, kv_cache_tokens // 256 * 256)
+    if max_model_len < MIN_CONTEXT_LEN:
+        raise ValueError(
+            f"KV cache on {accelerator_count}x {accelerator_type} holds only {kv_cache_tokens} tokens for {model['name']}"
+        )
+    max_num_seqs = max(min(kv_cache_tokens // max_model_len, MAX_NUM_SEQS), 1)
+    if max_num_seqs >= 8:
+        max_num_seqs = max_num_seqs // 8 * 8
+
+    machine = find_machine(machine_type, accelerator_type)
+    host_memory_gb = machine["host_memory_gb"] if machine else None
+    swap_space = MAX_SWAP_SPACE_GB
+    if host_memory_gb:
+        swap_space = max(min(int(host_memory_gb * SWAP_SHARE_OF_HOST_MEMORY / tensor_parallel_size), MAX_SWAP_SPACE_GB), 1)
+
+    warnings = []
+    if tensor_parallel_size != accelerator_count:
+        warnings.append(
+            f"{model['num_attention_heads']} attention heads are not divisible by {accelerator_count}; "
+            f"using tensor-parallel-size={tensor_parallel_size}"
+        )
+    if max_model_len < target:
+        warnings.append(f"KV cache cannot hold the {target}-token target; max_model_len reduced to {max_model_len}")
+
+    return {
+        "model": model["name"],
+        "tensor_parallel_size": tensor_parallel_size,
+        "gpu_memory_utilization": utilization,
+        "max_model_len": max_model_len,
+        "max_num_seqs": max_num_seqs,
+        "swap_space": swap_space,
+        "kv_cache_tokens": kv_cache_tokens,
+        "max_batch_tokens": min(kv_cache_tokens, max_num_seqs * max_model_len),
+        "memory_per_gpu_gb": {
+            "weights": round(weights / GB, 2),
+            "lora": round(lora / GB, 2),
+            "overhead": RUNTIME_OVERHEAD_GB,
+            "kv_cache": round(budget / GB, 2),
+            "usable": round(accelerator["memory_gb"] * utilization, 2),
+        },
+        "kv_cache_bytes_per_token": int(kv_bytes_per_token),
+        "warnings": warnings,
+    }